@@ -10,11 +10,11 @@ class HelpRequestAdmin(admin.ModelAdmin):
 
 admin.site.register(HelpRequest, HelpRequestAdmin)
 
-from .models import Profile, FoodDonation, NGOInventory, FoodRequest, Delivery, NGORating, ReceiverRating,Food
+from .models import Profile, FoodDonation, FoodItem, InventoryMovement, InventorySnapshot, NGOInventory, NGOStock, OutboxMessage, DigestEntry, FoodRequest, Delivery, DeliveryRun, NGORating, ReceiverRating,Food
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = ("user", "phone", "avg_ngo_rating", "avg_receiver_rating")
+    list_display = ("user", "phone", "avg_ngo_rating", "ngo_rating_count", "avg_receiver_rating", "receiver_rating_count")
 
 @admin.register(FoodDonation)
 class FoodDonationAdmin(admin.ModelAdmin):
@@ -26,13 +26,63 @@ class FoodDonationAdmin(admin.ModelAdmin):
 class NGOInventoryAdmin(admin.ModelAdmin):
     list_display = ("ngo", "food", "quantity_remaining", "updated_at")
 
+@admin.register(NGOStock)
+class NGOStockAdmin(admin.ModelAdmin):
+    list_display = ("item", "ngo", "quantity", "updated_at")
+    search_fields = ("item__key", "ngo__username")
+
+@admin.register(InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "kind", "ngo", "item", "available", "reserved", "donation", "order")
+    list_filter = ("kind",)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(InventorySnapshot)
+class InventorySnapshotAdmin(admin.ModelAdmin):
+    list_display = ("ngo", "item", "available", "reserved", "last_movement_id", "created_at")
+
+    # derived from the ledger by take_snapshot(); never edited by hand
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(FoodItem)
+class FoodItemAdmin(admin.ModelAdmin):
+    list_display = ("name", "key")
+    search_fields = ("key",)
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "channel", "to", "subject", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status", "channel")
+    search_fields = ("to", "subject")
+
+@admin.register(DigestEntry)
+class DigestEntryAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "user", "kind", "summary")
+    list_filter = ("kind",)
+
 @admin.register(FoodRequest)
 class FoodRequestAdmin(admin.ModelAdmin):
     list_display = ("receiver", "ngo", "food", "people_count", "status", "created_at")
 
 @admin.register(Delivery)
 class DeliveryAdmin(admin.ModelAdmin):
-    list_display = ("ngo", "status", "started_at", "delivered_at")
+    list_display = ("ngo", "status", "run", "started_at", "delivered_at")
+
+@admin.register(DeliveryRun)
+class DeliveryRunAdmin(admin.ModelAdmin):
+    list_display = ("ngo", "distance_km", "planned_finish_at", "on_time", "created_at")
 
 
 
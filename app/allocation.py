@@ -1,70 +1,237 @@
 # hopemeals/allocation.py
-from typing import List, Tuple
+from collections import defaultdict, namedtuple
+from typing import Dict, List, Tuple
+from django.contrib.auth import get_user_model
 from django.db import transaction
-from .models import FoodDonation, ReceiverOrder, Allocation, composite_donor_rating
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from .models import FoodDonation, ReceiverOrder, Allocation, Delivery, InventoryMovement, donor_rank_expression
+from .stock import stock_summary
+from .ledger import record_movements
+from .dispatch import dispatch_notification
+from .strategies import AllocationStrategy, get_allocation_strategy
 
 def choose_ngo_for_item(item_name: str):
     """
-    Pick the NGO who has the most stock for this item.
+    Pick the NGO who has the most unexpired stock for this item.
     Returns (ngo_user, total_stock) or (None, 0)
     """
-    by_ngo = {}
-    qs = FoodDonation.objects.filter(
-        item_name__iexact=item_name,
-        status__in=["ACCEPTED", "PARTIAL"],
-        inventory_remaining__gt=0,
-    ).select_related("accepted_by", "donor")
-    for d in qs:
-        if not d.accepted_by:
-            continue
-        by_ngo.setdefault(d.accepted_by, 0)
-        by_ngo[d.accepted_by] += d.inventory_remaining
-    if not by_ngo:
+    summary = stock_summary(item_name)
+    if not summary:
         return None, 0
-    ngo, stock = max(by_ngo.items(), key=lambda kv: kv[1])
-    return ngo, stock
+    ngo_id, quantity = min(summary.items(), key=lambda kv: (-kv[1], kv[0]))
+    return get_user_model().objects.get(pk=ngo_id), quantity
 
 
-@transaction.atomic
-def allocate_order(order: ReceiverOrder) -> List[Allocation]:
+# attempts before a conditional decrement that keeps losing races gives up
+MAX_ALLOCATION_ATTEMPTS = 3
+_DECREMENT_CHUNK = 200
+
+
+class StockConflict(Exception):
+    """A donation had less stock at write time than when the plan was read."""
+
+
+def apply_stock_decrements(planned: List[Allocation]) -> None:
     """
-    Allocate order.people_count across donations of the *same NGO* and item_name,
-    prioritizing donors by composite rating (avg NGO+Receiver).
+    Take each planned allocation's servings from its donation with conditional
+    UPDATEs (inventory_remaining >= n in the WHERE clause), so concurrent writers
+    can never overwrite each other's decrement, and record the reservations in
+    the inventory ledger. Raises StockConflict if any row no longer had enough;
+    callers run this inside a savepoint and retry.
     """
-    assert order.ngo, "Order must have NGO set before allocation."
-    needed = order.people_count
-    made: List[Allocation] = []
-
-    donations = (FoodDonation.objects
-                 .filter(item_name__iexact=order.item_name,
-                         accepted_by=order.ngo,
-                         status__in=["ACCEPTED", "PARTIAL"],
-                         inventory_remaining__gt=0)
-                 .select_related("donor"))
-
-    # Sort by composite donor rating DESC, then fresher (earlier expires_at)
-    donations = sorted(
-        donations,
-        key=lambda d: (composite_donor_rating(d.donor), -d.expires_at.timestamp()),
-        reverse=True
+    takes: Dict[int, int] = defaultdict(int)
+    for a in planned:
+        takes[a.donation_id] += a.quantity
+    items = list(takes.items())
+    for start in range(0, len(items), _DECREMENT_CHUNK):
+        chunk = dict(items[start:start + _DECREMENT_CHUNK])
+        take = Case(*[When(pk=pk, then=Value(n)) for pk, n in chunk.items()], output_field=IntegerField())
+        updated = (FoodDonation.objects
+                   .filter(pk__in=list(chunk),
+                           status__in=["ACCEPTED", "PARTIAL"],
+                           inventory_remaining__gte=take)
+                   # status is computed from the pre-update stock (listed first for MySQL)
+                   .update(status=Case(When(inventory_remaining=take, then=Value("DELIVERED")),
+                                       default=Value("PARTIAL")),
+                           inventory_remaining=F("inventory_remaining") - take))
+        if updated != len(chunk):
+            raise StockConflict()
+    record_movements(
+        InventoryMovement(ngo_id=a.donation.accepted_by_id, item_id=a.donation.item_id,
+                          donation_id=a.donation_id, order_id=a.order_id, kind="RESERVE",
+                          available=-a.quantity, reserved=a.quantity)
+        for a in planned
     )
 
+
+def _plan(order, donations) -> List[Allocation]:
+    """Draw order.people_count from donations (in order), mutating their stock in memory."""
+    needed = order.people_count
+    planned: List[Allocation] = []
     for d in donations:
         if needed <= 0:
             break
         take = min(needed, d.inventory_remaining)
         if take <= 0:
             continue
-        Allocation.objects.create(order=order, donation=d, quantity=take)
         d.inventory_remaining -= take
-        d.status = "DELIVERED" if d.inventory_remaining == 0 else "PARTIAL"
-        d.save(update_fields=["inventory_remaining", "status"])
+        planned.append(Allocation(order=order, donation=d, quantity=take))
         needed -= take
+    return planned
 
-    if needed > 0:
-        # Not enough inventory; rollback
-        raise RuntimeError("Insufficient stock to allocate this order.")
+
+@transaction.atomic
+def allocate_order(order: ReceiverOrder, strategy: AllocationStrategy = None) -> List[Allocation]:
+    """
+    Allocate order.people_count across donations of the *same NGO* and item_name,
+    drawing them in the order given by the allocation strategy (ALLOCATION_STRATEGY;
+    by default donor rank_score, then soonest expiry).
+
+    Ranking happens in SQL and writes are batched, so the query count does not
+    grow with the number of donations the order is split across. Stock is taken
+    with conditional decrements instead of row locks; if another allocation wins
+    a race the plan is re-read and retried.
+    """
+    assert order.ngo, "Order must have NGO set before allocation."
+    strategy = strategy or get_allocation_strategy()
+    for _ in range(MAX_ALLOCATION_ATTEMPTS):
+        now = timezone.now()
+        # available() also drops rows that are due but not yet swept by the expiry scheduler
+        donations = strategy.order_queryset(
+            FoodDonation.objects
+            .available(now)
+            .filter(item_id=order.item_id, accepted_by=order.ngo)
+            .annotate(donor_score=donor_rank_expression("donor__profile__")),
+            now,
+        )
+        planned = _plan(order, donations)
+        if sum(a.quantity for a in planned) < order.people_count:
+            # Not enough inventory; nothing has been written yet
+            raise RuntimeError("Insufficient stock to allocate this order.")
+        try:
+            with transaction.atomic():
+                apply_stock_decrements(planned)
+                Allocation.objects.bulk_create(planned)
+            break
+        except StockConflict:
+            continue
+    else:
+        raise RuntimeError("Stock changed while allocating this order; please try again.")
 
     order.status = "ALLOCATED"
     order.save(update_fields=["status"])
     return list(order.allocations.select_related("donation", "donation__donor"))
+
+
+# (orders allocated, [(order, servings that were available), ...] left unfilled)
+BatchReport = namedtuple("BatchReport", ["allocated", "unfilled"])
+
+
+@transaction.atomic
+def allocate_open_orders(ngo, strategy: AllocationStrategy = None) -> BatchReport:
+    """
+    Allocate every REQUESTED/APPROVED order this NGO can see (its own and
+    unassigned ones) against its current inventory in one pass.
+
+    Orders are served oldest first, each all-or-nothing. Within an item, stock
+    is drawn in the allocation strategy's order (ALLOCATION_STRATEGY).
+    Unassigned orders are only claimed when they can be filled. All writes
+    happen in this one transaction, guarded by conditional updates rather than
+    locks; a lost race re-plans the batch. Notifications are queued in the
+    same transaction.
+    """
+    strategy = strategy or get_allocation_strategy()
+    for _ in range(MAX_ALLOCATION_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                report, planned = _allocate_open_orders_once(ngo, strategy)
+            break
+        except StockConflict:
+            continue
+    else:
+        raise RuntimeError("Stock changed while allocating; please try again.")
+
+    if report.allocated:
+        dispatch_notification(None, _notify_batch, report.allocated, planned)
+    return report
+
+
+def _allocate_open_orders_once(ngo, strategy):
+    now = timezone.now()
+    orders = list(ReceiverOrder.objects
+                  .filter(status__in=["REQUESTED", "APPROVED"])
+                  .filter(Q(ngo=ngo) | Q(ngo__isnull=True))
+                  .select_related("receiver")
+                  .order_by("created_at", "id"))
+    if not orders:
+        return BatchReport([], []), []
+
+    pools = defaultdict(list)  # item id -> donations, in consumption order
+    donations = strategy.order_queryset(
+        FoodDonation.objects
+        .available(now)
+        .filter(accepted_by=ngo, item__in={o.item_id for o in orders})
+        .annotate(donor_score=donor_rank_expression("donor__profile__")),
+        now,
+    )
+    for d in donations:
+        pools[d.item_id].append(d)
+
+    planned: List[Allocation] = []
+    allocated, unfilled = [], []
+    for order in orders:
+        pool = pools.get(order.item_id, [])
+        available = sum(d.inventory_remaining for d in pool)
+        if available < order.people_count:
+            unfilled.append((order, available))
+            continue
+        planned.extend(_plan(order, pool))
+        pools[order.item_id] = [d for d in pool if d.inventory_remaining > 0]
+        order.ngo = ngo
+        order.status = "ALLOCATED"
+        allocated.append(order)
+
+    if allocated:
+        apply_stock_decrements(planned)
+        claimed = (ReceiverOrder.objects
+                   .filter(pk__in=[o.pk for o in allocated], status__in=["REQUESTED", "APPROVED"])
+                   .filter(Q(ngo=ngo) | Q(ngo__isnull=True))
+                   .update(ngo=ngo, status="ALLOCATED"))
+        if claimed != len(allocated):
+            raise StockConflict()  # another NGO claimed or changed one of these orders
+        Allocation.objects.bulk_create(planned)
+        Delivery.objects.bulk_create(
+            [Delivery(ngo=ngo, order=o) for o in allocated],
+            ignore_conflicts=True,
+        )
+
+    return BatchReport(allocated, unfilled), planned
+
+
+def _notify_batch(orders, allocations) -> None:
+    """One status message per receiver order, one summary per donor."""
+    from .notifications import notify_receiver_order_status, notify_user
+    for order in orders:
+        notify_receiver_order_status(order)
+
+    by_donor = defaultdict(list)
+    for a in allocations:
+        by_donor[a.donation.donor_id].append(a)
+    donors = get_user_model().objects.select_related("profile").in_bulk(list(by_donor))
+    for donor_id, items in by_donor.items():
+        donor = donors.get(donor_id)
+        if not donor:
+            continue
+        lines = "\n".join(
+            f"- '{a.donation.item_name}' (donation #{a.donation_id}): {a.quantity} people, order #{a.order_id}"
+            for a in items
+        )
+        notify_user(
+            donor,
+            "[HopeMeals] Allocations for your donations",
+            f"Your donations were allocated to receiver orders:\n{lines}\nThank you!",
+            kind="allocation",
+            summary="; ".join(f"'{a.donation.item_name}' (donation #{a.donation_id}): {a.quantity} people "
+                              f"for order #{a.order_id}" for a in items),
+        )
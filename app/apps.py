@@ -9,3 +9,5 @@ class AppConfig(AppConfig):
         import app.signals  # if you already have this
         import app.signals_ratings  # if you added ratings notifications
         import app.signals_orders   # <-- make sure this line exists
+        import app.signals_geo      # keeps the nearest-NGO index fresh
+        import app.signals_stock    # NGOStock follows deleted donations
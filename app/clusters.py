@@ -0,0 +1,154 @@
+# app/clusters.py
+import math
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .geo import np
+
+MAX_LAT = 85.05112878  # Web Mercator limit
+MAX_ZOOM = 18
+MAX_TILES = 64
+
+Tile = Tuple[int, int]
+
+
+def _grid() -> int:
+    """Cluster cells per tile side (8 -> 32px cells on 256px tiles)."""
+    return getattr(settings, "MAP_CLUSTER_GRID", 8)
+
+
+def _lng_to_x(lng: float, n: int) -> float:
+    return (lng + 180.0) / 360.0 * n
+
+
+def _lat_to_y(lat: float, n: int) -> float:
+    r = math.radians(max(-MAX_LAT, min(MAX_LAT, lat)))
+    return (1.0 - math.log(math.tan(r) + 1.0 / math.cos(r)) / math.pi) / 2.0 * n
+
+
+def _y_to_lat(y: float, n: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+
+def tiles_for_bbox(zoom: int, west: float, south: float, east: float, north: float) -> List[Tile]:
+    n = 2 ** zoom
+    x0 = max(0, min(n - 1, int(_lng_to_x(west, n))))
+    x1 = max(0, min(n - 1, int(_lng_to_x(east, n))))
+    y0 = max(0, min(n - 1, int(_lat_to_y(north, n))))
+    y1 = max(0, min(n - 1, int(_lat_to_y(south, n))))
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def _tiles_bounds(zoom: int, tiles: List[Tile]) -> Tuple[float, float, float, float]:
+    """(south, north, west, east) enclosing all tiles."""
+    n = 2 ** zoom
+    xs = [x for x, _ in tiles]
+    ys = [y for _, y in tiles]
+    west = min(xs) / n * 360.0 - 180.0
+    east = (max(xs) + 1) / n * 360.0 - 180.0
+    north = _y_to_lat(min(ys), n)
+    south = _y_to_lat(max(ys) + 1, n)
+    return south, north, west, east
+
+
+def _bin_points(points, zoom: int) -> Dict[Tile, List[Tuple[float, float, int]]]:
+    """
+    Group (lat, lng) points into grid cells; returns
+    {tile: [(mean_lat, mean_lng, count), ...]}.
+    """
+    out: Dict[Tile, List[Tuple[float, float, int]]] = defaultdict(list)
+    if not points:
+        return out
+    grid = _grid()
+    side = (2 ** zoom) * grid  # cells across the whole world
+
+    if np is None:
+        acc = {}
+        for lat, lng in points:
+            cx = max(0, min(side - 1, int(_lng_to_x(lng, side))))
+            cy = max(0, min(side - 1, int(_lat_to_y(lat, side))))
+            s = acc.setdefault((cx, cy), [0.0, 0.0, 0])
+            s[0] += lat; s[1] += lng; s[2] += 1
+        for (cx, cy), (slat, slng, c) in acc.items():
+            out[(cx // grid, cy // grid)].append((slat / c, slng / c, c))
+        return out
+
+    arr = np.asarray(points, dtype=float)
+    lat, lng = arr[:, 0], arr[:, 1]
+    r = np.radians(np.clip(lat, -MAX_LAT, MAX_LAT))
+    cx = np.clip(((lng + 180.0) / 360.0 * side).astype(np.int64), 0, side - 1)
+    cy = np.clip(((1.0 - np.log(np.tan(r) + 1.0 / np.cos(r)) / np.pi) / 2.0 * side).astype(np.int64), 0, side - 1)
+    cells, inv = np.unique(cx * side + cy, return_inverse=True)
+    inv = inv.ravel()
+    counts = np.bincount(inv)
+    mean_lat = np.bincount(inv, weights=lat) / counts
+    mean_lng = np.bincount(inv, weights=lng) / counts
+    for cell, mlat, mlng, c in zip(cells.tolist(), mean_lat.tolist(), mean_lng.tolist(), counts.tolist()):
+        cx_, cy_ = divmod(cell, side)
+        out[(cx_ // grid, cy_ // grid)].append((mlat, mlng, c))
+    return out
+
+
+def _load_points(south, north, west, east):
+    from .models import FoodDonation, NGOLocation  # local import to avoid circulars
+    donations = list(FoodDonation.objects
+                     .filter(status__in=["PENDING", "ACCEPTED", "PARTIAL"],
+                             expires_at__gt=timezone.now(),
+                             pickup_lat__range=(south, north),
+                             pickup_lng__range=(west, east))
+                     .values_list("pickup_lat", "pickup_lng"))
+    ngos = list(NGOLocation.objects
+                .filter(lat__range=(south, north), lng__range=(west, east))
+                .values_list("lat", "lng"))
+    return {"donation": donations, "ngo": ngos}
+
+
+def _compute_tiles(zoom: int, tiles: List[Tile]) -> Dict[Tile, list]:
+    """Cluster features for each tile, from one query per point kind."""
+    result: Dict[Tile, list] = {t: [] for t in tiles}
+    for kind, points in _load_points(*_tiles_bounds(zoom, tiles)).items():
+        for tile, cells in _bin_points(points, zoom).items():
+            if tile not in result:
+                continue
+            result[tile].extend(
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [round(lng, 6), round(lat, 6)]},
+                    "properties": {"kind": kind, "count": count},
+                }
+                for lat, lng, count in cells
+            )
+    return result
+
+
+def clusters_for_bbox(zoom: int, west: float, south: float, east: float, north: float) -> dict:
+    """
+    GeoJSON FeatureCollection of grid clusters covering the bbox. Each tile's
+    clusters are cached for MAP_CLUSTER_CACHE_SECONDS, so panning only computes
+    newly exposed tiles. Raises ValueError for a bad or oversized request,
+    including non-finite or out-of-range coordinates.
+    """
+    if not (0 <= zoom <= MAX_ZOOM and all(math.isfinite(v) for v in (west, south, east, north))
+            and -180 <= west <= east <= 180 and -90 <= south <= north <= 90):
+        raise ValueError("Invalid zoom or bbox.")
+    tiles = tiles_for_bbox(zoom, west, south, east, north)
+    if len(tiles) > MAX_TILES:
+        raise ValueError("Bounding box is too large for this zoom level.")
+
+    keys = {t: f"map-clusters:{zoom}:{t[0]}:{t[1]}" for t in tiles}
+    cached = cache.get_many(list(keys.values()))
+    missing = [t for t in tiles if keys[t] not in cached]
+    if missing:
+        fresh = _compute_tiles(zoom, missing)
+        fresh_by_key = {keys[t]: fresh[t] for t in missing}
+        cache.set_many(fresh_by_key, getattr(settings, "MAP_CLUSTER_CACHE_SECONDS", 60))
+        cached.update(fresh_by_key)
+
+    return {
+        "type": "FeatureCollection",
+        "features": [f for t in tiles for f in cached[keys[t]]],
+    }
@@ -0,0 +1,85 @@
+# app/dispatch.py
+"""
+Notification queueing. The notify functions only write OutboxMessage and
+DigestEntry rows; `manage.py send_notifications` (app.outbox) sends them
+later, outside the request, so the outbox worker is what keeps delivery off
+the write path.
+
+Outside a request, or for calls without a key, dispatch_notification() runs
+the notify function right away, in the caller's transaction: a rollback
+discards the rows and a commit keeps them.
+
+Inside a request (NotificationMiddleware) or a collect_notifications() block,
+keyed calls are held instead. Each one is recorded when its transaction
+commits (never, if it rolls back), a later call with the same key replaces
+the earlier one, and the survivors write their rows once the block ends: three
+status changes to one order in a request become one message about the last.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+Pending = Dict[Hashable, Tuple[Callable, tuple]]
+
+
+def _run(func: Callable, args: tuple) -> None:
+    try:
+        with transaction.atomic():
+            func(*args)
+    except Exception:
+        logger.exception("Notification %s failed", getattr(func, "__name__", func))
+
+
+def _committed(pending: Pending, key: Hashable, func: Callable, args: tuple) -> None:
+    if getattr(_local, "pending", None) is not pending:
+        _run(func, args)  # committed after its block ended: nothing left to coalesce with
+        return
+    pending.pop(key, None)  # keep the order of the last call
+    pending[key] = (func, args)
+
+
+def dispatch_notification(key: Optional[Hashable], func: Callable, *args) -> None:
+    """
+    Queue func(*args). Within one request or collect_notifications() block,
+    calls sharing a key collapse into the last one to commit; otherwise the
+    call runs now, in the caller's transaction.
+    """
+    pending = getattr(_local, "pending", None)
+    if key is None or pending is None:
+        func(*args)
+        return
+    transaction.on_commit(lambda: _committed(pending, key, func, args))
+
+
+@contextmanager
+def collect_notifications():
+    """Hold committed, keyed notifications until the block ends, then write them coalesced."""
+    if getattr(_local, "pending", None) is not None:
+        yield  # nested: the outer block flushes
+        return
+    pending: Pending = {}
+    _local.pending = pending
+    try:
+        yield
+    finally:
+        _local.pending = None
+        for func, args in pending.values():
+            _run(func, args)
+
+
+class NotificationMiddleware:
+    """Coalesce each request's notifications and write them once it is done."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_notifications():
+            return self.get_response(request)
@@ -0,0 +1,142 @@
+# app/expiry.py
+"""
+Expiry sweep: donations past expires_at are expired in id chunks, each chunk
+one locked SELECT and one UPDATE in its own short transaction.
+
+ExpiryScheduler drives the sweep from a long-running process (the
+expiry_scheduler command), waking at each donation's expires_at.
+"""
+import heapq
+import time
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .dispatch import dispatch_notification
+from .ledger import record_movements
+from .models import LIVE_STATUSES, FoodDonation, InventoryMovement
+from .stock import stock_share
+
+ExpiredDonation = namedtuple("ExpiredDonation", ["id", "donor_id", "item_name"])
+
+
+def _expire_chunk(now, chunk_size: int) -> List[ExpiredDonation]:
+    with transaction.atomic():
+        rows = list(FoodDonation.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(status__in=LIVE_STATUSES, expires_at__lte=now)
+                    .order_by("expires_at", "id")
+                    .values_list("id", "donor_id", "item_name", "item_id", "status",
+                                 "accepted_by_id", "inventory_remaining")[:chunk_size])
+        if not rows:
+            return []
+        # rows are locked (or skipped) until commit, so what was read is what expires
+        FoodDonation.objects.filter(pk__in=[r[0] for r in rows]).update(
+            status="EXPIRED", inventory_remaining=0, updated_at=now,
+        )
+        record_movements(
+            InventoryMovement(ngo_id=ngo_id, item_id=item_id, donation_id=pk, kind="EXPIRE", available=-remaining)
+            for pk, _, _, item_id, status, ngo_id, remaining in rows
+            if stock_share(item_id, status, ngo_id, remaining)
+        )
+        expired = [ExpiredDonation(pk, donor_id, item_name) for pk, donor_id, item_name, *_ in rows]
+        dispatch_notification(None, notify_expired, expired)
+        return expired
+
+
+def expire_due_donations(now=None, chunk_size: int = 1000) -> List[ExpiredDonation]:
+    """
+    Mark every live donation whose expires_at has passed as EXPIRED, one
+    UPDATE (and one short transaction) per chunk of ids, recording the lost
+    stock in the inventory ledger. Each chunk queues its donor notices in
+    the same transaction, one message per donor.
+    """
+    now = now or timezone.now()
+    expired: List[ExpiredDonation] = []
+    while True:
+        chunk = _expire_chunk(now, chunk_size)
+        if not chunk:
+            break
+        expired += chunk
+        if len(chunk) < chunk_size:
+            break
+    return expired
+
+
+def notify_expired(rows: List[ExpiredDonation]) -> None:
+    from .notifications import notify_donor_foods_expired
+    by_donor = defaultdict(list)
+    for r in rows:
+        by_donor[r.donor_id].append(r.item_name)
+    donors = get_user_model().objects.select_related("profile").in_bulk(list(by_donor))
+    for donor_id, names in by_donor.items():
+        if donor_id in donors:
+            notify_donor_foods_expired(donors[donor_id], names)
+
+
+class ExpiryScheduler:
+    """
+    Min-heap of (expires_at, donation id) for live donations. refresh() adds
+    rows whose updated_at moved since the previous poll (every
+    EXPIRY_POLL_SECONDS, default 30), so new and edited donations are picked
+    up; tick() runs the sweep once the earliest entry is due. The heap only
+    decides when to wake: expire_due_donations() re-reads the rows, so stale
+    entries for accepted-then-delivered or edited donations do no harm.
+    """
+
+    def __init__(self, poll_seconds: float = None, clock=timezone.now, sleep=time.sleep):
+        self.poll_seconds = poll_seconds or getattr(settings, "EXPIRY_POLL_SECONDS", 30)
+        self.clock = clock
+        self.sleep = sleep
+        self.heap: List[Tuple] = []
+        self.scheduled: Dict[int, object] = {}  # donation id -> expires_at in the heap
+        self.polled_at = None
+        self.next_poll = None
+
+    def refresh(self) -> int:
+        """Schedule live donations created or changed since the last poll. Returns how many."""
+        now = self.clock()
+        qs = FoodDonation.objects.filter(status__in=LIVE_STATUSES)
+        if self.polled_at is not None:
+            # look back one extra poll so rows committed after a slow save are not missed
+            qs = qs.filter(updated_at__gte=self.polled_at - timedelta(seconds=self.poll_seconds))
+        added = 0
+        for pk, expires_at in qs.values_list("id", "expires_at").iterator():
+            if self.scheduled.get(pk) != expires_at:
+                self.scheduled[pk] = expires_at
+                heapq.heappush(self.heap, (expires_at, pk))
+                added += 1
+        self.polled_at = now
+        self.next_poll = now + timedelta(seconds=self.poll_seconds)
+        return added
+
+    def next_wakeup(self):
+        if self.heap and self.heap[0][0] < self.next_poll:
+            return self.heap[0][0]
+        return self.next_poll
+
+    def tick(self) -> List[ExpiredDonation]:
+        """Poll if it is time, then expire whatever is due."""
+        if self.next_poll is None or self.clock() >= self.next_poll:
+            self.refresh()
+        now = self.clock()
+        due = False
+        while self.heap and self.heap[0][0] <= now:
+            expires_at, pk = heapq.heappop(self.heap)
+            if self.scheduled.get(pk) == expires_at:
+                del self.scheduled[pk]
+                due = True
+        return expire_due_donations(now=now) if due else []
+
+    def run(self, stop=lambda: False) -> None:
+        while not stop():
+            close_old_connections()
+            self.tick()
+            wait = (self.next_wakeup() - self.clock()).total_seconds()
+            if wait > 0:
+                self.sleep(wait)
@@ -0,0 +1,324 @@
+# app/geo.py
+import math
+import threading
+import time
+from collections import namedtuple
+from heapq import heappush, heappushpop
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import F, FloatField, Func, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+EARTH_RADIUS_KM = 6371.0
+
+# how many of the nearest NGOs may accept a donation
+ELIGIBLE_NGO_COUNT = 2
+
+# rows per distance-matrix chunk (nearest_many(), runs); bounds peak memory
+DISTANCE_BATCH_ROWS = 1024
+
+NGOPoint = namedtuple("NGOPoint", ["user_id", "lat", "lng", "address"])
+
+
+def haversine_km(lat1, lng1, lat2, lng2) -> float:
+    if None in (lat1, lng1, lat2, lng2):
+        return float("inf")
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat = p2 - p1
+    dlon = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _sql_haversine_km(lat1, lng1, lat2, lng2):
+    """SQLite user function: NULL in, NULL out (rather than inf)."""
+    if None in (lat1, lng1, lat2, lng2):
+        return None
+    return haversine_km(lat1, lng1, lat2, lng2)
+
+
+def register_sqlite_functions(connection) -> None:
+    """Install HAVERSINE_KM() on a new SQLite connection (see signals_geo)."""
+    if connection.vendor == "sqlite":
+        connection.connection.create_function("HAVERSINE_KM", 4, _sql_haversine_km, deterministic=True)
+
+
+class HaversineKm(Func):
+    """
+    Great-circle distance in km between (lat1, lng1) and (lat2, lng2).
+    SQLite calls the registered HAVERSINE_KM(); other backends get the same
+    formula spelled out with the portable math functions.
+    """
+    function = "HAVERSINE_KM"
+    arity = 4
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, **extra_context)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        lat1, lng1, lat2, lng2 = self.get_source_expressions()
+        p1, p2 = Radians(lat1), Radians(lat2)
+        a = (Power(Sin((p2 - p1) / Value(2.0)), 2)
+             + Cos(p1) * Cos(p2) * Power(Sin(Radians(lng2 - lng1) / Value(2.0)), 2))
+        expr = Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a))
+        return compiler.compile(expr.resolve_expression(compiler.query))
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> Tuple[float, float, Optional[float], Optional[float]]:
+    """
+    (min_lat, max_lat, min_lng, max_lng) enclosing the circle. The longitude bounds
+    are None when the box would wrap the antimeridian or reach a pole.
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(lat))))
+    if lng - dlng < -180 or lng + dlng > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, lng - dlng, lng + dlng
+
+
+def within_radius(qs, lat: float, lng: float, radius_km: float, lat_field: str = "pickup_lat", lng_field: str = "pickup_lng"):
+    """
+    Narrow qs to rows within radius_km of (lat, lng), annotated with distance_km and
+    ordered nearest first. A bounding box on the indexed coordinate columns runs
+    before the exact distance, so only nearby rows are measured.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    qs = qs.filter(**{f"{lat_field}__range": (min_lat, max_lat)})
+    if min_lng is not None:
+        qs = qs.filter(**{f"{lng_field}__range": (min_lng, max_lng)})
+    return (qs
+            .annotate(distance_km=HaversineKm(F(lat_field), F(lng_field), Value(lat), Value(lng)))
+            .filter(distance_km__lte=radius_km)
+            .order_by("distance_km"))
+
+
+def _to_xyz(lat: float, lng: float) -> Tuple[float, float, float]:
+    """Unit vector on the sphere; chord length is monotonic in great-circle distance."""
+    p, l = math.radians(lat), math.radians(lng)
+    cp = math.cos(p)
+    return (cp * math.cos(l), cp * math.sin(l), math.sin(p))
+
+
+def _chord_sq_to_km(chord_sq: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord_sq) / 2))
+
+
+# --------------- KD-tree ---------------
+
+class _KDTree:
+    """
+    Static 3-d tree over unit vectors. Nodes are (xyz, item, axis, left, right).
+    Euclidean (chord) nearest == great-circle nearest, so no dateline/pole special cases.
+    """
+
+    def __init__(self, points):
+        self.root = self._build([(_to_xyz(p.lat, p.lng), p) for p in points], 0)
+        self.size = len(points)
+
+    def _build(self, pts, depth):
+        if not pts:
+            return None
+        axis = depth % 3
+        pts.sort(key=lambda t: t[0][axis])
+        mid = len(pts) // 2
+        xyz, item = pts[mid]
+        return (xyz, item, axis,
+                self._build(pts[:mid], depth + 1),
+                self._build(pts[mid + 1:], depth + 1))
+
+    def nearest(self, xyz, k: int) -> List[Tuple[float, object]]:
+        """Return up to k (chord_sq, item) pairs, closest first."""
+        if k <= 0 or self.root is None:
+            return []
+        heap = []  # max-heap via negated distance: (-d2, tiebreak, item)
+        counter = 0
+        stack = [(self.root, 0.0)]  # (node, lower bound on chord_sq for its subtree)
+        while stack:
+            node, bound = stack.pop()
+            if node is None or (len(heap) == k and bound >= -heap[0][0]):
+                continue
+            pt, item, axis, left, right = node
+            d2 = (pt[0] - xyz[0]) ** 2 + (pt[1] - xyz[1]) ** 2 + (pt[2] - xyz[2]) ** 2
+            counter += 1
+            if len(heap) < k:
+                heappush(heap, (-d2, counter, item))
+            elif d2 < -heap[0][0]:
+                heappushpop(heap, (-d2, counter, item))
+
+            diff = xyz[axis] - pt[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # push far first so the near side is explored first (LIFO)
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        return [(-nd2, item) for nd2, _, item in sorted(heap, key=lambda t: -t[0])]
+
+
+class NGOIndex:
+    """Nearest-NGO lookups over NGOLocation default locations."""
+
+    def __init__(self, points):
+        self.points = list(points)
+        self._tree = _KDTree(self.points)
+        self._arrays = None  # lazily built NumPy views for nearest_many()
+
+    def __len__(self):
+        return len(self.points)
+
+    def nearest(self, lat: float, lng: float, k: int = 2) -> List[Tuple[float, NGOPoint]]:
+        """Return [(distance_km, NGOPoint)] for the k closest NGOs, closest first."""
+        hits = self._tree.nearest(_to_xyz(lat, lng), k)
+        return [(_chord_sq_to_km(d2), p) for d2, p in hits]
+
+    def nearest_many(self, coords, k: int = 2) -> List[List[int]]:
+        """
+        Batch form of nearest(): for each (lat, lng) in coords return the k closest
+        NGO user ids. Uses one NumPy distance matrix per chunk when NumPy is available.
+        """
+        if np is None or not self.points or k <= 0:
+            return [[p.user_id for _, p in self.nearest(lat, lng, k)] for lat, lng in coords]
+        if self._arrays is None:
+            ngo_lat = np.radians(np.array([p.lat for p in self.points]))
+            self._arrays = (
+                ngo_lat,
+                np.cos(ngo_lat),
+                np.radians(np.array([p.lng for p in self.points])),
+                np.array([p.user_id for p in self.points]),
+            )
+        ngo_lat, ngo_cos_lat, ngo_lng, ngo_ids = self._arrays
+        k = min(k, len(self.points))
+        out: List[List[int]] = []
+        for start in range(0, len(coords), DISTANCE_BATCH_ROWS):
+            chunk = np.radians(np.asarray(coords[start:start + DISTANCE_BATCH_ROWS], dtype=float).reshape(-1, 2))
+            lat = chunk[:, 0:1]
+            lng = chunk[:, 1:2]
+            # haversine "a" term is monotonic in distance, so rank on it directly
+            a = (np.sin((ngo_lat - lat) / 2) ** 2
+                 + np.cos(lat) * ngo_cos_lat * np.sin((ngo_lng - lng) / 2) ** 2)
+            if k < a.shape[1]:
+                top = np.argpartition(a, k - 1, axis=1)[:, :k]
+            else:
+                top = np.tile(np.arange(a.shape[1]), (a.shape[0], 1))
+            order = np.take_along_axis(a, top, axis=1).argsort(axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            out.extend(ngo_ids[top].tolist())
+        return out
+
+
+# --------------- Process-local cache ---------------
+
+_index_lock = threading.Lock()
+_index: Optional[NGOIndex] = None
+_index_built_at = 0.0
+
+
+def _load_ngo_points():
+    from .models import NGOLocation  # local import to avoid circulars
+    rows = (NGOLocation.objects
+            .filter(user__groups__name="NGO", lat__isnull=False, lng__isnull=False)
+            .values_list("user_id", "lat", "lng", "address_line")
+            .distinct())
+    return [NGOPoint(uid, float(lat), float(lng), addr or "") for uid, lat, lng, addr in rows]
+
+
+def get_ngo_index() -> NGOIndex:
+    """
+    Return the cached index, rebuilding it if it was invalidated or is older than
+    NGO_INDEX_TTL_SECONDS (bounds staleness for changes made by other processes).
+    """
+    global _index, _index_built_at
+    ttl = getattr(settings, "NGO_INDEX_TTL_SECONDS", 300)
+    with _index_lock:
+        if _index is None or (ttl and time.monotonic() - _index_built_at > ttl):
+            _index = NGOIndex(_load_ngo_points())
+            _index_built_at = time.monotonic()
+        return _index
+
+
+def invalidate_ngo_index() -> None:
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def nearest_ngo_ids_for_donations(donations, limit: int = 2) -> Dict[int, List[int]]:
+    """
+    Map donation id -> ids of the `limit` NGOs nearest its pickup point, for a whole
+    batch at once. Donations without usable coordinates map to [].
+    """
+    result: Dict[int, List[int]] = {}
+    ids, coords = [], []
+    for d in donations:
+        try:
+            coords.append((float(d.pickup_lat), float(d.pickup_lng)))
+        except (TypeError, ValueError):
+            result[d.id] = []
+            continue
+        ids.append(d.id)
+    if ids:
+        for donation_id, ngo_ids in zip(ids, get_ngo_index().nearest_many(coords, limit)):
+            result[donation_id] = ngo_ids
+    return result
+
+
+def assign_eligible_ngos(donations, limit: int = ELIGIBLE_NGO_COUNT) -> None:
+    """Persist FoodDonation.eligible_ngos for the given donations (replacing any previous set)."""
+    from .models import FoodDonation  # local import to avoid circulars
+    donations = list(donations)
+    if not donations:
+        return
+    through = FoodDonation.eligible_ngos.through
+    nearest = nearest_ngo_ids_for_donations(donations, limit)
+    through.objects.filter(fooddonation_id__in=[d.id for d in donations]).delete()
+    through.objects.bulk_create([
+        through(fooddonation_id=donation_id, user_id=ngo_id)
+        for donation_id, ngo_ids in nearest.items()
+        for ngo_id in ngo_ids
+    ])
+
+
+def refresh_eligibility_near(ngo_ids, radius_km: float = None, chunk_size: int = 1000) -> None:
+    """
+    Recompute eligible NGOs for the PENDING donations a change to these NGOs
+    can affect: those that list one of them, and those within radius_km
+    (ELIGIBILITY_REFRESH_KM, default 25) of where they are now. Donations
+    farther out whose nearest NGOs are farther still are left to
+    `manage.py rebuild_eligibility`.
+    """
+    from .models import FoodDonation, NGOLocation  # local import to avoid circulars
+    ngo_ids = set(ngo_ids)
+    if not ngo_ids:
+        return
+    radius_km = radius_km or getattr(settings, "ELIGIBILITY_REFRESH_KM", 25)
+    pending = FoodDonation.objects.filter(status="PENDING")
+    ids = set(pending.filter(eligible_ngos__in=ngo_ids).values_list("id", flat=True))
+    for lat, lng in (NGOLocation.objects
+                     .filter(user_id__in=ngo_ids, lat__isnull=False, lng__isnull=False)
+                     .values_list("lat", "lng")):
+        ids.update(within_radius(pending, lat, lng, radius_km).values_list("id", flat=True))
+    ids = sorted(ids)
+    for start in range(0, len(ids), chunk_size):
+        assign_eligible_ngos(pending.filter(id__in=ids[start:start + chunk_size])
+                             .only("id", "pickup_lat", "pickup_lng"))
+
+
+def rebuild_pending_eligibility(chunk_size: int = 1000) -> None:
+    """Recompute eligible NGOs for every PENDING donation (`manage.py rebuild_eligibility`)."""
+    from .models import FoodDonation  # local import to avoid circulars
+    qs = FoodDonation.objects.filter(status="PENDING").only("id", "pickup_lat", "pickup_lng").order_by("id")
+    last_id = 0
+    while True:
+        chunk = list(qs.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        assign_eligible_ngos(chunk)
+        last_id = chunk[-1].id
@@ -0,0 +1,167 @@
+# app/ledger.py
+"""
+Inventory ledger: every stock change is appended as an InventoryMovement in
+the transaction that made it, and NGOStock is moved by the same amounts.
+Snapshots fold the ledger into running totals so reads only sum a short tail.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .stock import adjust_ngo_stock
+
+_PAIR_CHUNK = 200
+
+
+def record_movements(movements: Iterable["InventoryMovement"]) -> List["InventoryMovement"]:
+    """Append movements to the ledger and apply their `available` deltas to NGOStock."""
+    from .models import InventoryMovement  # local import to avoid circulars
+    movements = [m for m in movements if m.available or m.reserved]
+    if not movements:
+        return []
+    deltas: Dict[Tuple[int, int], int] = defaultdict(int)
+    for m in movements:
+        deltas[(m.item_id, m.ngo_id)] += m.available
+    with transaction.atomic(savepoint=False):
+        created = InventoryMovement.objects.bulk_create(movements)
+        adjust_ngo_stock(deltas)
+    return created
+
+
+def donation_movements(donation, before, after) -> List["InventoryMovement"]:
+    """
+    Movements for a donation whose stock share (FoodDonation.stock_share())
+    went from `before` to `after` outside of allocation: accepting, expiring,
+    deleting or editing it.
+    """
+    from .models import InventoryMovement  # local import to avoid circulars
+    if before == after:
+        return []
+    if after and not before:
+        kind = "ACCEPT"
+    elif donation.status == "EXPIRED":
+        kind = "EXPIRE"
+    else:
+        kind = "ADJUST"
+    out = []
+    if before:
+        (item_id, ngo_id), n = before
+        out.append(InventoryMovement(ngo_id=ngo_id, item_id=item_id, donation=donation, kind=kind, available=-n))
+    if after:
+        (item_id, ngo_id), n = after
+        out.append(InventoryMovement(ngo_id=ngo_id, item_id=item_id, donation=donation, kind=kind, available=n))
+    if len(out) == 2 and out[0].item_id == out[1].item_id and out[0].ngo_id == out[1].ngo_id:
+        out[1].available += out[0].available
+        out = out[1:]
+    return out
+
+
+def _latest_snapshots(pairs) -> Dict[Tuple[int, int], "InventorySnapshot"]:
+    """{(ngo_id, item_id): newest snapshot} for the given pairs."""
+    from .models import InventorySnapshot  # local import to avoid circulars
+    pairs = list(pairs)
+    latest = {}
+    for start in range(0, len(pairs), _PAIR_CHUNK):
+        match = Q()
+        for ngo_id, item_id in pairs[start:start + _PAIR_CHUNK]:
+            match |= Q(ngo_id=ngo_id, item_id=item_id)
+        for snap in InventorySnapshot.objects.filter(match).order_by("-last_movement_id"):
+            latest.setdefault((snap.ngo_id, snap.item_id), snap)
+    return latest
+
+
+@transaction.atomic
+def take_snapshot() -> int:
+    """
+    Fold every movement since the previous snapshot into new snapshot rows
+    for the (NGO, item) pairs they touched. Returns the number of rows written.
+
+    Movements younger than INVENTORY_SNAPSHOT_LAG_SECONDS (default 60) wait for
+    the next run, so a transaction that took a lower id but commits late is
+    not skipped.
+    """
+    from .models import InventoryMovement, InventorySnapshot  # local import to avoid circulars
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, "INVENTORY_SNAPSHOT_LAG_SECONDS", 60))
+    since = InventorySnapshot.objects.aggregate(m=Max("last_movement_id"))["m"] or 0
+    upto = (InventoryMovement.objects
+            .filter(id__gt=since, created_at__lte=cutoff)
+            .aggregate(m=Max("id"))["m"])
+    if upto is None:
+        return 0
+    tail = (InventoryMovement.objects
+            .filter(id__gt=since, id__lte=upto)
+            .values("ngo", "item")
+            .annotate(available=Sum("available"), reserved=Sum("reserved"))
+            .order_by())
+    tail = {(r["ngo"], r["item"]): r for r in tail}
+    previous = _latest_snapshots(tail)
+    rows = []
+    for (ngo_id, item_id), r in tail.items():
+        prev = previous.get((ngo_id, item_id))
+        rows.append(InventorySnapshot(
+            ngo_id=ngo_id, item_id=item_id, last_movement_id=upto,
+            available=(prev.available if prev else 0) + r["available"],
+            reserved=(prev.reserved if prev else 0) + r["reserved"],
+        ))
+    InventorySnapshot.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def stock_position(ngo_id: int, item_id: int) -> Tuple[int, int]:
+    """(available, reserved) for one NGO and item: latest snapshot plus the tail after it."""
+    from .models import InventoryMovement, InventorySnapshot  # local import to avoid circulars
+    snap = (InventorySnapshot.objects
+            .filter(ngo_id=ngo_id, item_id=item_id)
+            .order_by("-last_movement_id")
+            .first())
+    after = snap.last_movement_id if snap else 0
+    tail = (InventoryMovement.objects
+            .filter(ngo_id=ngo_id, item_id=item_id, id__gt=after)
+            .aggregate(available=Sum("available"), reserved=Sum("reserved")))
+    return ((snap.available if snap else 0) + (tail["available"] or 0),
+            (snap.reserved if snap else 0) + (tail["reserved"] or 0))
+
+
+def stock_history(ngo_id: int, item_id: int, since=None, limit: Optional[int] = None) -> List[dict]:
+    """
+    Movements for one NGO and item, oldest first, each with the running
+    available/reserved totals after it. Starts from the last snapshot taken
+    before `since`, so only the requested window is read.
+    """
+    from .models import InventoryMovement, InventorySnapshot  # local import to avoid circulars
+    start_id = 0
+    if since is not None:
+        start_id = (InventoryMovement.objects
+                    .filter(ngo_id=ngo_id, item_id=item_id, created_at__lt=since)
+                    .aggregate(m=Max("id"))["m"] or 0)
+    snap = (InventorySnapshot.objects
+            .filter(ngo_id=ngo_id, item_id=item_id, last_movement_id__lte=start_id)
+            .order_by("-last_movement_id")
+            .first())
+    base_id = snap.last_movement_id if snap else 0
+    opening = (InventoryMovement.objects
+               .filter(ngo_id=ngo_id, item_id=item_id, id__gt=base_id, id__lte=start_id)
+               .aggregate(available=Sum("available"), reserved=Sum("reserved")))
+    available = (snap.available if snap else 0) + (opening["available"] or 0)
+    reserved = (snap.reserved if snap else 0) + (opening["reserved"] or 0)
+
+    qs = (InventoryMovement.objects
+          .filter(ngo_id=ngo_id, item_id=item_id, id__gt=start_id)
+          .order_by("id"))
+    if limit:
+        qs = qs[:limit]
+    out = []
+    for m in qs:
+        available += m.available
+        reserved += m.reserved
+        out.append({
+            "at": m.created_at, "kind": m.kind, "donation_id": m.donation_id, "order_id": m.order_id,
+            "available_change": m.available, "reserved_change": m.reserved,
+            "available": available, "reserved": reserved,
+        })
+    return out
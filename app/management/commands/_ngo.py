@@ -0,0 +1,21 @@
+# app/management/commands/_ngo.py
+"""The --ngo option shared by the per-NGO commands (allocate_orders, plan_delivery_runs)."""
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+
+
+def add_ngo_argument(parser):
+    parser.add_argument("--ngo", action="append", default=[],
+                        help="NGO username (repeatable). Defaults to every NGO.")
+
+
+def selected_ngos(usernames):
+    """The named NGO users, or every NGO when none are named."""
+    User = get_user_model()
+    if not usernames:
+        return list(User.objects.filter(groups__name="NGO").order_by("id"))
+    ngos = list(User.objects.filter(username__in=usernames))
+    missing = set(usernames) - {u.username for u in ngos}
+    if missing:
+        raise CommandError(f"Unknown NGO user(s): {', '.join(sorted(missing))}")
+    return ngos
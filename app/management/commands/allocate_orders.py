@@ -0,0 +1,26 @@
+# app/management/commands/allocate_orders.py
+from django.core.management.base import BaseCommand
+from app.allocation import allocate_open_orders
+from app.management.commands._ngo import add_ngo_argument, selected_ngos
+
+
+class Command(BaseCommand):
+    help = "Allocate all open receiver orders against NGO inventory in one pass per NGO"
+
+    def add_arguments(self, parser):
+        add_ngo_argument(parser)
+
+    def handle(self, *args, **options):
+        ngos = selected_ngos(options["ngo"])
+        total = 0
+        for ngo in ngos:
+            report = allocate_open_orders(ngo)
+            total += len(report.allocated)
+            for order in report.allocated:
+                self.stdout.write(f"{ngo.username}: allocated order #{order.id} ({order.item_name} x {order.people_count})")
+            for order, available in report.unfilled:
+                self.stdout.write(self.style.WARNING(
+                    f"{ngo.username}: could not fill order #{order.id} "
+                    f"({order.item_name} x {order.people_count}, {available} available)"
+                ))
+        self.stdout.write(self.style.SUCCESS(f"Allocated {total} orders"))
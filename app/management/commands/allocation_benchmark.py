@@ -0,0 +1,34 @@
+# app/management/commands/allocation_benchmark.py
+from django.core.management.base import BaseCommand
+from app.replay import recorded_stream, replay, synthetic_stream
+from app.strategies import STRATEGIES, get_allocation_strategy
+
+
+class Command(BaseCommand):
+    help = "Replay a donation/order stream through each allocation strategy and compare waste"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", choices=["synthetic", "recorded"], default="synthetic",
+                            help="Generated stream, or the donations/orders recorded in the database.")
+        parser.add_argument("--strategy", action="append", choices=sorted(STRATEGIES), default=[],
+                            help="Strategy to run (repeatable). Defaults to all.")
+        parser.add_argument("--days", type=int, default=7)
+        parser.add_argument("--donations-per-day", type=int, default=40)
+        parser.add_argument("--orders-per-day", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["source"] == "recorded":
+            events = recorded_stream()
+        else:
+            events = synthetic_stream(options["days"], options["donations_per_day"],
+                                      options["orders_per_day"], options["seed"])
+        donations = sum(1 for e in events if e.kind == "donation")
+        self.stdout.write(f"{options['source']} stream: {donations} donations, {len(events) - donations} orders")
+
+        cols = ("strategy", "orders_filled", "orders_unfilled", "served_people",
+                "expired_servings", "avg_donor_score_served")
+        self.stdout.write("  ".join(f"{c:>22}" for c in cols))
+        for name in options["strategy"] or sorted(STRATEGIES):
+            result = replay(events, get_allocation_strategy(name))
+            self.stdout.write("  ".join(f"{result[c]!s:>22}" for c in cols))
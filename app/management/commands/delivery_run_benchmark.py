@@ -0,0 +1,38 @@
+# app/management/commands/delivery_run_benchmark.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from app.runs import SYNTHETIC_CITY_CENTRE, RunPlanner, batch_jobs, synthetic_jobs
+
+
+class Command(BaseCommand):
+    help = "Batch a synthetic city's orders into delivery runs and compare with one trip per order"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=300)
+        parser.add_argument("--city-km", type=float, default=15.0)
+        parser.add_argument("--capacity", type=int, default=None, help="Servings per vehicle.")
+        parser.add_argument("--max-orders", type=int, default=None, help="Drops per run.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        jobs = synthetic_jobs(options["orders"], now, seed=options["seed"], city_km=options["city_km"])
+        planner = RunPlanner(depot=(*SYNTHETIC_CITY_CENTRE, "depot"), now=now,
+                             capacity=options["capacity"], max_orders=options["max_orders"])
+
+        started = time.perf_counter()
+        single = [planner.route([j]) for j in jobs]
+        runs = batch_jobs(jobs, planner)
+        elapsed = time.perf_counter() - started
+
+        single_km = sum(r.distance_km for r in single)
+        batched_km = sum(r.distance_km for r in runs)
+        self.stdout.write(f"orders:               {len(jobs)}")
+        self.stdout.write(f"runs:                 {len(runs)} (avg {len(jobs) / max(1, len(runs)):.2f} orders/run)")
+        self.stdout.write(f"one trip per order:   {single_km:.1f} km, {sum(not r.on_time for r in single)} late")
+        self.stdout.write(f"batched runs:         {batched_km:.1f} km, {sum(not r.on_time for r in runs)} late")
+        if single_km:
+            self.stdout.write(f"distance saved:       {100 * (1 - batched_km / single_km):.1f}%")
+        self.stdout.write(f"planning time:        {elapsed:.2f}s")
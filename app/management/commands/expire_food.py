@@ -0,0 +1,15 @@
+# app/management/commands/expire_food.py
+from django.core.management.base import BaseCommand
+from app.expiry import expire_due_donations
+
+
+class Command(BaseCommand):
+    help = "Mark expired foods based on expires_at and notify donors (safe to run every minute)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000,
+                            help="Donations expired per UPDATE/transaction.")
+
+    def handle(self, *args, **options):
+        expired = expire_due_donations(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Expired {len(expired)} items"))
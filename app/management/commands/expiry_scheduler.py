@@ -0,0 +1,19 @@
+# app/management/commands/expiry_scheduler.py
+from django.core.management.base import BaseCommand
+from app.expiry import ExpiryScheduler
+
+
+class Command(BaseCommand):
+    help = "Run forever, expiring each donation as its expires_at passes (replaces expire_food in cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-seconds", type=float, default=None,
+                            help="How often to look for new or edited donations (default EXPIRY_POLL_SECONDS or 30).")
+
+    def handle(self, *args, **options):
+        scheduler = ExpiryScheduler(poll_seconds=options["poll_seconds"])
+        self.stdout.write(f"Expiry scheduler started (polling every {scheduler.poll_seconds}s)")
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            self.stdout.write("Expiry scheduler stopped")
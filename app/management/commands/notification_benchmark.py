@@ -0,0 +1,44 @@
+# app/management/commands/notification_benchmark.py
+import time
+
+from django.core.management.base import BaseCommand
+from app.models import OutboxMessage
+from app.transport import FakeTransport
+
+
+class Command(BaseCommand):
+    help = "Send synthetic notifications through the fake transport: one connection per message vs pooled batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=200)
+        parser.add_argument("--sms-share", type=float, default=0.3, help="Fraction of messages sent as SMS.")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--connect-ms", type=float, default=150.0, help="Simulated SMTP handshake.")
+        parser.add_argument("--send-ms", type=float, default=5.0, help="Simulated time per message.")
+        parser.add_argument("--rate", type=float, default=None,
+                            help="Messages per second per channel (default: unthrottled).")
+
+    def _run(self, messages, batch_size, options):
+        rate = options["rate"] or 1e9
+        transport = FakeTransport(options["connect_ms"] / 1000, options["send_ms"] / 1000,
+                                  email_rate=rate, sms_rate=rate)
+        started = time.perf_counter()
+        for start in range(0, len(messages), batch_size):
+            transport.send(messages[start:start + batch_size])
+        return time.perf_counter() - started, transport
+
+    def handle(self, *args, **options):
+        n = options["messages"]
+        sms_every = round(1 / options["sms_share"]) if options["sms_share"] > 0 else 0
+        messages = [
+            OutboxMessage(channel="SMS", to=f"+1555{i:07d}", body="benchmark")
+            if sms_every and i % sms_every == 0 else
+            OutboxMessage(channel="EMAIL", to=f"user{i}@example.org", subject="benchmark", body="benchmark")
+            for i in range(n)
+        ]
+        self.stdout.write(f"{n} messages, {sum(m.channel == 'SMS' for m in messages)} SMS")
+        for label, batch in (("connection per message", 1), (f"pooled, batches of {options['batch_size']}", options["batch_size"])):
+            elapsed, transport = self._run(messages, batch, options)
+            self.stdout.write(
+                f"{label:>28}: {elapsed:.2f}s, {n / elapsed:.0f} msg/s, {transport.connections} SMTP connections"
+            )
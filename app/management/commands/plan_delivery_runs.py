@@ -0,0 +1,23 @@
+# app/management/commands/plan_delivery_runs.py
+from django.core.management.base import BaseCommand
+from app.runs import plan_delivery_runs
+from app.management.commands._ngo import add_ngo_argument, selected_ngos
+
+
+class Command(BaseCommand):
+    help = "Group each NGO's allocated orders into delivery runs"
+
+    def add_arguments(self, parser):
+        add_ngo_argument(parser)
+
+    def handle(self, *args, **options):
+        ngos = selected_ngos(options["ngo"])
+        total = 0
+        for ngo in ngos:
+            for run in plan_delivery_runs(ngo):
+                total += 1
+                orders = sorted({s["order_id"] for s in run.route_json["stops"] if s["order_id"]})
+                line = (f"{ngo.username}: run #{run.id} orders {', '.join(f'#{o}' for o in orders)} "
+                        f"({run.distance_km} km)")
+                self.stdout.write(line if run.on_time else self.style.WARNING(line + " — late"))
+        self.stdout.write(self.style.SUCCESS(f"Planned {total} runs"))
@@ -0,0 +1,20 @@
+# app/management/commands/rebuild_donor_ratings.py
+from django.core.management.base import BaseCommand
+from app.ratings import decay_donor_ranks, rebuild_donor_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute every donor's rating sums, counts, averages and rank from NGORating/ReceiverRating"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--decay", action="store_true",
+                            help="Only decay rank scores to now (needs DONOR_RANK_HALF_LIFE_DAYS; "
+                                 "cheap enough to run daily).")
+
+    def handle(self, *args, **options):
+        if options["decay"]:
+            updated = decay_donor_ranks()
+            self.stdout.write(self.style.SUCCESS(f"Decayed rank scores of {updated} profiles"))
+            return
+        changed = rebuild_donor_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating totals; {changed} profiles changed"))
@@ -0,0 +1,15 @@
+# app/management/commands/rebuild_eligibility.py
+from django.core.management.base import BaseCommand
+from app.geo import rebuild_pending_eligibility
+
+
+class Command(BaseCommand):
+    help = "Recompute the eligible NGOs of every PENDING donation (NGO saves only refresh nearby ones)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000,
+                            help="Donations recomputed per batch.")
+
+    def handle(self, *args, **options):
+        rebuild_pending_eligibility(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS("Rebuilt eligible NGOs for pending donations"))
@@ -0,0 +1,26 @@
+# app/management/commands/reconcile_stock.py
+from django.core.management.base import BaseCommand
+from app.models import FoodItem
+from app.stock import reconcile_ngo_stock
+
+
+class Command(BaseCommand):
+    help = "Check the per-item NGO stock counters against FoodDonation rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Correct counters that have drifted.")
+
+    def handle(self, *args, **options):
+        drift = reconcile_ngo_stock(fix=options["fix"])
+        items = FoodItem.objects.in_bulk({item_id for (item_id, _), _, _ in drift})
+        for (item_id, ngo_id), counted, actual in drift:
+            name = items[item_id].key if item_id in items else f"#{item_id}"
+            self.stdout.write(self.style.WARNING(
+                f"ngo {ngo_id} / {name!r}: counter {counted}, donations {actual}"
+            ))
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Stock counters match donations"))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drift)} counters"))
+        else:
+            self.stdout.write(self.style.ERROR(f"{len(drift)} counters drifted; run with --fix to correct"))
@@ -0,0 +1,41 @@
+# app/management/commands/send_notifications.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from app.notifications import flush_digests
+from app.outbox import drain_outbox
+from app.transport import get_transport
+
+
+class Command(BaseCommand):
+    help = "Queue due digests, then send email/SMS notifications from the outbox, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100,
+                            help="Messages claimed per transaction.")
+        parser.add_argument("--forever", action="store_true",
+                            help="Keep polling instead of exiting once the outbox is empty.")
+        parser.add_argument("--poll-seconds", type=float, default=None,
+                            help="Sleep between polls with --forever (default OUTBOX_POLL_SECONDS or 5).")
+
+    def handle(self, *args, **options):
+        poll = options["poll_seconds"] or getattr(settings, "OUTBOX_POLL_SECONDS", 5)
+        transport = get_transport()
+        try:
+            while True:
+                close_old_connections()
+                digests = flush_digests()
+                if digests:
+                    self.stdout.write(f"Queued {digests} digests")
+                result = drain_outbox(options["batch_size"], transport=transport)
+                if sum(result) or not options["forever"]:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Sent {result.sent}, will retry {result.retried}, gave up on {result.failed}"
+                    ))
+                if not options["forever"]:
+                    return
+                time.sleep(poll)
+        except KeyboardInterrupt:
+            self.stdout.write("Notification worker stopped")
@@ -0,0 +1,11 @@
+# app/management/commands/snapshot_inventory.py
+from django.core.management.base import BaseCommand
+from app.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Fold new inventory ledger movements into snapshots (run periodically, e.g. from cron)"
+
+    def handle(self, *args, **options):
+        written = take_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} inventory snapshots"))
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:42
+
+import heapq
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# copies of the app.geo helpers as of this migration, so later changes there can't alter it
+EARTH_RADIUS_KM = 6371.0
+ELIGIBLE_NGO_COUNT = 2
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat = p2 - p1
+    dlon = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def backfill_pending_eligibility(apps, schema_editor):
+    FoodDonation = apps.get_model('app', 'FoodDonation')
+    NGOLocation = apps.get_model('app', 'NGOLocation')
+    points = list(NGOLocation.objects
+                  .filter(user__groups__name='NGO', lat__isnull=False, lng__isnull=False)
+                  .values_list('user_id', 'lat', 'lng')
+                  .distinct())
+    if not points:
+        return
+    through = FoodDonation.eligible_ngos.through
+    rows = []
+    pending = (FoodDonation.objects
+               .filter(status='PENDING', pickup_lat__isnull=False, pickup_lng__isnull=False)
+               .values_list('id', 'pickup_lat', 'pickup_lng'))
+    for pk, lat, lng in pending:
+        nearest = heapq.nsmallest(ELIGIBLE_NGO_COUNT, points, key=lambda p: haversine_km(lat, lng, p[1], p[2]))
+        rows.extend(through(fooddonation_id=pk, user_id=uid) for uid, _, _ in nearest)
+    through.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_ngolocation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fooddonation',
+            name='eligible_ngos',
+            field=models.ManyToManyField(blank=True, related_name='eligible_donations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_pending_eligibility, migrations.RunPython.noop),
+    ]
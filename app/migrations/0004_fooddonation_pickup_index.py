@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_fooddonation_eligible_ngos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fooddonation',
+            index=models.Index(fields=['pickup_lat', 'pickup_lng'], name='app_fooddon_pickup__8142ea_idx'),
+        ),
+    ]
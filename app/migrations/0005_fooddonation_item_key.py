@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def normalize_item_name(name):
+    # copy of app.stock.normalize_item_name as of this migration
+    return ' '.join(str(name or '').split()).casefold()
+
+
+def backfill_item_key(apps, schema_editor):
+    FoodDonation = apps.get_model('app', 'FoodDonation')
+    rows = list(FoodDonation.objects.only('id', 'item_name'))
+    for row in rows:
+        row.item_key = normalize_item_name(row.item_name)
+    FoodDonation.objects.bulk_update(rows, ['item_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_fooddonation_pickup_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fooddonation',
+            name='item_key',
+            field=models.CharField(default='', editable=False, max_length=120),
+        ),
+        migrations.RunPython(backfill_item_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='fooddonation',
+            index=models.Index(fields=['item_key', 'status'], name='app_fooddon_item_ke_5ef4a2_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_ngo_stock(apps, schema_editor):
+    FoodDonation = apps.get_model('app', 'FoodDonation')
+    NGOStock = apps.get_model('app', 'NGOStock')
+    rows = (FoodDonation.objects
+            .filter(status__in=['ACCEPTED', 'PARTIAL'], inventory_remaining__gt=0, accepted_by__isnull=False)
+            .values('item_key', 'accepted_by')
+            .annotate(stock=Sum('inventory_remaining'))
+            .order_by())
+    NGOStock.objects.bulk_create(
+        [NGOStock(item_key=r['item_key'], ngo_id=r['accepted_by'], quantity=r['stock']) for r in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_deliveryrun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NGOStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_key', models.CharField(max_length=120)),
+                ('quantity', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ngo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('item_key', 'ngo'), name='uniq_ngostock_item_ngo')],
+            },
+        ),
+        migrations.RunPython(backfill_ngo_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:20
+
+from django.db import migrations
+
+
+def normalize_item_name(name):
+    # copy of app.stock.normalize_item_name as of this migration
+    return ' '.join(str(name or '').split()).casefold()
+
+
+def backfill_items(apps, schema_editor):
+    FoodItem = apps.get_model('app', 'FoodItem')
+    FoodDonation = apps.get_model('app', 'FoodDonation')
+    ReceiverOrder = apps.get_model('app', 'ReceiverOrder')
+    NGOStock = apps.get_model('app', 'NGOStock')
+
+    items = {}
+
+    def item_for(name):
+        key = normalize_item_name(name)
+        if key not in items:
+            items[key], _ = FoodItem.objects.get_or_create(
+                key=key, defaults={'name': ' '.join(str(name or '').split())}
+            )
+        return items[key]
+
+    for model in (FoodDonation, ReceiverOrder):
+        rows = list(model.objects.order_by('id').only('id', 'item_name'))
+        for row in rows:
+            row.item = item_for(row.item_name)
+        model.objects.bulk_update(rows, ['item'], batch_size=500)
+
+    counters = list(NGOStock.objects.all())
+    for c in counters:
+        c.item = item_for(c.item_key)
+    NGOStock.objects.bulk_update(counters, ['item'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_fooditem'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_items, migrations.RunPython.noop),
+    ]
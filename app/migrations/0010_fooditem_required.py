@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_fooditem_backfill'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ngostock',
+            name='uniq_ngostock_item_ngo',
+        ),
+        migrations.RemoveField(
+            model_name='ngostock',
+            name='item_key',
+        ),
+        migrations.AlterField(
+            model_name='ngostock',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_counters', to='app.fooditem'),
+        ),
+        migrations.AddConstraint(
+            model_name='ngostock',
+            constraint=models.UniqueConstraint(fields=('item', 'ngo'), name='uniq_ngostock_item_ngo'),
+        ),
+        migrations.RemoveIndex(
+            model_name='fooddonation',
+            name='app_fooddon_item_ke_5ef4a2_idx',
+        ),
+        migrations.RemoveField(
+            model_name='fooddonation',
+            name='item_key',
+        ),
+        migrations.AlterField(
+            model_name='fooddonation',
+            name='item',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='donations', to='app.fooditem'),
+        ),
+        migrations.AlterField(
+            model_name='receiverorder',
+            name='item',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='app.fooditem'),
+        ),
+        migrations.AddIndex(
+            model_name='fooddonation',
+            index=models.Index(fields=['item', 'status'], name='app_fooddon_item_id_e7f781_idx'),
+        ),
+    ]
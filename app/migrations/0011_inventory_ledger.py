@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def opening_balances(apps, schema_editor):
+    """One ADJUST movement per stocked donation and per open reservation."""
+    FoodDonation = apps.get_model('app', 'FoodDonation')
+    Allocation = apps.get_model('app', 'Allocation')
+    InventoryMovement = apps.get_model('app', 'InventoryMovement')
+    rows = [
+        InventoryMovement(ngo_id=d.accepted_by_id, item_id=d.item_id, donation_id=d.id,
+                          kind='ADJUST', available=d.inventory_remaining)
+        for d in FoodDonation.objects.filter(status__in=['ACCEPTED', 'PARTIAL'], inventory_remaining__gt=0,
+                                             accepted_by__isnull=False)
+    ]
+    rows += [
+        InventoryMovement(ngo_id=a.donation.accepted_by_id, item_id=a.donation.item_id, donation_id=a.donation_id,
+                          order_id=a.order_id, kind='ADJUST', reserved=a.quantity)
+        for a in (Allocation.objects.filter(order__status='ALLOCATED', donation__accepted_by__isnull=False)
+                  .select_related('donation'))
+    ]
+    InventoryMovement.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_fooditem_required'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ACCEPT', 'Accepted into inventory'), ('RESERVE', 'Reserved for an order'), ('DELIVER', 'Delivered'), ('EXPIRE', 'Expired'), ('ADJUST', 'Adjusted')], max_length=10)),
+                ('available', models.IntegerField(default=0)),
+                ('reserved', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('donation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='app.fooddonation')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='app.fooditem')),
+                ('ngo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_movements', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='app.receiverorder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ngo', 'item', 'id'], name='app_invento_ngo_id_26a046_idx'), models.Index(fields=['created_at'], name='app_invento_created_01ec0a_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('available', models.IntegerField(default=0)),
+                ('reserved', models.IntegerField(default=0)),
+                ('last_movement_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='app.fooditem')),
+                ('ngo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ngo', 'item', '-last_movement_id'], name='app_invento_ngo_id_16bbe8_idx')],
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_totals(apps, schema_editor):
+    Profile = apps.get_model('app', 'Profile')
+    totals = {}
+    for prefix, model in (('ngo', 'NGORating'), ('receiver', 'ReceiverRating')):
+        rows = (apps.get_model('app', model).objects
+                .values('donor').annotate(s=Sum('stars'), c=Count('id')).order_by())
+        for r in rows:
+            totals.setdefault(r['donor'], {}).update({
+                f'{prefix}_rating_sum': r['s'],
+                f'{prefix}_rating_count': r['c'],
+                f'avg_{prefix}_rating': round(r['s'] / r['c'], 2),
+            })
+    for user_id, values in totals.items():
+        Profile.objects.filter(user_id=user_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_notification_digests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='ngo_rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='ngo_rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='receiver_rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='receiver_rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_totals, migrations.RunPython.noop),
+    ]
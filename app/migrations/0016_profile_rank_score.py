@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:31
+
+import app.ratings
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Value
+
+
+def backfill_rank(apps, schema_editor):
+    # undecayed; `rebuild_donor_ratings` applies DONOR_RANK_HALF_LIFE_DAYS if set.
+    # The prior is read from settings here, not through app.ratings, so later changes can't alter it.
+    Profile = apps.get_model('app', 'Profile')
+    mean = float(getattr(settings, 'DONOR_RANK_PRIOR_MEAN', 3.0))
+    prior = float(getattr(settings, 'DONOR_RANK_PRIOR_WEIGHT', 5))
+    stars = F('ngo_rating_sum') + F('receiver_rating_sum')
+    weight = F('ngo_rating_count') + F('receiver_rating_count')
+    Profile.objects.update(
+        rank_stars=stars,
+        rank_weight=weight,
+        rank_score=(Value(prior * mean) + stars) / (Value(prior) + weight),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_profile_rating_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='rank_decayed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rank_score',
+            field=models.FloatField(db_index=True, default=app.ratings.default_rank_score),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rank_stars',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rank_weight',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_rank, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,16 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
 from datetime import timedelta
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from .stock import normalize_item_name, stock_share
+from .ledger import donation_movements, record_movements
+from .tracking import TrackedFieldsMixin
+from .ratings import default_rank_score
 
 # Create your models here.
 #this is for customer support table
@@ -31,11 +37,112 @@ class Profile(models.Model):
     # Store running averages for convenience (also computable dynamically)
     avg_ngo_rating = models.FloatField(default=0.0)
     avg_receiver_rating = models.FloatField(default=0.0)
+    # running totals behind the averages, moved by app.ratings as ratings change
+    ngo_rating_sum = models.PositiveIntegerField(default=0)
+    ngo_rating_count = models.PositiveIntegerField(default=0)
+    receiver_rating_sum = models.PositiveIntegerField(default=0)
+    receiver_rating_count = models.PositiveIntegerField(default=0)
+    # Bayesian donor rank over both roles (app.ratings); browse and allocation order by rank_score
+    rank_stars = models.FloatField(default=0.0)
+    rank_weight = models.FloatField(default=0.0)
+    rank_decayed_at = models.DateTimeField(null=True, blank=True)
+    rank_score = models.FloatField(default=default_rank_score, db_index=True)
 
     def __str__(self):
         return f"Profile({self.user.username})"
 
-class FoodDonation(models.Model):
+class FoodItem(models.Model):
+    """
+    Catalog entry for one food. Donations and orders point here, so
+    " Veg  Biryani" and "veg biryani" share an item and its stock.
+    """
+    key = models.CharField(max_length=120, unique=True)  # normalize_item_name(name)
+    name = models.CharField(max_length=120)              # as first written
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def for_name(cls, name):
+        """The catalog item for a free-text name, created on first use."""
+        item, _ = cls.objects.get_or_create(
+            key=normalize_item_name(name),
+            defaults={"name": " ".join(str(name or "").split())},
+        )
+        return item
+
+
+def _needs_item(instance, kwargs) -> bool:
+    """Whether save() must (re)resolve instance.item from item_name."""
+    update_fields = kwargs.get("update_fields")
+    if instance.item_id is None:
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "item"}
+        return True
+    if update_fields is None:
+        # an unchanged name, or an already-loaded item that still matches it, saves the lookup
+        if instance.has_loaded("item_name") and "item_name" not in instance.changed_fields:
+            return False
+        field = type(instance)._meta.get_field("item")
+        return not (field.is_cached(instance) and instance.item.key == normalize_item_name(instance.item_name))
+    if "item_name" in update_fields:
+        kwargs["update_fields"] = {*update_fields, "item"}
+        return True
+    return False
+
+
+# FoodDonation fields behind its stock share, in stock_share() argument order
+_STOCK_FIELDS = ("item_id", "status", "accepted_by_id", "inventory_remaining")
+
+# statuses a donation can still expire from
+LIVE_STATUSES = ("PENDING", "ACCEPTED", "PARTIAL")
+
+
+class FoodDonationQuerySet(models.QuerySet):
+    """
+    Status as of `now` rather than as stored: a live donation past expires_at
+    counts as EXPIRED even before the expiry scheduler has written that, so
+    read-only views never need to save() to show the right state.
+    """
+
+    def _expired_q(self, now=None):
+        return Q(status="EXPIRED") | Q(status__in=LIVE_STATUSES, expires_at__lte=now or timezone.now())
+
+    def with_effective_status(self, now=None):
+        """Annotate each row with `effective_status`."""
+        return self.annotate(effective_status=Case(
+            When(status__in=LIVE_STATUSES, expires_at__lte=now or timezone.now(), then=Value("EXPIRED")),
+            default=F("status"),
+            output_field=models.CharField(),
+        ))
+
+    def with_status(self, *statuses, now=None):
+        """Rows whose effective status is one of `statuses`, as plain column filters so indexes apply."""
+        now = now or timezone.now()
+        match = Q(pk__in=[])
+        for status in statuses:
+            if status == "EXPIRED":
+                match |= self._expired_q(now)
+            elif status in LIVE_STATUSES:
+                match |= Q(status=status, expires_at__gt=now)
+            else:
+                match |= Q(status=status)
+        return self.filter(match)
+
+    def expired(self, now=None):
+        return self.filter(self._expired_q(now))
+
+    def unexpired(self, now=None):
+        return self.exclude(self._expired_q(now))
+
+    def available(self, now=None):
+        """Accepted stock that receivers can still order."""
+        return self.with_status("ACCEPTED", "PARTIAL", now=now).filter(inventory_remaining__gt=0)
+
+
+class FoodDonation(TrackedFieldsMixin, models.Model):
+    tracked_fields = _STOCK_FIELDS + ("item_name",)
+
     STATUS = (
         ("PENDING", "Pending NGO review"),
         ("ACCEPTED", "Accepted by NGO / In inventory"),
@@ -47,6 +154,8 @@ class FoodDonation(models.Model):
 
     donor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="donations")
     item_name = models.CharField(max_length=120)
+    # catalog entry for item_name; kept in sync by save()
+    item = models.ForeignKey(FoodItem, on_delete=models.PROTECT, related_name="donations", editable=False)
     description = models.TextField(blank=True)
 
     # Quantity in people-servings
@@ -70,6 +179,8 @@ class FoodDonation(models.Model):
 
     # If accepted, which NGO
     accepted_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="accepted_foods")
+    # NGOs nearest the pickup point, fixed at post time (rebuilt when NGO locations change)
+    eligible_ngos = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, related_name="eligible_donations")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -82,11 +193,80 @@ class FoodDonation(models.Model):
         related_name='donation_shadow'
     )
 
+    objects = FoodDonationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["pickup_lat", "pickup_lng"]),
+            models.Index(fields=["item", "status"]),
+            models.Index(fields=["status", "expires_at"]),
+        ]
+
     def __str__(self):
         return f"{self.item_name} by {self.donor.username} ({self.status})"
 
+    def stock_share(self):
+        """((item_id, ngo_id), servings) this donation adds to NGOStock, or None."""
+        return stock_share(self.item_id, self.status, self.accepted_by_id, self.inventory_remaining)
+
+    def stored_stock_share(self):
+        """
+        stock_share() as of the row in the database (None for unsaved donations),
+        read under a row lock. Only for writes that move stock: allocation
+        decrements inventory_remaining with F(), so the values loaded with
+        the instance may be stale by then.
+        """
+        row = self._stored_stock_row()
+        return stock_share(*row.values()) if row else None
+
+    def _stored_stock_row(self):
+        if self._state.adding or self.pk is None:
+            return None
+        return (type(self).objects.select_for_update().filter(pk=self.pk)
+                .values(*_STOCK_FIELDS).first())
+
+    def _skip_unchanged_stock_fields(self, kwargs) -> None:
+        """
+        Turn a full save() of a loaded donation into one that leaves out the
+        stock fields this instance did not change: allocation moves
+        inventory_remaining and status with F(), and a stale copy saved for
+        an unrelated edit must not write its old values back over that.
+        """
+        if self._state.adding or kwargs.get("update_fields") is not None or kwargs.get("force_insert"):
+            return
+        unchanged = {f for f in _STOCK_FIELDS if self.has_loaded(f)} - self.changed_fields
+        if unchanged:
+            kwargs["update_fields"] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.attname not in unchanged]
+
+    def _written_stock_fields(self, update_fields):
+        if update_fields is None:
+            return _STOCK_FIELDS
+        attnames = {self._meta.get_field(name).attname for name in update_fields}
+        return tuple(f for f in _STOCK_FIELDS if f in attnames)
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            if _needs_item(self, kwargs):
+                self.item = FoodItem.for_name(self.item_name)
+            self._skip_unchanged_stock_fields(kwargs)
+            written = self._written_stock_fields(kwargs.get("update_fields"))
+            if not written:
+                # moves no stock: a single UPDATE, no read of the row first
+                super().save(*args, **kwargs)
+                return
+            row = self._stored_stock_row()
+            super().save(*args, **kwargs)
+            if row is None:
+                before, after = None, self.stock_share()
+            else:
+                before = stock_share(*row.values())
+                row.update({f: getattr(self, f) for f in written})
+                after = stock_share(*row.values())
+            record_movements(donation_movements(self, before, after))
+
     def mark_expired_if_needed(self):
-        if self.status in ("PENDING", "ACCEPTED", "PARTIAL") and timezone.now() > self.expires_at:
+        if self.status in LIVE_STATUSES and timezone.now() > self.expires_at:
             self.status = "EXPIRED"
             self.inventory_remaining = 0
             self.save(update_fields=["status", "inventory_remaining"])
@@ -140,6 +320,8 @@ class FoodDonation(models.Model):
 
 
 class NGOInventory(models.Model):
+    # Legacy per-donation mirror of inventory_remaining. No longer written:
+    # stock history is in InventoryMovement, current stock in NGOStock.
     ngo = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="ngo_inventory")
     food = models.OneToOneField(FoodDonation, on_delete=models.CASCADE, related_name="inventory")
     quantity_remaining = models.PositiveIntegerField(default=0)
@@ -149,7 +331,91 @@ class NGOInventory(models.Model):
         return f"Inventory({self.ngo.username}: {self.food.item_name} -> {self.quantity_remaining})"
 
 
-class NGORating(models.Model):
+class NGOStock(models.Model):
+    """
+    Servings of one item an NGO has in stock: the sum of inventory_remaining
+    over its ACCEPTED/PARTIAL donations of that item. Moved together with the
+    inventory ledger (app.ledger.record_movements); `manage.py reconcile_stock`
+    checks it.
+    """
+    item = models.ForeignKey(FoodItem, on_delete=models.CASCADE, related_name="stock_counters")
+    ngo = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="stock_counters")
+    quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["item", "ngo"], name="uniq_ngostock_item_ngo"),
+        ]
+
+    def __str__(self):
+        return f"NGOStock({self.ngo_id}: {self.item_id} -> {self.quantity})"
+
+
+class InventoryMovement(models.Model):
+    """
+    Append-only ledger of stock changes. `available` is the change in servings
+    on hand, `reserved` the change in servings promised to orders but not yet
+    delivered. Written through app.ledger.record_movements.
+    """
+    KINDS = (
+        ("ACCEPT", "Accepted into inventory"),
+        ("RESERVE", "Reserved for an order"),
+        ("DELIVER", "Delivered"),
+        ("EXPIRE", "Expired"),
+        ("ADJUST", "Adjusted"),
+    )
+
+    ngo = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="inventory_movements")
+    item = models.ForeignKey(FoodItem, on_delete=models.PROTECT, related_name="movements")
+    donation = models.ForeignKey(FoodDonation, on_delete=models.SET_NULL, null=True, blank=True, related_name="movements")
+    order = models.ForeignKey("ReceiverOrder", on_delete=models.SET_NULL, null=True, blank=True, related_name="movements")
+    kind = models.CharField(max_length=10, choices=KINDS)
+    available = models.IntegerField(default=0)
+    reserved = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ngo", "item", "id"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.available:+d}/{self.reserved:+d} ({self.ngo_id}: {self.item_id})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Inventory movements are append-only.")
+        super().save(*args, **kwargs)
+
+
+class InventorySnapshot(models.Model):
+    """
+    Running totals of the ledger for one (NGO, item) up to and including
+    movement `last_movement_id`; current stock is the latest snapshot plus the
+    movements after it. Written by `manage.py snapshot_inventory`.
+    """
+    ngo = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="inventory_snapshots")
+    item = models.ForeignKey(FoodItem, on_delete=models.CASCADE, related_name="snapshots")
+    available = models.IntegerField(default=0)
+    reserved = models.IntegerField(default=0)
+    last_movement_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ngo", "item", "-last_movement_id"]),
+        ]
+
+    def __str__(self):
+        return f"Snapshot({self.ngo_id}: {self.item_id} @ {self.last_movement_id})"
+
+
+class NGORating(TrackedFieldsMixin, models.Model):
+    tracked_fields = ("donor_id", "stars")
+    status_field = None
+
     donor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="ngo_ratings_received")
     food = models.ForeignKey(FoodDonation, on_delete=models.CASCADE, related_name="ngo_ratings")
     ngo = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="ngo_ratings_given")
@@ -157,7 +423,10 @@ class NGORating(models.Model):
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-class ReceiverRating(models.Model):
+class ReceiverRating(TrackedFieldsMixin, models.Model):
+    tracked_fields = ("donor_id", "stars")
+    status_field = None
+
     donor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="receiver_ratings_received")
     food = models.ForeignKey(FoodDonation, on_delete=models.CASCADE, related_name="receiver_ratings")
     receiver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="receiver_ratings_given")
@@ -247,7 +516,23 @@ class FoodRequest(models.Model):
             if self.people_count > self.food.remaining_people():
                 raise ValidationError("Requested quantity exceeds available inventory.")
 
-class Delivery(models.Model):
+class DeliveryRun(models.Model):
+    """
+    One vehicle trip that serves several orders: every pickup first, then the
+    drops. Planned by app.runs; route_json holds the stops in driving order.
+    """
+    ngo = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="delivery_runs")
+    route_json = models.JSONField(default=dict, blank=True)
+    distance_km = models.FloatField(default=0)
+    planned_finish_at = models.DateTimeField(null=True, blank=True)
+    on_time = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"DeliveryRun #{self.pk} ({self.ngo.username})"
+
+
+class Delivery(TrackedFieldsMixin, models.Model):
     STATUS = (
         ("PICKED_UP", "Picked up from donor"),
         ("IN_TRANSIT", "In transit"),
@@ -260,6 +545,7 @@ class Delivery(models.Model):
     live_lat = models.FloatField(null=True, blank=True)
     live_lng = models.FloatField(null=True, blank=True)
     route_json = models.JSONField(default=dict, blank=True)
+    run = models.ForeignKey(DeliveryRun, on_delete=models.SET_NULL, null=True, blank=True, related_name="deliveries")
     started_at = models.DateTimeField(auto_now_add=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
 
@@ -268,32 +554,26 @@ class Delivery(models.Model):
 
 # hopemeals/models.py  (APPEND at end)
 from django.core.exceptions import ValidationError
-from django.db.models import Sum
+from django.db.models import Sum, F, Value, Case, When
+from django.db.models.functions import Coalesce
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-def composite_donor_rating(user):
+def donor_rank_expression(prefix: str = "donor__profile__"):
     """
-    Composite = average of donor's avg NGO rating and avg Receiver rating.
-    Falls back to 0.0 if none.
+    Profile.rank_score through `prefix` for annotate()/order_by(); a donor
+    without a profile ranks at the prior mean, like one nobody has rated.
     """
-    try:
-        p = user.profile
-        have = []
-        if p.avg_ngo_rating > 0:
-            have.append(p.avg_ngo_rating)
-        if p.avg_receiver_rating > 0:
-            have.append(p.avg_receiver_rating)
-        return round(sum(have)/len(have), 3) if have else 0.0
-    except Profile.DoesNotExist:
-        return 0.0
-
-
-class ReceiverOrder(models.Model):
+    return Coalesce(F(f"{prefix}rank_score"), Value(default_rank_score()), output_field=models.FloatField())
+
+
+class ReceiverOrder(TrackedFieldsMixin, models.Model):
     """
     A receiver's request that can be satisfied by *multiple* FoodDonations
     of the same item_name that belong to the SAME NGO.
     """
+    tracked_fields = ("status", "item_name")
+
     STATUS = (
         ("REQUESTED", "Requested"),
         ("APPROVED", "Approved"),
@@ -305,6 +585,8 @@ class ReceiverOrder(models.Model):
     receiver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="orders")
     ngo = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="orders_to_fulfil")
     item_name = models.CharField(max_length=120)
+    # catalog entry for item_name; kept in sync by save()
+    item = models.ForeignKey(FoodItem, on_delete=models.PROTECT, related_name="orders", editable=False)
     people_count = models.PositiveIntegerField(validators=[MinValueValidator(1)])
 
     delivery_lat = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
@@ -321,6 +603,11 @@ class ReceiverOrder(models.Model):
     def total_allocated(self):
         return self.allocations.aggregate(s=Sum("quantity"))["s"] or 0
 
+    def save(self, *args, **kwargs):
+        if _needs_item(self, kwargs):
+            self.item = FoodItem.for_name(self.item_name)
+        super().save(*args, **kwargs)
+
 
 class Allocation(models.Model):
     """
@@ -359,3 +646,62 @@ class NGOLocation(models.Model):
 
     def __str__(self):
         return f"NGOLocation({self.user.username})"
+
+
+class OutboxMessage(models.Model):
+    """
+    An email or SMS waiting to be sent. Rows are written by app.dispatch, in
+    the transaction of the change they announce or, for notices coalesced
+    over a request, once that change has committed; `manage.py
+    send_notifications` (app.outbox) sends them, so a rolled-back change
+    sends nothing and a slow SMTP or Twilio call never holds a request open.
+    """
+    CHANNELS = (
+        ("EMAIL", "Email"),
+        ("SMS", "SMS"),
+    )
+    STATUS = (
+        ("PENDING", "Waiting to be sent"),
+        ("SENT", "Sent"),
+        ("FAILED", "Gave up"),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="outbox_messages")
+    channel = models.CharField(max_length=5, choices=CHANNELS)
+    to = models.CharField(max_length=254)  # email address or phone number
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+
+    status = models.CharField(max_length=8, choices=STATUS, default="PENDING")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.to} ({self.status})"
+
+
+class DigestEntry(models.Model):
+    """
+    A low-priority notification held back by notify_user(..., kind=...) and
+    folded into the user's next digest (app.notifications.flush_digests).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="digest_entries")
+    kind = models.CharField(max_length=20)
+    summary = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.user_id}"
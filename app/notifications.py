@@ -1,7 +1,13 @@
 # app/notifications.py
+from datetime import timedelta
+from functools import lru_cache
 from typing import Optional
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
 
 try:
     from twilio.rest import Client as TwilioClient
@@ -11,54 +17,148 @@ except Exception:
 
 # --------------- Low-level helpers ---------------
 
+@lru_cache(maxsize=4)
+def _cached_twilio_client(sid: str, token: str) -> Optional["TwilioClient"]:
+    try:
+        return TwilioClient(sid, token)
+    except Exception:
+        return None
+
+
 def _twilio_client() -> Optional["TwilioClient"]:
+    """One client (and its HTTP session) per process and credentials."""
     if not TwilioClient:
         return None
     sid = getattr(settings, "TWILIO_ACCOUNT_SID", "")
     token = getattr(settings, "TWILIO_AUTH_TOKEN", "")
     if not (sid and token):
         return None
-    try:
-        return TwilioClient(sid, token)
-    except Exception:
-        return None
+    return _cached_twilio_client(sid, token)
 
 
-def send_email_notification(to_email: str, subject: str, body: str) -> None:
+class NotDeliverable(Exception):
+    """The message can never be sent (no address, or the channel is not configured)."""
+
+
+def from_email() -> str:
+    return getattr(settings, "DEFAULT_FROM_EMAIL", "") or getattr(settings, "EMAIL_HOST_USER", "")
+
+
+def deliver_email(to_email: str, subject: str, body: str) -> None:
+    """Send one email now, on its own connection; raises on failure."""
     if not to_email:
-        return
+        raise NotDeliverable("no email address")
+    send_mail(subject, body, from_email(), [to_email], fail_silently=False)
+
+
+def deliver_sms(to_number: str, body: str) -> None:
+    """Send one SMS now; raises on failure."""
+    if not to_number:
+        raise NotDeliverable("no phone number")
+    client = _twilio_client()
+    from_num = getattr(settings, "TWILIO_FROM_NUMBER", "")
+    if not (client and from_num):
+        raise NotDeliverable("Twilio is not configured")
+    client.messages.create(to=to_number, from_=from_num, body=body)
+
+
+def send_email_notification(to_email: str, subject: str, body: str) -> None:
+    """Best-effort immediate email (bypasses the outbox)."""
     try:
-        from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "") or getattr(settings, "EMAIL_HOST_USER", "")
-        send_mail(subject, body, from_email, [to_email], fail_silently=True)
+        deliver_email(to_email, subject, body)
     except Exception:
         pass
 
 
 def send_sms_notification(to_number: str, body: str) -> None:
-    if not to_number:
-        return
-    client = _twilio_client()
-    if not client:
-        return
-    from_num = getattr(settings, "TWILIO_FROM_NUMBER", "")
-    if not from_num:
-        return
+    """Best-effort immediate SMS (bypasses the outbox)."""
     try:
-        client.messages.create(to=to_number, from_=from_num, body=body)
+        deliver_sms(to_number, body)
     except Exception:
         pass
 
 
-def notify_user(user, subject: str, body: str) -> None:
+# low-priority kinds that are folded into per-user digests
+DEFAULT_DIGEST_KINDS = ("rating", "allocation")
+
+
+def digest_window() -> timedelta:
+    """NOTIFICATION_DIGEST_SECONDS (default 3600); 0 sends every notification on its own."""
+    return timedelta(seconds=getattr(settings, "NOTIFICATION_DIGEST_SECONDS", 3600))
+
+
+def _digested(kind: Optional[str]) -> bool:
+    return bool(kind) and kind in getattr(settings, "NOTIFICATION_DIGEST_KINDS", DEFAULT_DIGEST_KINDS) \
+        and digest_window() > timedelta(0)
+
+
+def notify_user(user, subject: str, body: str, kind: Optional[str] = None,
+                summary: Optional[str] = None, sms_body: Optional[str] = None) -> list:
+    """
+    Queue an email (and an SMS if the profile has a phone) for `user` in the
+    outbox; `manage.py send_notifications` sends it. The rows are written in
+    the caller's transaction. Call it through
+    app.dispatch.dispatch_notification from code that writes, so repeated
+    notices within a request are coalesced and a rolled-back one is dropped.
+
+    When `kind` is one of NOTIFICATION_DIGEST_KINDS (default: ratings and
+    allocations) only `summary` (or the body) is stored, to go out in the
+    user's next digest. `sms_body` replaces the body for the SMS.
+    """
+    from .models import DigestEntry, OutboxMessage  # local import to avoid circulars
+    if _digested(kind):
+        rows = [DigestEntry.objects.create(user=user, kind=kind, summary=summary or body)]
+        return rows
     email = getattr(user, "email", "") or ""
     phone = ""
     # optional: user.profile.phone
     prof = getattr(user, "profile", None)
     if prof:
         phone = getattr(prof, "phone", "") or ""
-    send_email_notification(email, subject, body)
+    rows = []
+    if email:
+        rows.append(OutboxMessage(user=user, channel="EMAIL", to=email, subject=subject, body=body))
     if phone:
-        send_sms_notification(phone, body)
+        rows.append(OutboxMessage(user=user, channel="SMS", to=phone, subject=subject, body=sms_body or body))
+    return OutboxMessage.objects.bulk_create(rows) if rows else []
+
+
+def flush_digests(now=None) -> int:
+    """
+    Send one digest to every user whose oldest held entry is a full
+    window old, covering all of their held entries. Returns how many digests
+    were queued.
+    """
+    from django.contrib.auth import get_user_model
+    from .models import DigestEntry  # local import to avoid circulars
+    now = now or timezone.now()
+    due_users = list(DigestEntry.objects
+                     .values("user")
+                     .annotate(first=Min("created_at"))
+                     .filter(first__lte=now - digest_window())
+                     .values_list("user", flat=True))
+    users = get_user_model().objects.select_related("profile").in_bulk(due_users)
+    sent = 0
+    for user_id in due_users:
+        with transaction.atomic():
+            entries = list(DigestEntry.objects
+                           .select_for_update(skip_locked=True)
+                           .filter(user_id=user_id, created_at__lte=now)
+                           .order_by("created_at", "id"))
+            if not entries or user_id not in users:
+                continue
+            user = users[user_id]
+            lines = "\n".join(f"- {e.summary}" for e in entries)
+            notify_user(
+                user,
+                f"[HopeMeals] {len(entries)} update{'s' if len(entries) != 1 else ''} on your donations",
+                f"Hi {getattr(user, 'get_full_name', lambda: '')() or user.username},\n\n"
+                f"Here is what happened since your last update:\n{lines}",
+                sms_body=f"HopeMeals: {len(entries)} updates on your donations. Details are in your email.",
+            )
+            DigestEntry.objects.filter(pk__in=[e.pk for e in entries]).delete()
+            sent += 1
+    return sent
 
 
 # --------------- High-level helpers used by signals/views ---------------
@@ -86,6 +186,19 @@ def notify_donor_food_expired(food):
     notify_user(donor, subject, body)
 
 
+def notify_donor_foods_expired(donor, item_names):
+    """Donor: one message for every donation of theirs that just expired."""
+    if len(item_names) == 1:
+        what = f"Your donation '{item_names[0]}' has expired."
+    else:
+        what = "These donations have expired:\n" + "\n".join(f"- {name}" for name in item_names)
+    body = (
+        f"Hi {getattr(donor, 'get_full_name', lambda: '')() or donor.username},\n\n"
+        f"{what}"
+    )
+    notify_user(donor, "[HopeMeals] Your donation expired", body)
+
+
 def notify_receiver_request_accepted(order):
     """Receiver: their request was accepted (order created)."""
     r = order.receiver
@@ -113,6 +226,39 @@ def notify_receiver_order_status(order):
     notify_user(r, subject, body)
 
 
+def notify_order_approved(order):
+    """Receiver: order approved; each allocated donor: how much of their donation it took."""
+    notify_user(
+        order.receiver,
+        f"[HopeMeals] Your request for {order.item_name} is approved",
+        f"Hi {order.receiver.username}, your order #{order.id} for {order.people_count} people "
+        f"has been approved and is being prepared.",
+    )
+    for a in order.allocations.select_related("donation__donor__profile", "donation"):
+        summary = (f"Your donation '{a.donation.item_name}' has {a.quantity} people allocated "
+                   f"to receiver order #{order.id}.")
+        notify_user(
+            a.donation.donor,
+            f"[HopeMeals] Allocation for your donation #{a.donation.id}",
+            f"{summary} Thank you!",
+            kind="allocation", summary=summary,
+        )
+
+
+def notify_receiver_delivery_status(delivery):
+    """Receiver: their delivery was picked up or is on its way."""
+    order = delivery.order
+    r = order.receiver
+    item = _order_item_label(order)
+    status = str(delivery.status).replace("_", " ").title()
+    notify_user(
+        r,
+        f"[HopeMeals] Order update: {status}",
+        f"Hi {getattr(r, 'get_full_name', lambda: '')() or r.username},\n\n"
+        f"Your order for '{item}' is now {status}.",
+    )
+
+
 # app/notifications.py (add this helper near the top with the others)
 
 def _order_item_label(order) -> str:
@@ -0,0 +1,91 @@
+# app/outbox.py
+"""
+Sending side of the notification outbox (OutboxMessage). A worker claims a
+batch of due rows in one short locked transaction, sends them with no
+transaction open, then records the results. Failed sends are retried with
+exponential backoff; a worker that dies mid-batch leaves its rows to be
+picked up again once their lease runs out.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxMessage
+from .notifications import NotDeliverable
+from .transport import get_transport
+
+OutboxResult = namedtuple("OutboxResult", ["sent", "retried", "failed"])
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """OUTBOX_RETRY_SECONDS (default 60) doubled per failed attempt, capped at OUTBOX_RETRY_MAX_SECONDS (default 3600)."""
+    base = _setting("OUTBOX_RETRY_SECONDS", 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), _setting("OUTBOX_RETRY_MAX_SECONDS", 3600)))
+
+
+def claim_batch(batch_size: int = 100, now=None) -> List[OutboxMessage]:
+    """
+    Lease up to batch_size due messages to this worker for
+    OUTBOX_LEASE_SECONDS (default 300) and count the attempt.
+    """
+    now = now or timezone.now()
+    lease = timedelta(seconds=_setting("OUTBOX_LEASE_SECONDS", 300))
+    with transaction.atomic():
+        ids = list(OutboxMessage.objects
+                   .select_for_update(skip_locked=True)
+                   .filter(status="PENDING", next_attempt_at__lte=now)
+                   .order_by("next_attempt_at", "id")
+                   .values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return []
+        OutboxMessage.objects.filter(pk__in=ids).update(attempts=F("attempts") + 1, next_attempt_at=now + lease)
+    return list(OutboxMessage.objects.filter(pk__in=ids).order_by("id"))
+
+
+def send_batch(batch_size: int = 100, now=None, transport=None) -> OutboxResult:
+    """Claim, send and record one batch; the whole batch goes through one transport call."""
+    now = now or timezone.now()
+    messages = claim_batch(batch_size, now)
+    if not messages:
+        return OutboxResult(0, 0, 0)
+    errors = (transport or get_transport()).send(messages)
+    max_attempts = _setting("OUTBOX_MAX_ATTEMPTS", 5)
+    sent = retried = failed = 0
+    done_at = timezone.now()
+    for m, error in zip(messages, errors):
+        if error is None:
+            m.status, m.sent_at, m.last_error = "SENT", done_at, ""
+            sent += 1
+        elif isinstance(error, NotDeliverable):
+            m.status, m.last_error = "FAILED", str(error)
+            failed += 1
+        else:
+            m.last_error = f"{type(error).__name__}: {error}"
+            if m.attempts >= max_attempts:
+                m.status = "FAILED"
+                failed += 1
+            else:
+                m.next_attempt_at = done_at + retry_delay(m.attempts)
+                retried += 1
+    OutboxMessage.objects.bulk_update(messages, ["status", "sent_at", "next_attempt_at", "last_error"])
+    return OutboxResult(sent, retried, failed)
+
+
+def drain_outbox(batch_size: int = 100, now=None, transport=None) -> OutboxResult:
+    """Send batches until nothing is due, all through one transport (and its rate limits)."""
+    transport = transport or get_transport()
+    total = OutboxResult(0, 0, 0)
+    while True:
+        result = send_batch(batch_size, now, transport)
+        total = OutboxResult(*(a + b for a, b in zip(total, result)))
+        if sum(result) < batch_size:
+            return total
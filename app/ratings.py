@@ -0,0 +1,218 @@
+# app/ratings.py
+"""
+Donor rating aggregates on Profile: a running sum and count per rater role,
+moved with F-expressions as ratings are created, edited or deleted, so a new
+rating costs one UPDATE however many ratings the donor already has. The
+avg_* columns are recomputed from the new totals in the same statement.
+
+Profile.rank_score is the indexed score browse and allocation order by: a
+Bayesian average of all the donor's ratings, both roles pooled, pulled toward
+DONOR_RANK_PRIOR_MEAN (default 3.0) with the weight of DONOR_RANK_PRIOR_WEIGHT
+(default 5) ratings, so one 5-star rating doesn't outrank a long record of
+4s. With DONOR_RANK_HALF_LIFE_DAYS set, each rating's weight halves every
+that many days; run `rebuild_donor_ratings --decay` on a schedule so donors
+nobody rates drift back toward the prior too. After changing any of these
+settings, run `rebuild_donor_ratings`.
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+# role -> (sum column, count column, average column) on Profile
+ROLE_FIELDS = {
+    "NGO": ("ngo_rating_sum", "ngo_rating_count", "avg_ngo_rating"),
+    "RECEIVER": ("receiver_rating_sum", "receiver_rating_count", "avg_receiver_rating"),
+}
+# Profile columns behind rank_score
+RANK_FIELDS = ("rank_stars", "rank_weight", "rank_decayed_at", "rank_score")
+
+
+def rank_prior():
+    """(prior mean, prior weight) of the Bayesian rank."""
+    return (float(getattr(settings, "DONOR_RANK_PRIOR_MEAN", 3.0)),
+            float(getattr(settings, "DONOR_RANK_PRIOR_WEIGHT", 5)))
+
+
+def rank_half_life() -> Optional[timedelta]:
+    days = getattr(settings, "DONOR_RANK_HALF_LIFE_DAYS", None)
+    return timedelta(days=days) if days else None
+
+
+def default_rank_score() -> float:
+    """Rank of a donor nobody has rated yet."""
+    return rank_prior()[0]
+
+
+def rank_score(stars: float, weight: float) -> float:
+    mean, prior = rank_prior()
+    return (prior * mean + stars) / (prior + weight)
+
+
+def _rank_expression(stars, weight):
+    mean, prior = rank_prior()
+    return (Value(prior * mean) + stars) / (Value(prior) + weight)
+
+
+def decay_factor(elapsed: timedelta, half_life: Optional[timedelta]) -> float:
+    """How much of a rating's weight is left after `elapsed` (1.0 without a half-life)."""
+    if half_life is None or elapsed <= timedelta(0):
+        return 1.0
+    return 0.5 ** (elapsed / half_life)
+
+
+def _decay_to(profile, now, half_life) -> None:
+    """Bring a profile's decayed rank sums forward to `now`, in memory."""
+    if profile.rank_decayed_at is not None:
+        f = decay_factor(now - profile.rank_decayed_at, half_life)
+        profile.rank_stars *= f
+        profile.rank_weight *= f
+    profile.rank_decayed_at = now
+
+
+def _average(total, count):
+    return Case(
+        When(GreaterThan(count, 0), then=Round(Cast(total, FloatField()) / count, 2)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def _update_profile(donor_id: int, changes) -> None:
+    from .models import Profile  # local import to avoid circulars
+    if not Profile.objects.filter(user_id=donor_id).update(**changes):
+        Profile.objects.get_or_create(user_id=donor_id)
+        Profile.objects.filter(user_id=donor_id).update(**changes)
+
+
+def _adjust_decayed_rank(donor_id: int, stars: float, weight: float, now) -> None:
+    """Decay one donor's rank sums to `now`, add the change and store the new score."""
+    from .models import Profile  # local import to avoid circulars
+    profile = Profile.objects.select_for_update().only("id", *RANK_FIELDS).get(user_id=donor_id)
+    _decay_to(profile, now, rank_half_life())
+    profile.rank_stars = max(profile.rank_stars + stars, 0.0)
+    profile.rank_weight = max(profile.rank_weight + weight, 0.0)
+    profile.rank_score = rank_score(profile.rank_stars, profile.rank_weight)
+    profile.save(update_fields=RANK_FIELDS)
+
+
+def adjust_donor_rating(donor_id: int, role: str, stars_delta: int, count_delta: int,
+                        rated_at=None) -> None:
+    """
+    Move one donor's totals for `role` ("NGO" or "RECEIVER") and refresh the
+    average and rank. `rated_at` is when the rating was first made; with a
+    half-life set, the change counts toward the rank with that rating's
+    remaining weight.
+    """
+    if not (stars_delta or count_delta):
+        return
+    sum_f, count_f, avg_f = ROLE_FIELDS[role]
+    total = F(sum_f) + stars_delta
+    count = F(count_f) + count_delta
+    changes = {sum_f: total, count_f: count, avg_f: _average(total, count)}
+    half_life = rank_half_life()
+    with transaction.atomic(savepoint=False):
+        if half_life is None:
+            stars, weight = F("rank_stars") + stars_delta, F("rank_weight") + count_delta
+            changes.update(rank_stars=stars, rank_weight=weight, rank_score=_rank_expression(stars, weight))
+            _update_profile(donor_id, changes)
+            return
+        _update_profile(donor_id, changes)
+        now = timezone.now()
+        w = decay_factor(now - (rated_at or now), half_life)
+        _adjust_decayed_rank(donor_id, stars_delta * w, count_delta * w, now)
+
+
+def rating_saved(role: str, rating, created: bool) -> None:
+    """Apply a created or edited rating, using the donor and stars it was loaded with."""
+    at = rating.created_at
+    if created:
+        adjust_donor_rating(rating.donor_id, role, rating.stars, 1, at)
+        return
+    old_donor = rating.loaded_value("donor_id", rating.donor_id)
+    old_stars = rating.loaded_value("stars", rating.stars)
+    if old_donor == rating.donor_id:
+        adjust_donor_rating(rating.donor_id, role, rating.stars - old_stars, 0, at)
+    else:
+        adjust_donor_rating(old_donor, role, -old_stars, -1, at)
+        adjust_donor_rating(rating.donor_id, role, rating.stars, 1, at)
+
+
+def rating_deleted(role: str, rating) -> None:
+    adjust_donor_rating(rating.loaded_value("donor_id", rating.donor_id), role,
+                        -rating.loaded_value("stars", rating.stars), -1, rating.created_at)
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+def rebuild_donor_ratings(now=None) -> int:
+    """
+    Recompute every profile's totals, averages and rank from the rating
+    tables (each rating decayed from its created_at to `now` when a half-life
+    is set). Returns how many profiles changed.
+    """
+    from .models import NGORating, Profile, ReceiverRating  # local import to avoid circulars
+    now = now or timezone.now()
+    half_life = rank_half_life()
+    actual = defaultdict(dict)
+    rank = defaultdict(lambda: [0.0, 0.0])  # donor -> [decayed stars, decayed weight]
+    for role, model in (("NGO", NGORating), ("RECEIVER", ReceiverRating)):
+        for r in model.objects.values("donor").annotate(s=Sum("stars"), c=Count("id")).order_by():
+            actual[r["donor"]][role] = (r["s"], r["c"])
+            if half_life is None:
+                rank[r["donor"]][0] += r["s"]
+                rank[r["donor"]][1] += r["c"]
+        if half_life is not None:
+            for donor_id, stars, at in model.objects.values_list("donor", "stars", "created_at").iterator():
+                w = decay_factor(now - at, half_life)
+                rank[donor_id][0] += stars * w
+                rank[donor_id][1] += w
+
+    fields = [f for cols in ROLE_FIELDS.values() for f in cols] + list(RANK_FIELDS)
+    changed = []
+    with transaction.atomic():
+        for p in Profile.objects.select_for_update().only("id", "user_id", *fields):
+            before = [getattr(p, f) for f in fields]
+            for role, (sum_f, count_f, avg_f) in ROLE_FIELDS.items():
+                total, count = actual[p.user_id].get(role, (0, 0))
+                setattr(p, sum_f, total)
+                setattr(p, count_f, count)
+                setattr(p, avg_f, round(total / count, 2) if count else 0.0)
+            p.rank_stars, p.rank_weight = (float(v) for v in rank[p.user_id])
+            p.rank_score = rank_score(p.rank_stars, p.rank_weight)
+            p.rank_decayed_at = now if half_life and p.rank_weight else None
+            if not all(_same(a, getattr(p, f)) for a, f in zip(before, fields)):
+                changed.append(p)
+        Profile.objects.bulk_update(changed, fields, batch_size=500)
+    return len(changed)
+
+
+def decay_donor_ranks(now=None) -> int:
+    """
+    Decay every rated donor's rank to `now` without reading the rating
+    tables (one pass over the profiles). A no-op without a half-life.
+    Returns how many profiles were updated.
+    """
+    from .models import Profile  # local import to avoid circulars
+    half_life = rank_half_life()
+    if half_life is None:
+        return 0
+    now = now or timezone.now()
+    with transaction.atomic():
+        profiles = list(Profile.objects.select_for_update().filter(rank_weight__gt=0).only("id", *RANK_FIELDS))
+        for p in profiles:
+            _decay_to(p, now, half_life)
+            p.rank_score = rank_score(p.rank_stars, p.rank_weight)
+        Profile.objects.bulk_update(profiles, RANK_FIELDS, batch_size=500)
+    return len(profiles)
@@ -0,0 +1,143 @@
+# app/routing.py
+"""
+Pickup ordering for a delivery: start at the NGO (when it has a location),
+visit every allocated donation, finish at the receiver.
+
+The distance matrix is pluggable through ROUTE_DISTANCE_MATRIX (dotted path
+to a callable taking [(lat, lng), ...] and returning an n x n list of km), so a
+road-network service can replace the default great-circle distances.
+"""
+import hashlib
+import json
+from typing import List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .geo import EARTH_RADIUS_KM, haversine_km, np
+
+Point = Tuple[float, float]
+
+# 2-opt passes over the whole route before settling for what we have
+MAX_2OPT_PASSES = 50
+
+
+def haversine_matrix(points: Sequence[Point]) -> List[List[float]]:
+    """Great-circle km between every pair of points."""
+    if np is None:
+        return [[haversine_km(a[0], a[1], b[0], b[1]) for b in points] for a in points]
+    arr = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    lat, lng = arr[:, 0][:, None], arr[:, 1][:, None]
+    a = (np.sin((lat.T - lat) / 2) ** 2
+         + np.cos(lat) * np.cos(lat.T) * np.sin((lng.T - lng) / 2) ** 2)
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))).tolist()
+
+
+def get_distance_matrix():
+    path = getattr(settings, "ROUTE_DISTANCE_MATRIX", None)
+    return import_string(path) if path else haversine_matrix
+
+
+def _path_cost(route: List[int], dist) -> float:
+    return sum(dist[a][b] for a, b in zip(route, route[1:]))
+
+
+def solve_path(dist, start: int, end: Optional[int] = None) -> List[int]:
+    """
+    Order of node indices from `start` through every node (ending at `end`
+    if given): nearest-neighbour tour improved by 2-opt. The endpoints never
+    move. Works for asymmetric matrices too.
+    """
+    n = len(dist)
+    todo = [i for i in range(n) if i not in (start, end)]
+    route = [start]
+    while todo:
+        here = route[-1]
+        nxt = min(todo, key=lambda j: dist[here][j])
+        todo.remove(nxt)
+        route.append(nxt)
+    if end is not None:
+        route.append(end)
+
+    last = len(route) - 1 if end is not None else len(route)
+    for _ in range(MAX_2OPT_PASSES):
+        improved = False
+        for i in range(1, last - 1):
+            for k in range(i + 1, last):
+                # cost of route[i-1] .. route[k+1] before and after reversing route[i..k]
+                segment = route[i - 1:k + 2]
+                candidate = segment[:1] + segment[1:k - i + 2][::-1] + segment[k - i + 2:]
+                if _path_cost(candidate, dist) < _path_cost(segment, dist) - 1e-9:
+                    route[i:k + 1] = route[i:k + 1][::-1]
+                    improved = True
+        if not improved:
+            break
+    return route
+
+
+def _order_stops(order) -> List[dict]:
+    """Depot (if known), pickups, drop — in that order, unsorted."""
+    stops = []
+    loc = getattr(order.ngo, "ngo_location", None) if order.ngo_id else None
+    if loc is not None and loc.lat is not None and loc.lng is not None:
+        stops.append({"kind": "start", "lat": float(loc.lat), "lng": float(loc.lng),
+                      "label": loc.address_line or order.ngo.username})
+    for a in order.allocations.select_related("donation", "donation__donor").order_by("id"):
+        stops.append({
+            "kind": "pickup",
+            "allocation_id": a.id,
+            "lat": float(a.donation.pickup_lat),
+            "lng": float(a.donation.pickup_lng),
+            "label": f"{a.donation.donor.username} ({a.quantity})",
+        })
+    stops.append({"kind": "drop", "lat": float(order.delivery_lat or 0),
+                  "lng": float(order.delivery_lng or 0), "label": order.receiver.username})
+    return stops
+
+
+def _stops_key(stops: List[dict], matrix) -> str:
+    ident = [getattr(matrix, "__module__", ""), getattr(matrix, "__qualname__", repr(matrix))]
+    ident += sorted((s["kind"], s.get("allocation_id") or 0, round(s["lat"], 6), round(s["lng"], 6))
+                    for s in stops)
+    return hashlib.sha1(json.dumps(ident).encode("utf-8")).hexdigest()
+
+
+def plan_route(stops: List[dict], matrix=None) -> dict:
+    """{"stops": stops in driving order, "distance_km": total} for _order_stops() output."""
+    matrix = matrix or get_distance_matrix()
+    dist = matrix([(s["lat"], s["lng"]) for s in stops])
+    n = len(stops)
+    if stops[0]["kind"] == "start":
+        order = solve_path(dist, start=0, end=n - 1)
+    else:
+        # no depot: plan backwards from the drop over the transposed matrix and
+        # reverse, so the driver starts at whichever pickup gives the cheapest path
+        perm = [n - 1] + list(range(n - 1))
+        backwards = [[dist[perm[b]][perm[a]] for b in range(n)] for a in range(n)]
+        order = [perm[i] for i in solve_path(backwards, start=0)][::-1]
+    return {
+        "stops": [stops[i] for i in order],
+        "distance_km": round(_path_cost(order, dist), 3),
+    }
+
+
+def route_for_order(order, matrix=None) -> dict:
+    """
+    Planned route for an allocated order. The result is kept in the order's
+    Delivery.route_json under a hash of its stop set, and only recomputed when
+    the stops (or the distance matrix) change.
+    """
+    matrix = matrix or get_distance_matrix()
+    stops = _order_stops(order)
+    key = _stops_key(stops, matrix)
+
+    delivery = getattr(order, "delivery", None) if order.pk else None
+    cached = delivery.route_json if delivery is not None else None
+    if cached and cached.get("key") == key:
+        return cached
+
+    route = dict(plan_route(stops, matrix), key=key)
+    if delivery is not None:
+        delivery.route_json = route
+        delivery.save(update_fields=["route_json"])
+    return route
@@ -0,0 +1,253 @@
+# app/runs.py
+"""
+Group an NGO's allocated orders into delivery runs: a capacitated
+vehicle-routing heuristic (Clarke–Wright style savings) in which every run
+collects all of its pickups and then drops each order before its food
+expires (expires_at minus delivery_buffer_minutes).
+
+batch_jobs() is pure and works on RunJob records, so the benchmark command can
+drive it with synthetic data; plan_delivery_runs() loads and saves the rows.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+from django.conf import settings
+from django.db import transaction
+
+from .geo import DISTANCE_BATCH_ROWS, haversine_km, np
+from .routing import get_distance_matrix, solve_path
+
+# pickups: ((lat, lng, label), ...); drop: (lat, lng, label);
+# deadline: latest arrival at the drop (earliest expiry less its buffer)
+RunJob = namedtuple("RunJob", ["order_id", "load", "pickups", "drop", "deadline"])
+
+# stops: [{"kind", "lat", "lng", "label", "order_id"}, ...] in driving order
+PlannedRun = namedtuple("PlannedRun", ["jobs", "stops", "distance_km", "finish_at", "on_time"])
+
+# merge candidates per order: its nearest other drops
+MERGE_NEIGHBOURS = 8
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class RunPlanner:
+    """
+    Routes and times candidate runs. Capacity is in servings
+    (DELIVERY_RUN_CAPACITY, default 150) with at most DELIVERY_RUN_MAX_ORDERS
+    (default 6) drops per run; travel uses DELIVERY_SPEED_KMH (default 20) plus
+    DELIVERY_STOP_MINUTES (default 5) at each stop.
+    """
+
+    def __init__(self, depot=None, now: datetime = None, matrix=None, capacity: int = None,
+                 max_orders: int = None, speed_kmh: float = None, stop_minutes: float = None):
+        self.depot = depot  # (lat, lng, label) or None
+        self.now = now
+        self.matrix = matrix or get_distance_matrix()
+        self.capacity = capacity or _setting("DELIVERY_RUN_CAPACITY", 150)
+        self.max_orders = max_orders or _setting("DELIVERY_RUN_MAX_ORDERS", 6)
+        self.speed_kmh = speed_kmh or _setting("DELIVERY_SPEED_KMH", 20)
+        self.stop_minutes = _setting("DELIVERY_STOP_MINUTES", 5) if stop_minutes is None else stop_minutes
+
+    def fits(self, jobs: Sequence[RunJob]) -> bool:
+        return len(jobs) <= self.max_orders and sum(j.load for j in jobs) <= self.capacity
+
+    def _timed(self, stops, dist):
+        """(distance_km, finish_at, on_time) for stops driven in the given order."""
+        km = 0.0
+        at = self.now
+        on_time = True
+        for i in range(1, len(stops)):
+            leg = dist[stops[i - 1]["_i"]][stops[i]["_i"]]
+            km += leg
+            at += timedelta(hours=leg / self.speed_kmh, minutes=self.stop_minutes)
+            if stops[i]["kind"] == "drop" and at > stops[i]["_deadline"]:
+                on_time = False
+        return km, at, on_time
+
+    def route(self, jobs: Sequence[RunJob]) -> PlannedRun:
+        """Best route found for these jobs: pickups by 2-opt, then drops by distance or deadline."""
+        stops = []
+        if self.depot:
+            stops.append({"kind": "start", "lat": self.depot[0], "lng": self.depot[1],
+                          "label": self.depot[2], "order_id": None})
+        for job in jobs:
+            for lat, lng, label in job.pickups:
+                stops.append({"kind": "pickup", "lat": lat, "lng": lng, "label": label, "order_id": job.order_id})
+        n_head = len(stops)
+        for job in jobs:
+            stops.append({"kind": "drop", "lat": job.drop[0], "lng": job.drop[1], "label": job.drop[2],
+                          "order_id": job.order_id, "_deadline": job.deadline})
+        for i, s in enumerate(stops):
+            s["_i"] = i
+        dist = self.matrix([(s["lat"], s["lng"]) for s in stops])
+
+        # pickups: open path from the depot (or the first pickup)
+        head = solve_path([row[:n_head] for row in dist[:n_head]], start=0)
+        ordered_head = [stops[i] for i in head]
+
+        # drops: shortest path from the last pickup, or earliest deadline first
+        # when the short way round makes someone late
+        last = ordered_head[-1]["_i"]
+        tail_idx = [last] + list(range(n_head, len(stops)))
+        sub = [[dist[a][b] for b in tail_idx] for a in tail_idx]
+        by_distance = [stops[tail_idx[i]] for i in solve_path(sub, start=0)[1:]]
+        by_deadline = sorted(stops[n_head:], key=lambda s: (s["_deadline"], s["order_id"]))
+
+        best = None
+        for tail in (by_distance, by_deadline):
+            km, finish, on_time = self._timed(ordered_head + tail, dist)
+            if best is None or (on_time, -km) > (best[3], -best[1]):
+                best = (ordered_head + tail, km, finish, on_time)
+        ordered, km, finish, on_time = best
+        clean = [{k: v for k, v in s.items() if not k.startswith("_")} for s in ordered]
+        return PlannedRun(list(jobs), clean, round(km, 3), finish, on_time)
+
+
+def _nearest_drops(jobs: List[RunJob], k: int) -> List[List[int]]:
+    """For each job, the indices of the k jobs with the nearest drops."""
+    n = len(jobs)
+    if n < 2:
+        return [[] for _ in jobs]
+    k = min(k, n - 1)
+    if np is None:
+        return [
+            [i for _, i in sorted((haversine_km(a.drop[0], a.drop[1], b.drop[0], b.drop[1]), i)
+                                  for i, b in enumerate(jobs) if b is not a)[:k]]
+            for a in jobs
+        ]
+    pts = np.radians(np.asarray([j.drop[:2] for j in jobs], dtype=float))
+    out = []
+    for start in range(0, n, DISTANCE_BATCH_ROWS):
+        rows = pts[start:start + DISTANCE_BATCH_ROWS]
+        dlat = pts[None, :, 0] - rows[:, None, 0]
+        dlng = pts[None, :, 1] - rows[:, None, 1]
+        # the haversine term grows with distance, so it ranks the same without asin
+        h = np.sin(dlat / 2) ** 2 + np.cos(rows[:, None, 0]) * np.cos(pts[None, :, 0]) * np.sin(dlng / 2) ** 2
+        h[np.arange(len(rows)), np.arange(start, start + len(rows))] = np.inf
+        nearest = np.argpartition(h, k - 1, axis=1)[:, :k]
+        out.extend(nearest.tolist())
+    return out
+
+
+def batch_jobs(jobs: List[RunJob], planner: RunPlanner) -> List[PlannedRun]:
+    """
+    Start with one run per order and merge runs in order of distance saved,
+    keeping a merge only if it fits the vehicle and nobody's food arrives late.
+    Candidate pairs are limited to each order's MERGE_NEIGHBOURS nearest drops.
+    """
+    runs = {j.order_id: planner.route([j]) for j in jobs}
+    owner = {j.order_id: j.order_id for j in jobs}  # order -> key of the run holding it
+
+    pairs = set()
+    for i, near in enumerate(_nearest_drops(jobs, MERGE_NEIGHBOURS)):
+        for k in near:
+            a, b = jobs[i].order_id, jobs[k].order_id
+            pairs.add((min(a, b), max(a, b)))
+    by_id = {j.order_id: j for j in jobs}
+    savings = []
+    for a, b in sorted(pairs):
+        ja, jb = by_id[a], by_id[b]
+        if not planner.fits([ja, jb]):
+            continue
+        merged = planner.route([ja, jb])
+        saved = runs[a].distance_km + runs[b].distance_km - merged.distance_km
+        if saved > 0 and merged.on_time:
+            savings.append((saved, a, b))
+    savings.sort(key=lambda s: (-s[0], s[1], s[2]))
+
+    for _, a, b in savings:
+        ka, kb = owner[a], owner[b]
+        if ka == kb:
+            continue
+        ra, rb = runs[ka], runs[kb]
+        jobs_ab = ra.jobs + rb.jobs
+        if not planner.fits(jobs_ab) or not (ra.on_time and rb.on_time):
+            continue
+        merged = planner.route(jobs_ab)
+        if merged.on_time and merged.distance_km < ra.distance_km + rb.distance_km:
+            runs[ka] = merged
+            del runs[kb]
+            for j in rb.jobs:
+                owner[j.order_id] = ka
+    return sorted(runs.values(), key=lambda r: min(j.order_id for j in r.jobs))
+
+
+SYNTHETIC_CITY_CENTRE = (12.9716, 77.5946)
+
+
+def synthetic_jobs(orders: int, now: datetime, seed: int = 0, city_km: float = 15.0,
+                   centre=SYNTHETIC_CITY_CENTRE) -> List[RunJob]:
+    """
+    City-scale test data: donors and receivers scattered over a city_km square
+    around centre; each order draws on 1–3 donors and must arrive 1–8h out.
+    """
+    import random
+    rnd = random.Random(seed)
+    deg = city_km / 111.0
+
+    def spot():
+        return (centre[0] + (rnd.random() - 0.5) * deg, centre[1] + (rnd.random() - 0.5) * deg)
+
+    donors = [spot() for _ in range(max(1, orders // 3))]
+    jobs = []
+    for pk in range(1, orders + 1):
+        picks = tuple((*rnd.choice(donors), f"donor {i}") for i in range(rnd.randint(1, 3)))
+        jobs.append(RunJob(pk, rnd.randint(5, 40), picks, (*spot(), f"receiver {pk}"),
+                           now + timedelta(minutes=rnd.randint(60, 480))))
+    return jobs
+
+
+def plan_delivery_runs(ngo, now: datetime = None, planner: Optional[RunPlanner] = None) -> List["DeliveryRun"]:
+    """
+    Batch this NGO's ALLOCATED orders that are not yet on a run into
+    DeliveryRun rows and link their Delivery rows to them. Orders without a
+    drop location are left out.
+    """
+    from django.utils import timezone
+    from .models import Allocation, Delivery, DeliveryRun, ReceiverOrder  # local import to avoid circulars
+
+    now = now or timezone.now()
+    if planner is None:
+        loc = getattr(ngo, "ngo_location", None)
+        depot = (loc.lat, loc.lng, loc.address_line or ngo.username) if loc and loc.lat is not None and loc.lng is not None else None
+        planner = RunPlanner(depot=depot, now=now)
+
+    with transaction.atomic():
+        orders = list(ReceiverOrder.objects
+                      .filter(ngo=ngo, status="ALLOCATED",
+                              delivery_lat__isnull=False, delivery_lng__isnull=False)
+                      .exclude(delivery__run__isnull=False)
+                      .select_related("receiver"))
+        if not orders:
+            return []
+        Delivery.objects.bulk_create([Delivery(ngo=ngo, order=o) for o in orders], ignore_conflicts=True)
+
+        pickups = {o.pk: [] for o in orders}
+        deadlines = {}
+        for a in (Allocation.objects.filter(order__in=orders)
+                  .select_related("donation", "donation__donor").order_by("id")):
+            d = a.donation
+            pickups[a.order_id].append((d.pickup_lat, d.pickup_lng, f"{d.donor.username} ({a.quantity})"))
+            due = d.expires_at - timedelta(minutes=d.delivery_buffer_minutes)
+            deadlines[a.order_id] = min(due, deadlines.get(a.order_id, due))
+
+        jobs = [RunJob(o.pk, o.people_count, tuple(pickups[o.pk]),
+                       (float(o.delivery_lat), float(o.delivery_lng), o.receiver.username),
+                       deadlines.get(o.pk, now))
+                for o in orders if pickups[o.pk]]
+        planned = batch_jobs(jobs, planner)
+
+        runs = DeliveryRun.objects.bulk_create([
+            DeliveryRun(ngo=ngo, route_json={"stops": p.stops}, distance_km=p.distance_km,
+                        planned_finish_at=p.finish_at, on_time=p.on_time)
+            for p in planned
+        ])
+        deliveries = {d.order_id: d for d in Delivery.objects.filter(order__in=[j.order_id for j in jobs])}
+        for run, p in zip(runs, planned):
+            for j in p.jobs:
+                deliveries[j.order_id].run = run
+        Delivery.objects.bulk_update(deliveries.values(), ["run"])
+    return runs
@@ -0,0 +1,48 @@
+# app/signals_geo.py
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import NGOLocation
+from .geo import (
+    invalidate_ngo_index, rebuild_pending_eligibility, refresh_eligibility_near, register_sqlite_functions,
+)
+
+User = get_user_model()
+
+
+@receiver(connection_created)
+def _install_sql_functions(sender, connection, **kwargs):
+    register_sqlite_functions(connection)
+
+
+def _ngo_set_changed(ngo_ids=None):
+    """
+    Pending donations near these NGOs may now have a different pair of
+    nearest NGOs. ngo_ids=None (a whole group cleared) rechecks them all.
+    """
+    invalidate_ngo_index()
+    if ngo_ids is None:
+        transaction.on_commit(rebuild_pending_eligibility)
+    else:
+        ngo_ids = set(ngo_ids)
+        transaction.on_commit(lambda: refresh_eligibility_near(ngo_ids))
+
+
+@receiver(post_save, sender=NGOLocation)
+@receiver(post_delete, sender=NGOLocation)
+def _ngo_location_changed(sender, instance, **kwargs):
+    _ngo_set_changed([instance.user_id])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _ngo_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """An NGO joining or leaving the group changes who is indexed."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        if instance.name == "NGO":
+            _ngo_set_changed(pk_set)
+    elif pk_set is None or instance.groups.model.objects.filter(pk__in=pk_set, name="NGO").exists():
+        _ngo_set_changed([instance.pk])
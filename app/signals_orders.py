@@ -1,37 +1,37 @@
 # app/signals_orders.py
-from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
-from .models import ReceiverOrder
+from .dispatch import dispatch_notification
+from .models import Delivery, FoodDonation, ReceiverOrder
 from .notifications import (
+    notify_donor_food_approved,
+    notify_receiver_delivery_status,
     notify_receiver_order_status,
     notify_receiver_request_accepted,
 )
-
-@receiver(pre_save, sender=ReceiverOrder)
-def _capture_old_status(sender, instance: ReceiverOrder, **kwargs):
-    """
-    Before saving, fetch the existing status (if any) and store it on the instance.
-    """
-    if instance.pk:
-        try:
-            old = sender.objects.only("status").get(pk=instance.pk)
-            instance._old_status = old.status
-        except sender.DoesNotExist:
-            instance._old_status = None
-    else:
-        instance._old_status = None
+from .tracking import status_changed
 
 
-@receiver(post_save, sender=ReceiverOrder)
-def _notify_on_create_or_status_change(sender, instance: ReceiverOrder, created: bool, **kwargs):
+@receiver(status_changed, sender=ReceiverOrder)
+def _notify_on_create_or_status_change(sender, instance: ReceiverOrder, old, new, created, **kwargs):
     """
     - On create -> 'request accepted'
-    - On status change -> order status update
+    - On status change -> order status update (one per request, for the last status)
+    status_changed fires after the saving transaction commits, so a rolled-back change announces nothing.
     """
     if created:
-        notify_receiver_request_accepted(instance)
-        return
+        dispatch_notification(("order-created", instance.pk), notify_receiver_request_accepted, instance)
+    else:
+        dispatch_notification(("order-status", instance.pk), notify_receiver_order_status, instance)
+
+
+@receiver(status_changed, sender=Delivery)
+def _notify_on_delivery_progress(sender, instance: Delivery, old, new, created, **kwargs):
+    """Picked up / in transit; DELIVERED is announced by the order's own change."""
+    if not created and new != "DELIVERED":
+        dispatch_notification(("order-status", instance.order_id), notify_receiver_delivery_status, instance)
+
 
-    old_status = getattr(instance, "_old_status", None)
-    if old_status is not None and old_status != instance.status:
-        notify_receiver_order_status(instance)
+@receiver(status_changed, sender=FoodDonation)
+def _notify_on_donation_accepted(sender, instance: FoodDonation, old, new, created, **kwargs):
+    if old == "PENDING" and new == "ACCEPTED":
+        dispatch_notification(("donation-approved", instance.pk), notify_donor_food_approved, instance)
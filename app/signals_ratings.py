@@ -1,18 +1,31 @@
 # app/signals_ratings.py (create this file)
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from .models import NGORating, ReceiverRating
+from .dispatch import dispatch_notification
 from .notifications import notify_user
+from .ratings import rating_deleted, rating_saved
 from .models import ReceiverOrder
 
 
 User = get_user_model()
 
+
+def _rating_summary(rater, instance) -> str:
+    comment = f" \"{instance.comment}\"" if instance.comment else ""
+    return (f"{rater.get_full_name() or rater.username} rated '{instance.food.item_name}' "
+            f"{instance.stars} stars.{comment}")
+
+
 @receiver(post_save, sender=NGORating)
 def notify_donor_ngo_rated(sender, instance, created, **kwargs):
     if not created:
         return
+    dispatch_notification(("ngo-rated", instance.pk), _notify_ngo_rated, instance)
+
+
+def _notify_ngo_rated(instance):
     donor = instance.donor
     ngo = instance.ngo
     notify_user(
@@ -24,12 +37,18 @@ def notify_donor_ngo_rated(sender, instance, created, **kwargs):
             f"'{instance.food.item_name}' with {instance.stars} stars.\n"
             f"Comment: {instance.comment or '—'}"
         ),
+        kind="rating",
+        summary=_rating_summary(ngo, instance),
     )
 
 @receiver(post_save, sender=ReceiverRating)
 def notify_donor_receiver_rated(sender, instance, created, **kwargs):
     if not created:
         return
+    dispatch_notification(("receiver-rated", instance.pk), _notify_receiver_rated, instance)
+
+
+def _notify_receiver_rated(instance):
     donor = instance.donor
     receiver = instance.receiver
     notify_user(
@@ -41,7 +60,30 @@ def notify_donor_receiver_rated(sender, instance, created, **kwargs):
             f"'{instance.food.item_name}' with {instance.stars} stars.\n"
             f"Comment: {instance.comment or '—'}"
         ),
+        kind="rating",
+        summary=_rating_summary(receiver, instance),
     )
 
 
+# ---- donor rating totals on Profile (app.ratings) ----
+
+@receiver(post_save, sender=NGORating)
+def _ngo_rating_totals(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        rating_saved("NGO", instance, created)
+
+
+@receiver(post_save, sender=ReceiverRating)
+def _receiver_rating_totals(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        rating_saved("RECEIVER", instance, created)
+
+
+@receiver(post_delete, sender=NGORating)
+def _ngo_rating_removed(sender, instance, **kwargs):
+    rating_deleted("NGO", instance)
+
 
+@receiver(post_delete, sender=ReceiverRating)
+def _receiver_rating_removed(sender, instance, **kwargs):
+    rating_deleted("RECEIVER", instance)
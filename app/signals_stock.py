@@ -0,0 +1,11 @@
+# app/signals_stock.py
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from .models import FoodDonation
+from .ledger import donation_movements, record_movements
+
+
+@receiver(pre_delete, sender=FoodDonation)
+def _donation_deleted(sender, instance, **kwargs):
+    # runs inside the delete's transaction, so the ledger goes with the row
+    record_movements(donation_movements(instance, instance.stored_stock_share(), None))
@@ -0,0 +1,123 @@
+# app/stock.py
+"""
+Per-item, per-NGO stock counters (NGOStock). Every change to a donation's
+stocked servings adjusts its counter in the same transaction, so availability
+checks read one small table instead of summing FoodDonation rows.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+# donation statuses whose inventory_remaining counts as NGO stock
+STOCKED_STATUSES = ("ACCEPTED", "PARTIAL")
+
+StockKey = Tuple[int, int]  # (FoodItem id, ngo user id)
+
+_ADJUST_CHUNK = 200
+
+
+def normalize_item_name(name) -> str:
+    """'  Veg  Biryani ' and 'veg biryani' share one key."""
+    return " ".join(str(name or "").split()).casefold()
+
+
+def stock_share(item_id: int, status: str, ngo_id: Optional[int], remaining: int) -> Optional[Tuple[StockKey, int]]:
+    """((item_id, ngo_id), servings) a donation in this state adds to NGOStock, or None."""
+    if status in STOCKED_STATUSES and ngo_id and remaining:
+        return (item_id, ngo_id), remaining
+    return None
+
+
+def adjust_ngo_stock(deltas: Dict[StockKey, int]) -> None:
+    """
+    Add deltas[(item_id, ngo_id)] to each counter with F-expression UPDATEs,
+    creating missing rows first. Call inside the transaction that changed the
+    donations.
+    """
+    from .models import NGOStock  # local import to avoid circulars
+    deltas = {k: d for k, d in deltas.items() if d}
+    if not deltas:
+        return
+    with transaction.atomic(savepoint=False):
+        NGOStock.objects.bulk_create(
+            [NGOStock(item_id=k, ngo_id=n, quantity=0) for k, n in deltas],
+            ignore_conflicts=True,
+        )
+        items = list(deltas.items())
+        for start in range(0, len(items), _ADJUST_CHUNK):
+            chunk = items[start:start + _ADJUST_CHUNK]
+            match = Q()
+            whens = []
+            for (k, n), d in chunk:
+                match |= Q(item_id=k, ngo_id=n)
+                whens.append(When(item_id=k, ngo_id=n, then=Value(d)))
+            NGOStock.objects.filter(match).update(
+                quantity=F("quantity") + Case(*whens, default=Value(0), output_field=IntegerField())
+            )
+
+
+def unswept_expired_stock(item_name: str, now=None) -> Dict[int, int]:
+    """
+    {ngo_user_id: servings} still counted in NGOStock for donations of this
+    item that are past expires_at but not yet swept by the expiry scheduler.
+    Reads only the few due rows, through the (status, expires_at) index.
+    """
+    from .models import FoodDonation  # local import to avoid circulars
+    rows = (FoodDonation.objects
+            .filter(item__key=normalize_item_name(item_name), status__in=STOCKED_STATUSES,
+                    expires_at__lte=now or timezone.now(), inventory_remaining__gt=0,
+                    accepted_by__isnull=False)
+            .values("accepted_by")
+            .annotate(stock=Sum("inventory_remaining"))
+            .order_by())
+    return {r["accepted_by"]: r["stock"] for r in rows}
+
+
+def stock_summary(item_name: str, now=None) -> Dict[int, int]:
+    """{ngo_user_id: servings in stock} for one item, not counting food already past its expiry."""
+    from .models import NGOStock  # local import to avoid circulars
+    counters = (NGOStock.objects
+                .filter(item__key=normalize_item_name(item_name), quantity__gt=0)
+                .values_list("ngo_id", "quantity"))
+    expired = unswept_expired_stock(item_name, now)
+    summary = {ngo_id: quantity - expired.get(ngo_id, 0) for ngo_id, quantity in counters}
+    return {ngo_id: n for ngo_id, n in summary.items() if n > 0}
+
+
+def available_stock(item_name: str, now=None) -> int:
+    """Servings of this item in stock across all NGOs."""
+    return sum(stock_summary(item_name, now).values())
+
+
+def stock_from_donations() -> Dict[StockKey, int]:
+    """The counters as recomputed from FoodDonation rows."""
+    from .models import FoodDonation  # local import to avoid circulars
+    rows = (FoodDonation.objects
+            .filter(status__in=STOCKED_STATUSES, inventory_remaining__gt=0, accepted_by__isnull=False)
+            .values("item", "accepted_by")
+            .annotate(stock=Sum("inventory_remaining"))
+            .order_by())
+    return {(r["item"], r["accepted_by"]): r["stock"] for r in rows}
+
+
+def reconcile_ngo_stock(fix: bool = False) -> List[Tuple[StockKey, int, int]]:
+    """
+    [((item_id, ngo_id), counter, actual), ...] for every counter that
+    disagrees with the donations. With fix=True the counters are corrected in
+    the same transaction that read them.
+    """
+    from .models import NGOStock  # local import to avoid circulars
+    with transaction.atomic():
+        actual = stock_from_donations()
+        counters = {(s.item_id, s.ngo_id): s.quantity for s in NGOStock.objects.all()}
+        drift = sorted(
+            (key, counters.get(key, 0), actual.get(key, 0))
+            for key in set(actual) | set(counters)
+            if counters.get(key, 0) != actual.get(key, 0)
+        )
+        if fix and drift:
+            adjust_ngo_stock({key: real - counted for key, counted, real in drift})
+    return drift
+
@@ -0,0 +1,157 @@
+# app/tests/test_allocation.py
+import random
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from app.allocation import StockConflict, allocate_order, apply_stock_decrements
+from app.models import Allocation, Delivery, FoodDonation, Profile, ReceiverOrder, donor_rank_expression
+from app.replay import replay, synthetic_stream
+from app.strategies import get_allocation_strategy
+
+
+class AllocateOrderTests(TestCase):
+    def setUp(self):
+        self.ngo = User.objects.create(username="ngo")
+        self.rcv = User.objects.create(username="r")
+        now = timezone.now()
+        rnd = random.Random(3)
+        self.donations = []
+        for i in range(60):
+            donor = User.objects.create(username=f"d{i}")
+            Profile.objects.filter(user=donor).update(rank_score=rnd.choice([1.5, 3, 4.5]))
+            self.donations.append(FoodDonation.objects.create(
+                donor=donor, item_name=rnd.choice(["Rice", "rice"]), quantity_people=5,
+                inventory_remaining=rnd.randint(1, 5), prepared_at=now,
+                expires_at=now + timedelta(hours=rnd.randint(1, 9)), pickup_lat=1, pickup_lng=1,
+                status="ACCEPTED", accepted_by=self.ngo))
+
+    def expected(self, need):
+        """Best-ranked donor first, sooner expiry breaking ties."""
+        ds = sorted(FoodDonation.objects.filter(status__in=["ACCEPTED", "PARTIAL"], inventory_remaining__gt=0)
+                    .select_related("donor__profile"),
+                    key=lambda d: (d.donor.profile.rank_score, -d.expires_at.timestamp()), reverse=True)
+        out = []
+        for d in ds:
+            if need <= 0:
+                break
+            take = min(need, d.inventory_remaining)
+            out.append((d.id, take))
+            need -= take
+        return out
+
+    def remaining(self):
+        return sum(FoodDonation.objects.values_list("inventory_remaining", flat=True))
+
+    def test_allocates_in_rank_order_with_fixed_queries(self):
+        total = sum(d.inventory_remaining for d in self.donations)
+        o = ReceiverOrder.objects.create(receiver=self.rcv, ngo=self.ngo, item_name="RICE", people_count=total - 7)
+        exp = self.expected(total - 7)
+        with self.assertNumQueries(12):  # independent of the number of donations drawn
+            allocs = allocate_order(o)
+        self.assertEqual(sorted((a.donation_id, a.quantity) for a in allocs), sorted(exp))
+        self.assertEqual(self.remaining(), 7)
+
+    def test_insufficient_stock_changes_nothing(self):
+        total = sum(d.inventory_remaining for d in self.donations)
+        o = ReceiverOrder.objects.create(receiver=self.rcv, ngo=self.ngo, item_name="rice", people_count=total + 1)
+        with self.assertRaises(RuntimeError):
+            allocate_order(o)
+        self.assertEqual(self.remaining(), total)
+
+
+class AllocateOpenOrdersTests(TestCase):
+    def setUp(self):
+        self.ngo = User.objects.create(username="n")
+        Group.objects.create(name="NGO").user_set.add(self.ngo)
+        self.rcv = User.objects.create(username="r")
+        self.donor = User.objects.create(username="d")
+        self.late = self.donation("Rice", 10, 5)
+        self.soon = self.donation("rice", 4, 1)
+        self.donation("Dal", 3, 2)
+        self.o1 = ReceiverOrder.objects.create(receiver=self.rcv, item_name="Rice", people_count=6)
+        self.o2 = ReceiverOrder.objects.create(receiver=self.rcv, item_name="dal", people_count=5, ngo=self.ngo)
+        self.o3 = ReceiverOrder.objects.create(receiver=self.rcv, item_name="RICE", people_count=8)
+
+    def donation(self, name, qty, hours):
+        now = timezone.now()
+        return FoodDonation.objects.create(
+            donor=self.donor, item_name=name, quantity_people=qty, inventory_remaining=qty,
+            prepared_at=now, expires_at=now + timedelta(hours=hours), pickup_lat=1, pickup_lng=1,
+            status="ACCEPTED", accepted_by=self.ngo)
+
+    def test_command(self):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("allocate_orders", stdout=out)
+        self.assertIn(f"allocated order #{self.o1.id}", out.getvalue())
+        self.o1.refresh_from_db()
+        self.assertEqual((self.o1.status, self.o1.ngo), ("ALLOCATED", self.ngo))
+        self.assertEqual(sorted(self.o1.allocations.values_list("donation_id", "quantity")),
+                         sorted([(self.soon.id, 4), (self.late.id, 2)]))
+        self.o3.refresh_from_db()
+        self.assertEqual(self.o3.status, "ALLOCATED")
+        self.o2.refresh_from_db()
+        self.assertEqual(self.o2.status, "REQUESTED")  # only 3 of 5 servings of dal
+        self.assertEqual(Delivery.objects.count(), 2)
+
+    def test_view(self):
+        self.client.force_login(self.ngo)
+        r = self.client.post("/ngo/orders/allocate-all/", follow=True)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(ReceiverOrder.objects.filter(status="ALLOCATED").count(), 2)
+        self.assertTrue(any("could not be filled" in str(m) for m in r.context["messages"]))
+
+
+class AllocationStrategyTests(TestCase):
+    def test_sql_order_matches_sort_key(self):
+        ngo = User.objects.create(username="ngo")
+        now = timezone.now()
+        for i, (hours, score) in enumerate([(1, 5.0), (3, 5.0), (1.5, 1.0), (8, 4.0), (6, 1.0)]):
+            d = User.objects.create(username=f"d{i}")
+            Profile.objects.filter(user=d).update(rank_score=score)
+            FoodDonation.objects.create(
+                donor=d, item_name="x", quantity_people=5, inventory_remaining=5, prepared_at=now,
+                expires_at=now + timedelta(hours=hours), pickup_lat=1, pickup_lng=1,
+                status="ACCEPTED", accepted_by=ngo)
+        base = FoodDonation.objects.annotate(donor_score=donor_rank_expression())
+        for name in ("rating", "expiry", "hybrid"):
+            s = get_allocation_strategy(name)
+            in_sql = [d.id for d in s.order_queryset(base, now)]
+            in_memory = sorted(base, key=lambda d: s.sort_key(d.expires_at, d.donor_score, d.id, now))
+            self.assertEqual(in_sql, [d.id for d in in_memory], name)
+
+    def test_replay_accounts_for_every_serving(self):
+        events = synthetic_stream(days=3, seed=1)
+        donated = sum(e.quantity for e in events if e.kind == "donation")
+        results = {name: replay(events, get_allocation_strategy(name)) for name in ("rating", "expiry")}
+        for r in results.values():
+            self.assertEqual(r["served_people"] + r["expired_servings"], donated)
+        self.assertLessEqual(results["expiry"]["expired_servings"], results["rating"]["expired_servings"])
+
+
+class StockDecrementTests(TestCase):
+    def setUp(self):
+        ngo = User.objects.create(username="ngo")
+        now = timezone.now()
+        self.food = FoodDonation.objects.create(
+            donor=User.objects.create(username="d"), item_name="rice", quantity_people=5,
+            inventory_remaining=5, prepared_at=now, expires_at=now + timedelta(hours=2),
+            pickup_lat=1, pickup_lng=1, status="ACCEPTED", accepted_by=ngo)
+
+    def test_overdraw_raises_and_changes_nothing(self):
+        with self.assertRaises(StockConflict):
+            with transaction.atomic():
+                apply_stock_decrements([Allocation(donation=self.food, quantity=6)])
+        self.food.refresh_from_db()
+        self.assertEqual(self.food.inventory_remaining, 5)
+
+    def test_draining_marks_delivered(self):
+        apply_stock_decrements([Allocation(donation=self.food, quantity=5)])
+        self.food.refresh_from_db()
+        self.assertEqual((self.food.inventory_remaining, self.food.status), (0, "DELIVERED"))
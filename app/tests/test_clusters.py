@@ -0,0 +1,61 @@
+# app/tests/test_clusters.py
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+import app.clusters as clusters
+from app.models import FoodDonation, NGOLocation
+
+BBOX = "77.3,12.7,77.9,13.2"
+
+
+class ClusterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="d")
+        now = timezone.now()
+        rnd = random.Random(0)
+        for _ in range(200):
+            FoodDonation.objects.create(
+                donor=self.user, item_name="x", quantity_people=5, inventory_remaining=5,
+                prepared_at=now, expires_at=now + timedelta(hours=2),
+                pickup_lat=rnd.uniform(12.8, 13.1), pickup_lng=rnd.uniform(77.4, 77.8))
+        for i in range(20):
+            NGOLocation.objects.create(user=User.objects.create(username=f"n{i}"),
+                                       lat=rnd.uniform(12.8, 13.1), lng=rnd.uniform(77.4, 77.8))
+        self.client.force_login(self.user)
+
+    def test_endpoint_counts_every_point(self):
+        r = self.client.get("/api/map/clusters/", {"zoom": 11, "bbox": BBOX})
+        self.assertEqual(r.status_code, 200)
+        features = r.json()["features"]
+        count = lambda kind: sum(f["properties"]["count"] for f in features if f["properties"]["kind"] == kind)
+        self.assertEqual((count("donation"), count("ngo")), (200, 20))
+        with self.assertNumQueries(0):  # cached
+            clusters.clusters_for_bbox(11, 77.3, 12.7, 77.9, 13.2)
+
+    def test_pure_python_matches_numpy(self):
+        summary = lambda res: sorted((f["properties"]["kind"], f["properties"]["count"],
+                                      round(f["geometry"]["coordinates"][0], 4)) for f in res["features"])
+        fast = clusters.clusters_for_bbox(11, 77.3, 12.7, 77.9, 13.2)
+        cache.clear()
+        np, clusters.np = clusters.np, None
+        try:
+            slow = clusters.clusters_for_bbox(11, 77.3, 12.7, 77.9, 13.2)
+        finally:
+            clusters.np = np
+        self.assertEqual(summary(fast), summary(slow))
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.get("/api/map/clusters/", {"zoom": 18, "bbox": BBOX}).status_code, 400)
+        self.assertEqual(self.client.get("/api/map/clusters/").status_code, 400)
+        for bbox in ("-inf,10,80,20", "nan,10,80,20", "70,10,80,inf", "-190,10,80,20", "70,-95,80,20", "70,10,80,1e308"):
+            self.assertEqual(self.client.get("/api/map/clusters/", {"zoom": 5, "bbox": bbox}).status_code, 400, bbox)
+
+    def test_receiver_map_fetches_clusters(self):
+        Group.objects.get_or_create(name="Receiver")[0].user_set.add(self.user)
+        self.assertContains(self.client.get("/receiver"), "/api/map/clusters/")
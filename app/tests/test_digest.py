@@ -0,0 +1,41 @@
+# app/tests/test_digest.py
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from app.models import DigestEntry, FoodDonation, NGORating, OutboxMessage
+from app.notifications import flush_digests, notify_user
+
+
+class DigestTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="d", email="d@x.org")
+
+    def test_ratings_batched_into_one_digest(self):
+        self.donor.profile.phone = "+1"
+        self.donor.profile.save()
+        ngo = User.objects.create(username="n")
+        now = timezone.now()
+        f = FoodDonation.objects.create(donor=self.donor, item_name="rice", quantity_people=5, prepared_at=now,
+                                        expires_at=now + timedelta(hours=1), pickup_lat=1, pickup_lng=1)
+        for stars in (3, 5):
+            NGORating.objects.create(donor=self.donor, food=f, ngo=ngo, stars=stars,
+                                     comment="ok" if stars == 5 else "")
+        notify_user(self.donor, "urgent", "expired!")  # not digested
+        self.assertEqual(DigestEntry.objects.count(), 2)
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        self.assertEqual(flush_digests(), 0)  # window not over
+        self.assertEqual(flush_digests(now=timezone.now() + timedelta(hours=1, seconds=1)), 1)
+        self.assertEqual(DigestEntry.objects.count(), 0)
+        email = OutboxMessage.objects.get(channel="EMAIL", subject__contains="updates")
+        self.assertIn("n rated 'rice' 3 stars.", email.body)
+        self.assertIn('5 stars. "ok"', email.body)
+        sms = OutboxMessage.objects.get(channel="SMS", subject__contains="updates")
+        self.assertIn("Details are in your email", sms.body)
+
+    @override_settings(NOTIFICATION_DIGEST_SECONDS=0)
+    def test_disabled(self):
+        notify_user(self.donor, "s", "b", kind="rating")
+        self.assertEqual(OutboxMessage.objects.count(), 1)
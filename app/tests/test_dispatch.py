@@ -0,0 +1,73 @@
+# app/tests/test_dispatch.py
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase
+
+from app.dispatch import collect_notifications, dispatch_notification
+from app.models import DigestEntry, OutboxMessage, ReceiverOrder
+from app.notifications import notify_user
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="u", email="u@x.org")
+
+    def subjects(self):
+        return list(OutboxMessage.objects.order_by("id").values_list("subject", flat=True))
+
+    def test_coalesced_by_key_when_committed(self):
+        u = self.user
+        with collect_notifications():
+            with self.captureOnCommitCallbacks(execute=True):
+                dispatch_notification(("a", 1), notify_user, u, "a1", "b")
+                dispatch_notification(None, notify_user, u, "n", "b")
+                dispatch_notification(("a", 1), notify_user, u, "a1-last", "b")
+                dispatch_notification(("d", 1), notify_user, u, "s", "b", "rating")
+                dispatch_notification(("d", 1), notify_user, u, "s", "b2", "rating")
+                try:
+                    with transaction.atomic():
+                        dispatch_notification(("b", 1), notify_user, u, "rolled back", "b")
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+            # keyless calls write at once; keyed ones wait for the end of the block
+            self.assertEqual(self.subjects(), ["n"])
+            self.assertFalse(DigestEntry.objects.exists())
+        self.assertEqual(self.subjects(), ["n", "a1-last"])
+        self.assertEqual(list(DigestEntry.objects.values_list("summary", flat=True)), ["b2"])
+
+    def test_uncommitted_calls_are_not_written(self):
+        with collect_notifications():
+            dispatch_notification(("a", 1), notify_user, self.user, "never committed", "b")
+        self.assertEqual(self.subjects(), [])
+
+    def test_committed_after_the_block_still_written(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with collect_notifications():
+                dispatch_notification(("a", 1), notify_user, self.user, "late", "b")
+        self.assertEqual(self.subjects(), ["late"])
+
+    def test_no_coalescing_outside_a_block(self):
+        dispatch_notification(("a", 1), notify_user, self.user, "x", "b")
+        dispatch_notification(("a", 1), notify_user, self.user, "y", "b")
+        self.assertEqual(self.subjects(), ["x", "y"])
+
+    def test_order_status_changes_coalesced(self):
+        r = User.objects.create(username="r", email="r@x.org")
+        with collect_notifications(), self.captureOnCommitCallbacks(execute=True):
+            o = ReceiverOrder.objects.create(receiver=r, item_name="rice", people_count=3)
+            for status in ("APPROVED", "ALLOCATED"):
+                o.status = status
+                o.save()
+        self.assertEqual(sorted(self.subjects()),
+                         ["[HopeMeals] Order update: Allocated", "[HopeMeals] Your request was accepted"])
+
+    def test_rolled_back_change_queues_nothing(self):
+        r = User.objects.create(username="r", email="r@x.org")
+        try:
+            with transaction.atomic():
+                ReceiverOrder.objects.create(receiver=r, item_name="rice", people_count=3)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(OutboxMessage.objects.count(), 0)
@@ -0,0 +1,58 @@
+# app/tests/test_effective_status.py
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from django.utils import timezone
+
+from app.models import FoodDonation
+
+
+class EffectiveStatusTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="d")
+        self.ngo = User.objects.create(username="n")
+        self.p_old = self.donation("PENDING", -5)
+        self.p_new = self.donation("PENDING", 5)
+        self.a_old = self.donation("ACCEPTED", -5, accepted_by=self.ngo)
+        self.a_new = self.donation("ACCEPTED", 5, accepted_by=self.ngo)
+        self.e = self.donation("EXPIRED", 5)
+        self.r = self.donation("REJECTED", -5)
+
+    def donation(self, status, minutes, **kw):
+        now = timezone.now()
+        return FoodDonation.objects.create(
+            donor=self.donor, item_name="rice", quantity_people=5, inventory_remaining=5,
+            prepared_at=now, expires_at=now + timedelta(minutes=minutes), pickup_lat=1, pickup_lng=1,
+            status=status, **kw)
+
+    def ids(self, qs):
+        return sorted(qs.values_list("id", flat=True))
+
+    def test_querysets(self):
+        qs = FoodDonation.objects
+        self.assertEqual(self.ids(qs.with_status("PENDING")), [self.p_new.id])
+        self.assertEqual(self.ids(qs.expired()), sorted([self.p_old.id, self.a_old.id, self.e.id]))
+        self.assertEqual(self.ids(qs.unexpired()), sorted([self.p_new.id, self.a_new.id, self.r.id]))
+        self.assertEqual(self.ids(qs.available()), [self.a_new.id])
+        self.assertEqual(self.ids(qs.with_status("REJECTED", "EXPIRED")),
+                         sorted([self.p_old.id, self.a_old.id, self.e.id, self.r.id]))
+        self.assertEqual(self.ids(qs.with_status()), [])
+        self.assertEqual(dict(qs.with_effective_status().values_list("id", "effective_status")), {
+            self.p_old.id: "EXPIRED", self.p_new.id: "PENDING", self.a_old.id: "EXPIRED",
+            self.a_new.id: "ACCEPTED", self.e.id: "EXPIRED", self.r.id: "REJECTED",
+        })
+
+    def test_get_views_do_not_write(self):
+        for role, user in (("Donor", self.donor), ("NGO", self.ngo)):
+            Group.objects.get_or_create(name=role)[0].user_set.add(user)
+        before = list(FoodDonation.objects.values_list("id", "status", "updated_at"))
+        pages = ((self.donor, ["/donor", f"/donor/food/{self.p_old.id}/"]),
+                 (self.ngo, ["/ngo", "/ngo/review/", "/ngo/inventory/"]))
+        for user, urls in pages:
+            self.client.force_login(user)
+            for url in urls:
+                self.assertIn(self.client.get(url).status_code, (200, 302), url)
+        self.assertEqual(before, list(FoodDonation.objects.values_list("id", "status", "updated_at")))
+        self.client.force_login(self.donor)
+        self.assertContains(self.client.get(f"/donor/food/{self.p_old.id}/"), "EXPIRED")
@@ -0,0 +1,79 @@
+# app/tests/test_eligibility.py
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from django.utils import timezone
+
+from app.geo import assign_eligible_ngos
+from app.models import FoodDonation, NGOLocation
+
+
+class EligibleNGOTests(TestCase):
+    def setUp(self):
+        g = Group.objects.create(name="NGO")
+        self.donor = User.objects.create(username="d")
+        Group.objects.create(name="Donor").user_set.add(self.donor)
+        self.ngos = []
+        for i, (lat, lng) in enumerate([(12.9, 77.6), (12.91, 77.61), (13.5, 78.0)]):
+            u = User.objects.create(username=f"n{i}")
+            g.user_set.add(u)
+            NGOLocation.objects.create(user=u, lat=lat, lng=lng)
+            self.ngos.append(u)
+        self.food = self.donation(12.9, 77.6)
+        assign_eligible_ngos([self.food])
+
+    def donation(self, lat, lng):
+        now = timezone.now()
+        return FoodDonation.objects.create(
+            donor=self.donor, item_name="Rice", quantity_people=10, inventory_remaining=10,
+            prepared_at=now, expires_at=now + timedelta(hours=3), pickup_lat=lat, pickup_lng=lng)
+
+    def eligible(self, food):
+        return set(food.eligible_ngos.values_list("id", flat=True))
+
+    def move(self, ngo, **coords):
+        with self.captureOnCommitCallbacks(execute=True):
+            loc = ngo.ngo_location
+            for k, v in coords.items():
+                setattr(loc, k, v)
+            loc.save()
+
+    def test_only_eligible_ngos_can_accept(self):
+        self.client.force_login(self.ngos[0])
+        r = self.client.get("/ngo")
+        self.assertTrue(r.context["pending_rows"][0]["can_accept"])
+        self.assertContains(self.client.get("/ngo/review/"),
+                            f'<form method="post" action="/ngo/accept/{self.food.id}/"')
+        self.client.force_login(self.ngos[2])
+        r = self.client.get("/ngo/review/")
+        self.assertFalse(r.context["rows"][0]["can_accept"])
+        self.client.post(f"/ngo/accept/{self.food.id}/")
+        self.food.refresh_from_db()
+        self.assertEqual(self.food.status, "PENDING")
+        self.client.force_login(self.ngos[1])
+        self.assertEqual(self.client.get(f"/ngo/accept/{self.food.id}/").status_code, 405)
+        self.food.refresh_from_db()
+        self.assertEqual(self.food.status, "PENDING")
+        self.client.post(f"/ngo/accept/{self.food.id}/")
+        self.food.refresh_from_db()
+        self.assertEqual(self.food.status, "ACCEPTED")
+
+    def test_rebuilt_when_ngos_move_or_leave(self):
+        self.assertEqual(self.eligible(self.food), {self.ngos[0].id, self.ngos[1].id})
+        self.move(self.ngos[2], lat=12.9, lng=77.6)
+        self.assertIn(self.ngos[2].id, self.eligible(self.food))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ngos[2].groups.clear()
+        self.assertNotIn(self.ngos[2].id, self.eligible(self.food))
+        self.assertEqual(list(self.ngos[0].eligible_donations.filter(status="PENDING")), [self.food])
+
+    def test_refresh_is_local(self):
+        far = self.donation(40.0, -74.0)
+        far.eligible_ngos.set([self.ngos[0]])  # stale on purpose
+        self.move(self.ngos[2], lat=12.9, lng=77.6)
+        self.assertIn(self.ngos[2].id, self.eligible(self.food))
+        self.assertEqual(self.eligible(far), {self.ngos[0].id})
+        # the donations an NGO was eligible for are refreshed too, wherever they are
+        self.move(self.ngos[0], lng=77.7)
+        self.assertEqual(len(self.eligible(far)), 2)
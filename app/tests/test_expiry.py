@@ -0,0 +1,72 @@
+# app/tests/test_expiry.py
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from app.expiry import ExpiryScheduler
+from app.models import FoodDonation, InventoryMovement, NGOStock
+from app.stock import reconcile_ngo_stock
+
+
+class ExpireFoodTests(TestCase):
+    def test_sweep_in_chunks(self):
+        ngo = User.objects.create(username="ngo")
+        donors = [User.objects.create(username=f"d{i}", email=f"d{i}@x.org") for i in range(3)]
+        now = timezone.now()
+        for i in range(25):
+            FoodDonation.objects.create(
+                donor=donors[i % 3], item_name="rice", quantity_people=5, inventory_remaining=5,
+                prepared_at=now, expires_at=now + timedelta(minutes=-10 if i < 20 else 10),
+                pickup_lat=1, pickup_lng=1, status=["PENDING", "ACCEPTED", "PARTIAL"][i % 3],
+                accepted_by=ngo if i % 3 else None)
+        with mock.patch("app.notifications.notify_user") as notify:
+            call_command("expire_food", "--chunk-size", "7", stdout=StringIO())
+        self.assertEqual(FoodDonation.objects.filter(status="EXPIRED").count(), 20)
+        self.assertEqual(notify.call_count, 3 * 3)  # one per donor per chunk
+        self.assertEqual(reconcile_ngo_stock(), [])
+        self.assertEqual(NGOStock.objects.get().quantity, 15)
+        self.assertEqual(InventoryMovement.objects.filter(kind="EXPIRE").count(), 13)
+        with self.assertNumQueries(3):  # nothing left to expire
+            call_command("expire_food", stdout=StringIO())
+
+
+class ExpirySchedulerTests(TestCase):
+    def test_wakes_at_each_expiry(self):
+        d = User.objects.create(username="d")
+        t0 = timezone.now()
+        clock = [t0]
+
+        def donation(seconds):
+            return FoodDonation.objects.create(
+                donor=d, item_name="rice", quantity_people=5, prepared_at=t0,
+                expires_at=t0 + timedelta(seconds=seconds), pickup_lat=1, pickup_lng=1)
+
+        def expired_at(when):
+            clock[0] = when
+            return [r.id for r in s.tick()]
+
+        a, b = donation(10), donation(100)
+        s = ExpiryScheduler(poll_seconds=30, clock=lambda: clock[0], sleep=lambda x: None)
+        with mock.patch("app.notifications.notify_user"):
+            self.assertEqual(s.tick(), [])
+            self.assertEqual(s.next_wakeup(), a.expires_at)
+            self.assertEqual(expired_at(a.expires_at), [a.id])
+            self.assertEqual(s.next_wakeup(), t0 + timedelta(seconds=30))  # the next poll
+            b.expires_at = t0 + timedelta(seconds=40)
+            b.save()
+            c = donation(35)
+            expired_at(t0 + timedelta(seconds=30))  # the poll picks up b's new time and c
+            self.assertEqual(s.next_wakeup(), c.expires_at)
+            self.assertEqual(expired_at(c.expires_at), [c.id])
+            self.assertEqual(s.next_wakeup(), b.expires_at)
+            self.assertEqual(expired_at(b.expires_at), [b.id])
+        self.assertEqual(FoodDonation.objects.filter(status="EXPIRED").count(), 3)
+        # b's old 100s entry is stale and skipped without touching the donation
+        clock[0] = t0 + timedelta(seconds=200)
+        with self.assertNumQueries(1):
+            self.assertEqual(s.tick(), [])
@@ -0,0 +1,63 @@
+# app/tests/test_geo.py
+import random
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+
+from app import views
+from app.geo import NGOIndex, NGOPoint, get_ngo_index, haversine_km
+from app.models import NGOLocation
+
+
+def _points(rnd, n, lat=(12.7, 13.2), lng=(77.3, 77.9), start=0):
+    return [NGOPoint(start + i, rnd.uniform(*lat), rnd.uniform(*lng), "") for i in range(n)]
+
+
+class NGOIndexTests(TestCase):
+    def test_nearest_matches_brute_force(self):
+        rnd = random.Random(1)
+        pts = _points(rnd, 1000) + _points(rnd, 200, lat=(-89, 89), lng=(-180, 180), start=10000)
+        idx = NGOIndex(pts)
+        for _ in range(100):
+            if rnd.random() < .5:
+                lat, lng = rnd.uniform(12.7, 13.2), rnd.uniform(77.3, 77.9)
+            else:
+                lat, lng = rnd.uniform(-60, 60), rnd.uniform(-180, 180)
+            k = rnd.choice([1, 2, 5])
+            got = idx.nearest(lat, lng, k)
+            exp = sorted((haversine_km(lat, lng, p.lat, p.lng), p.user_id) for p in pts)[:k]
+            self.assertEqual([p.user_id for _, p in got], [u for _, u in exp])
+            for (d, _), (e, _) in zip(got, exp):
+                self.assertAlmostEqual(d, e, places=6)
+
+    def test_index_follows_ngo_changes(self):
+        g = Group.objects.create(name="NGO")
+        u = User.objects.create(username="n1")
+        g.user_set.add(u)
+        self.assertEqual(len(get_ngo_index()), 0)
+        NGOLocation.objects.create(user=u, lat=12.9, lng=77.6, address_line="x")
+        self.assertEqual(len(get_ngo_index()), 1)
+        s = views.suggested_ngos_for_anchor_with_distance(12.9, 77.61)
+        self.assertEqual((s[0]["user"], s[0]["address"]), (u, "x"))
+        self.assertEqual(views.suggested_ngos_for_anchor(12.9, 77.6), [u])
+        u.groups.remove(g)
+        self.assertEqual(len(get_ngo_index()), 0)
+        g.user_set.add(u)
+        self.assertEqual(len(get_ngo_index()), 1)
+        u.delete()
+        self.assertEqual(len(get_ngo_index()), 0)
+
+    def test_nearest_many_matches_nearest(self):
+        import app.geo as geo
+        rnd = random.Random(2)
+        pts = _points(rnd, 500)
+        idx = NGOIndex(pts)
+        coords = [(rnd.uniform(12.7, 13.2), rnd.uniform(77.3, 77.9)) for _ in range(300)]
+        exp = [[p.user_id for _, p in idx.nearest(lat, lng, 2)] for lat, lng in coords]
+        self.assertEqual(idx.nearest_many(coords, 2), exp)
+        np, geo.np = geo.np, None  # pure-Python fallback
+        try:
+            self.assertEqual(idx.nearest_many(coords, 2), exp)
+        finally:
+            geo.np = np
+        self.assertEqual(NGOIndex(pts[:1]).nearest_many(coords[:3], 2), [[0]] * 3)
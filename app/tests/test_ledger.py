@@ -0,0 +1,64 @@
+# app/tests/test_ledger.py
+from datetime import timedelta
+
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from app.allocation import allocate_order
+from app.ledger import stock_history, stock_position, take_snapshot
+from app.models import Delivery, FoodDonation, InventoryMovement, InventorySnapshot, NGOStock, ReceiverOrder
+
+KINDS = ["ACCEPT", "RESERVE", "DELIVER", "EXPIRE"]
+
+
+@override_settings(INVENTORY_SNAPSHOT_LAG_SECONDS=-5)
+class LedgerTests(TestCase):
+    def test_lifecycle(self):
+        ngo = User.objects.create(username="ngo")
+        Group.objects.get_or_create(name="NGO")[0].user_set.add(ngo)
+        rcv = User.objects.create(username="r")
+        now = timezone.now()
+        f = FoodDonation.objects.create(
+            donor=User.objects.create(username="d"), item_name="Rice", quantity_people=10,
+            inventory_remaining=10, prepared_at=now, expires_at=now + timedelta(hours=3),
+            pickup_lat=1, pickup_lng=1)
+        f.status, f.accepted_by = "ACCEPTED", ngo
+        f.save(update_fields=["status", "accepted_by"])
+        self.assertEqual(stock_position(ngo.id, f.item_id), (10, 0))
+        self.assertEqual(take_snapshot(), 1)
+
+        o = ReceiverOrder.objects.create(receiver=rcv, ngo=ngo, item_name="rice", people_count=4)
+        allocate_order(o)
+        self.assertEqual(stock_position(ngo.id, f.item_id), (6, 4))
+
+        self.client.force_login(ngo)
+        dl = Delivery.objects.create(ngo=ngo, order=o)
+        for _ in range(2):  # delivering twice moves stock once
+            self.client.post(f"/ngo/delivery/{dl.pk}/status/", {"status": "DELIVERED"})
+        self.assertEqual(stock_position(ngo.id, f.item_id), (6, 0))
+
+        f.refresh_from_db()
+        f.expires_at = now - timedelta(minutes=1)
+        f.save()
+        f.mark_expired_if_needed()
+        self.assertEqual(take_snapshot(), 1)
+        self.assertEqual(stock_position(ngo.id, f.item_id), (0, 0))
+        self.assertEqual(NGOStock.objects.get(ngo=ngo).quantity, 0)
+        self.assertEqual([m["kind"] for m in stock_history(ngo.id, f.item_id)], KINDS)
+
+        with self.assertRaises(ValueError):
+            InventoryMovement.objects.first().save()
+
+        self.assertContains(self.client.get("/ngo/inventory/"), f"/ngo/inventory/{f.item_id}/history/")
+        r = self.client.get(f"/ngo/inventory/{f.item_id}/history/", {"days": "x"})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([m["kind"] for m in r.context["history"]], KINDS)
+        self.assertEqual((r.context["available"], r.context["reserved"]), (0, 0))
+
+    def test_snapshot_admin_is_read_only(self):
+        admin = site._registry[InventorySnapshot]
+        self.assertFalse(admin.has_add_permission(None))
+        self.assertFalse(admin.has_change_permission(None))
+        self.assertFalse(admin.has_delete_permission(None))
@@ -0,0 +1,68 @@
+# app/tests/test_near.py
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import F, Value
+from django.test import TestCase
+from django.utils import timezone
+
+from app.geo import HaversineKm, haversine_km
+from app.models import FoodDonation
+
+NEAR_URL = "/receiver/browse/near/"
+
+
+class NearMeTests(TestCase):
+    def setUp(self):
+        d = User.objects.create(username="d")
+        n = User.objects.create(username="n")
+        now = timezone.now()
+        for i, (lat, lng) in enumerate([(12.90, 77.60), (12.92, 77.60), (12.99, 77.60), (13.5, 77.6)]):
+            FoodDonation.objects.create(
+                donor=d, item_name=f"I{i}", quantity_people=5, inventory_remaining=5,
+                prepared_at=now, expires_at=now + timedelta(hours=2), pickup_lat=lat, pickup_lng=lng,
+                status="ACCEPTED", accepted_by=n)
+
+    def names(self, resp):
+        return [d.item_name for d in resp.context["donations"]]
+
+    def test_nearest_first_within_radius(self):
+        r = self.client.get(NEAR_URL, {"lat": 12.9, "lng": 77.6, "radius_km": 5})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.names(r), ["I0", "I1"])
+        self.assertContains(r, "km away")
+        r = self.client.get(NEAR_URL, {"lat": 12.9, "lng": 77.6, "radius_km": 20, "limit": 2})
+        self.assertEqual(self.names(r), ["I0", "I1"])
+        r = self.client.get(NEAR_URL, {"lat": 12.9, "lng": 77.6, "radius_km": 500})
+        self.assertEqual(r.context["near"]["radius_km"], 50.0)
+
+    def test_browse_page_links_to_search(self):
+        r = self.client.get("/receiver/browse/")
+        self.assertContains(r, f'action="{NEAR_URL}"')
+
+    def test_rejects_bad_values(self):
+        for bad in ({"lat": 12.9, "lng": 77.6, "radius_km": "nan"},
+                    {"lat": 12.9, "lng": 77.6, "radius_km": "inf"},
+                    {"lat": 12.9, "lng": 77.6, "radius_km": -3},
+                    {"lat": 12.9, "lng": 77.6, "radius_km": 0},
+                    {"lat": "nan", "lng": 77.6},
+                    {"lat": 91, "lng": 77.6},
+                    {"lat": 12.9, "lng": "-inf"},
+                    {"lng": 77.6}):
+            self.assertEqual(self.client.get(NEAR_URL, bad).status_code, 400, bad)
+
+    def test_generic_sql_matches_sqlite_function(self):
+        qs = FoodDonation.objects.annotate(
+            dk=HaversineKm(F("pickup_lat"), F("pickup_lng"), Value(12.9), Value(77.6)))
+        native = sorted(qs.values_list("dk", flat=True))
+        self.assertIn("HAVERSINE_KM", str(qs.query))
+        orig = HaversineKm.as_sqlite
+        HaversineKm.as_sqlite = lambda self, compiler, connection, **kw: HaversineKm.as_sql(self, compiler, connection, **kw)
+        try:
+            self.assertNotIn("HAVERSINE_KM", str(qs.query))
+            generic = sorted(qs.values_list("dk", flat=True))
+        finally:
+            HaversineKm.as_sqlite = orig
+        for a, b in zip(generic, native):
+            self.assertAlmostEqual(a, b, places=6)
+        self.assertAlmostEqual(native[-1], haversine_km(12.9, 77.6, 13.5, 77.6), places=6)
@@ -0,0 +1,95 @@
+# app/tests/test_outbox.py
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from app.models import OutboxMessage
+from app.notifications import notify_user
+from app.outbox import drain_outbox, send_batch
+from app.transport import FakeTransport, PooledTransport, TokenBucket
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="u", email="u@x.org")
+
+    def test_queued_with_the_transaction(self):
+        self.user.profile.phone = "+100"
+        self.user.profile.save()
+        try:
+            with transaction.atomic():
+                notify_user(self.user, "s", "b")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(OutboxMessage.objects.count(), 0)
+        notify_user(self.user, "s", "b")
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        r = drain_outbox()
+        self.assertEqual((r.sent, r.failed), (1, 1))  # SMS: Twilio is not configured
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutboxMessage.objects.get(channel="SMS").status, "FAILED")
+
+    def test_retries_with_backoff(self):
+        notify_user(self.user, "s", "b")
+        now = timezone.now()
+        with mock.patch("app.transport.PooledTransport.send",
+                        side_effect=lambda msgs: [OSError("smtp down")] * len(msgs)):
+            self.assertEqual(send_batch(now=now).retried, 1)
+            m = OutboxMessage.objects.get()
+            self.assertEqual((m.status, m.attempts), ("PENDING", 1))
+            self.assertEqual(send_batch(now=now), (0, 0, 0))  # backing off
+            for i in range(4):
+                send_batch(now=timezone.now() + timedelta(days=i + 1))
+        m.refresh_from_db()
+        self.assertEqual((m.status, m.attempts), ("FAILED", 5))
+        self.assertIn("smtp down", m.last_error)
+
+    def test_command_drains_in_batches(self):
+        for i in range(25):
+            notify_user(User.objects.create(username=f"u{i}", email=f"u{i}@x.org"), "s", "b")
+        call_command("send_notifications", "--batch-size", "10", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertFalse(OutboxMessage.objects.exclude(status="SENT").exists())
+
+
+class TransportTests(TestCase):
+    def test_token_bucket_paces_sends(self):
+        t = [0.0]
+
+        def sleep(seconds):
+            t[0] += seconds
+
+        bucket = TokenBucket(2, 2, clock=lambda: t[0], sleep=sleep)
+        for _ in range(6):
+            bucket.take()
+        self.assertAlmostEqual(t[0], 2.0)  # 2 up front, then 2 per second
+
+    def test_one_connection_per_batch(self):
+        for i in range(30):
+            u = User.objects.create(username=f"u{i}", email=f"u{i}@x.org")
+            u.profile.phone = "+1"
+            u.profile.save()
+            notify_user(u, "s", "b")
+        transport = FakeTransport(email_rate=1e6, sms_rate=1e6)
+        r = drain_outbox(batch_size=25, transport=transport)
+        self.assertEqual((r.sent, r.failed), (60, 0))
+        self.assertEqual(transport.connections, 3)  # 60 messages, 25 per batch
+        self.assertEqual(len(transport.sent), 60)
+
+    @override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    def test_pooled_transport_reports_per_message(self):
+        msgs = [OutboxMessage(channel="EMAIL", to=f"a{i}@x.org", subject="s", body="b") for i in range(3)]
+        msgs += [OutboxMessage(channel="EMAIL", to="", body="b"), OutboxMessage(channel="SMS", to="+1", body="b")]
+        res = PooledTransport().send(msgs)
+        self.assertEqual(res[:3], [None] * 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual([type(e).__name__ for e in res[3:]], ["NotDeliverable", "NotDeliverable"])
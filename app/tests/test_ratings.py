@@ -0,0 +1,130 @@
+# app/tests/test_ratings.py
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app.models import FoodDonation, NGORating, Profile, ReceiverRating
+from app.ratings import decay_donor_ranks, rank_score, rebuild_donor_ratings
+
+
+class RatingTestCase(TestCase):
+    def setUp(self):
+        self.ngo = User.objects.create(username="n")
+
+    def donation(self, donor, **kw):
+        now = timezone.now()
+        return FoodDonation.objects.create(
+            donor=donor, item_name="rice", quantity_people=5, prepared_at=now,
+            expires_at=now + timedelta(hours=1), pickup_lat=1, pickup_lng=1, **kw)
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+
+class RatingTotalsTests(RatingTestCase):
+    def test_totals_follow_ratings(self):
+        d, d2 = User.objects.create(username="d"), User.objects.create(username="d2")
+        f = self.donation(d)
+        a = NGORating.objects.create(donor=d, food=f, ngo=self.ngo, stars=4)
+        NGORating.objects.create(donor=d, food=f, ngo=self.ngo, stars=5)
+        rr = ReceiverRating.objects.create(donor=d, food=f, receiver=User.objects.create(username="r"), stars=3)
+        p = self.profile(d)
+        self.assertEqual((p.ngo_rating_sum, p.ngo_rating_count, p.avg_ngo_rating), (9, 2, 4.5))
+        self.assertEqual((p.receiver_rating_sum, p.receiver_rating_count, p.avg_receiver_rating), (3, 1, 3.0))
+
+        a = NGORating.objects.get(pk=a.pk)
+        a.stars = 1
+        a.save()
+        p.refresh_from_db()
+        self.assertEqual((p.ngo_rating_sum, p.avg_ngo_rating), (6, 3.0))
+
+        a.donor = d2
+        a.save()
+        p.refresh_from_db()
+        p2 = self.profile(d2)
+        self.assertEqual((p.ngo_rating_sum, p.ngo_rating_count, p.avg_ngo_rating), (5, 1, 5.0))
+        self.assertEqual((p2.ngo_rating_sum, p2.ngo_rating_count, p2.avg_ngo_rating), (1, 1, 1.0))
+
+        rr.delete()
+        p.refresh_from_db()
+        self.assertEqual((p.receiver_rating_sum, p.receiver_rating_count, p.avg_receiver_rating), (0, 0, 0.0))
+
+    def test_rebuild_fixes_drift(self):
+        d = User.objects.create(username="d")
+        NGORating.objects.create(donor=d, food=self.donation(d), ngo=self.ngo, stars=4)
+        self.assertEqual(rebuild_donor_ratings(), 0)
+        Profile.objects.filter(user=d).update(ngo_rating_sum=99)
+        self.assertEqual(rebuild_donor_ratings(), 1)
+        self.assertEqual(self.profile(d).ngo_rating_sum, 4)
+
+    def test_cost_does_not_grow_with_history(self):
+        d = User.objects.create(username="d")
+        f = self.donation(d)
+        for _ in range(30):
+            NGORating.objects.create(donor=d, food=f, ngo=self.ngo, stars=3)
+        with self.assertNumQueries(3):  # INSERT, UPDATE profile, queued notification
+            NGORating.objects.create(donor=d, food=f, ngo=self.ngo, stars=3)
+
+    def test_rate_view(self):
+        d = User.objects.create(username="d")
+        Group.objects.get_or_create(name="NGO")[0].user_set.add(self.ngo)
+        f = self.donation(d)
+        self.client.force_login(self.ngo)
+        resp = self.client.post(reverse("ngo_rate_donor", args=[f.pk]), {"stars": 4, "comment": "x"})
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(self.profile(d).avg_ngo_rating, 4.0)
+
+
+class RankScoreTests(RatingTestCase):
+    def test_bayesian_score(self):
+        d, e = User.objects.create(username="d"), User.objects.create(username="e")
+        f = self.donation(d)
+        NGORating.objects.create(donor=d, food=f, ngo=self.ngo, stars=5)
+        for _ in range(10):
+            NGORating.objects.create(donor=e, food=f, ngo=self.ngo, stars=4)
+        # prior of 3.0 stars weighted as 5 ratings
+        self.assertAlmostEqual(self.profile(d).rank_score, (15 + 5) / 6)
+        self.assertAlmostEqual(self.profile(e).rank_score, (15 + 40) / 15)
+        self.assertEqual(self.profile(self.ngo).rank_score, 3.0)
+        self.assertEqual(rebuild_donor_ratings(), 0)
+
+    @override_settings(DONOR_RANK_HALF_LIFE_DAYS=10)
+    def test_decay(self):
+        d = User.objects.create(username="d")
+        f = self.donation(d)
+        r = NGORating.objects.create(donor=d, food=f, ngo=self.ngo, stars=5)
+        ten_days_ago = timezone.now() - timedelta(days=10)
+        NGORating.objects.filter(pk=r.pk).update(created_at=ten_days_ago)
+        Profile.objects.filter(user=d).update(rank_decayed_at=ten_days_ago)
+        self.assertEqual(decay_donor_ranks(), 1)
+        p = self.profile(d)
+        self.assertAlmostEqual(p.rank_weight, 0.5, places=4)
+        self.assertAlmostEqual(p.rank_score, (15 + 2.5) / 5.5, places=4)
+        # edits and deletes take back the decayed weight, not the original one
+        r = NGORating.objects.get(pk=r.pk)
+        r.stars = 1
+        r.save()
+        self.assertAlmostEqual(self.profile(d).rank_stars, 0.5, places=4)
+        r.delete()
+        p = self.profile(d)
+        self.assertAlmostEqual(p.rank_weight, 0.0, places=4)
+        self.assertAlmostEqual(p.rank_score, 3.0, places=4)
+        NGORating.objects.create(donor=d, food=f, ngo=self.ngo, stars=2)
+        rebuild_donor_ratings()
+        self.assertAlmostEqual(self.profile(d).rank_score, rank_score(2, 1), places=4)
+
+    def test_browse_orders_by_rank(self):
+        foods = {}
+        for name in ("good", "bad", "new"):
+            donor = User.objects.create(username=name)
+            foods[name] = self.donation(donor, status="ACCEPTED", accepted_by=self.ngo, inventory_remaining=5)
+        NGORating.objects.create(donor=foods["good"].donor, food=foods["good"], ngo=self.ngo, stars=5)
+        NGORating.objects.create(donor=foods["bad"].donor, food=foods["bad"], ngo=self.ngo, stars=1)
+        self.client.force_login(User.objects.create(username="r"))
+        resp = self.client.get(reverse("receiver_browse"))
+        self.assertEqual([d.donor.username for d in resp.context["donations"]], ["good", "new", "bad"])
+        resp = self.client.get(reverse("receiver_browse"), {"limit": 1})
+        self.assertEqual(len(resp.context["donations"]), 1)
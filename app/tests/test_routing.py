@@ -0,0 +1,57 @@
+# app/tests/test_routing.py
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from django.utils import timezone
+
+from app.models import Allocation, Delivery, FoodDonation, NGOLocation, ReceiverOrder
+from app.routing import haversine_matrix, plan_route, route_for_order, solve_path
+
+
+def path_cost(path, d):
+    return sum(d[a][b] for a, b in zip(path, path[1:]))
+
+
+class SolverTests(TestCase):
+    def test_near_optimal_on_small_paths(self):
+        rnd = random.Random(1)
+        for _ in range(20):
+            pts = [(12.9 + rnd.random() * .2, 77.5 + rnd.random() * .2) for _ in range(8)]
+            d = haversine_matrix(pts)
+            path = solve_path(d, 0, 7)
+            self.assertEqual(sorted(path), list(range(8)))
+            self.assertEqual((path[0], path[-1]), (0, 7))
+            best = min(path_cost([0, *p, 7], d) for p in itertools.permutations(range(1, 7)))
+            self.assertLess(path_cost(path, d), best * 1.25)
+
+    def test_without_depot(self):
+        stops = [{"kind": "pickup", "lat": 0, "lng": lng, "label": ""} for lng in (0.3, 0.1, 0.2)]
+        stops.append({"kind": "drop", "lat": 0, "lng": 0, "label": ""})
+        self.assertEqual([s["lng"] for s in plan_route(stops)["stops"]], [0.3, 0.2, 0.1, 0])
+
+
+class RouteForOrderTests(TestCase):
+    def test_route_is_cached_on_delivery(self):
+        ngo = User.objects.create(username="ngo")
+        Group.objects.get_or_create(name="NGO")[0].user_set.add(ngo)
+        NGOLocation.objects.create(user=ngo, lat=12.9, lng=77.5)
+        o = ReceiverOrder.objects.create(receiver=User.objects.create(username="rcv"), ngo=ngo, item_name="rice",
+                                         people_count=3, delivery_lat=13.0, delivery_lng=77.6, status="ALLOCATED")
+        now = timezone.now()
+        for i in range(4):
+            d = FoodDonation.objects.create(
+                donor=User.objects.create(username=f"d{i}"), item_name="rice", quantity_people=5,
+                inventory_remaining=5, prepared_at=now, expires_at=now + timedelta(hours=3),
+                pickup_lat=12.9 + i * .03, pickup_lng=77.5 + i * .02, status="ACCEPTED", accepted_by=ngo)
+            Allocation.objects.create(order=o, donation=d, quantity=1)
+        Delivery.objects.create(ngo=ngo, order=o)
+        route = route_for_order(ReceiverOrder.objects.get(pk=o.pk))
+        self.assertEqual([s["kind"] for s in route["stops"]], ["start"] + ["pickup"] * 4 + ["drop"])
+        self.assertEqual(Delivery.objects.get(order=o).route_json["key"], route["key"])
+        self.client.force_login(ngo)
+        resp = self.client.get(f"/ngo/orders/{o.pk}/map/")
+        self.assertContains(resp, "route-stops")
+        self.assertContains(resp, "Deliver to")
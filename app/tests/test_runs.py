@@ -0,0 +1,63 @@
+# app/tests/test_runs.py
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from app.models import Allocation, Delivery, FoodDonation, NGOLocation, ReceiverOrder
+from app.runs import RunPlanner, batch_jobs, plan_delivery_runs, synthetic_jobs
+
+STOP_ORDER = ["start", "pickup", "drop"]
+
+
+class BatchJobsTests(TestCase):
+    def test_runs_respect_capacity_and_stop_order(self):
+        now = timezone.now()
+        jobs = synthetic_jobs(120, now, seed=2)
+        planner = RunPlanner(depot=(12.97, 77.59, "d"), now=now)
+        runs = batch_jobs(jobs, planner)
+        self.assertEqual(sorted(j.order_id for r in runs for j in r.jobs), [j.order_id for j in jobs])
+        for r in runs:
+            self.assertLessEqual(sum(j.load for j in r.jobs), planner.capacity)
+            kinds = [s["kind"] for s in r.stops]
+            self.assertEqual(kinds[0], "start")
+            self.assertEqual(kinds, sorted(kinds, key=STOP_ORDER.index))
+            if len(r.jobs) > 1:
+                self.assertTrue(r.on_time)
+
+
+class PlanDeliveryRunsTests(TestCase):
+    def test_orders_share_one_run(self):
+        ngo = User.objects.create(username="ngo")
+        Group.objects.get_or_create(name="NGO")[0].user_set.add(ngo)
+        NGOLocation.objects.create(user=ngo, lat=12.97, lng=77.59)
+        now = timezone.now()
+        d = FoodDonation.objects.create(
+            donor=User.objects.create(username="donor"), item_name="rice", quantity_people=50,
+            inventory_remaining=20, prepared_at=now, expires_at=now + timedelta(hours=5),
+            pickup_lat=12.98, pickup_lng=77.6, status="PARTIAL", accepted_by=ngo)
+        for i in range(3):
+            o = ReceiverOrder.objects.create(
+                receiver=User.objects.create(username=f"r{i}"), ngo=ngo, item_name="rice", people_count=10,
+                delivery_lat=12.99 + i * .001, delivery_lng=77.61, status="ALLOCATED")
+            Allocation.objects.create(order=o, donation=d, quantity=10)
+            if i:  # the first order has no Delivery yet
+                Delivery.objects.create(ngo=ngo, order=o)
+        runs = plan_delivery_runs(ngo)
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(Delivery.objects.filter(run=runs[0]).count(), 3)
+        self.assertEqual(plan_delivery_runs(ngo), [])
+        self.client.force_login(ngo)
+        self.assertContains(self.client.get("/ngo/deliveries/"), f"Run #{runs[0].id}")
+
+    def test_command_rejects_unknown_ngo(self):
+        ngo = User.objects.create(username="ngo")
+        Group.objects.get_or_create(name="NGO")[0].user_set.add(ngo)
+        with self.assertRaisesMessage(CommandError, "Unknown NGO user(s): nobody"):
+            call_command("plan_delivery_runs", "--ngo", "ngo", "--ngo", "nobody", stdout=StringIO())
+        out = StringIO()
+        call_command("plan_delivery_runs", "--ngo", "ngo", stdout=out)
+        self.assertIn("Planned 0 runs", out.getvalue())
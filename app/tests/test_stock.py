@@ -0,0 +1,93 @@
+# app/tests/test_stock.py
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from app.allocation import allocate_open_orders, allocate_order, choose_ngo_for_item
+from app.models import FoodDonation, FoodItem, NGOStock, ReceiverOrder
+from app.stock import available_stock, reconcile_ngo_stock
+
+
+class StockTestCase(TestCase):
+    def setUp(self):
+        self.n1 = User.objects.create(username="n1")
+        self.n2 = User.objects.create(username="n2")
+        self.donor = User.objects.create(username="d")
+        self.a = self.donation("Veg Biryani", self.n1, 5)
+        self.donation("veg  biryani ", self.n1, 4)
+        self.donation("VEG BIRYANI", self.n2, 8)
+
+    def donation(self, name, ngo, qty):
+        now = timezone.now()
+        return FoodDonation.objects.create(
+            donor=self.donor, item_name=name, quantity_people=qty, inventory_remaining=qty,
+            prepared_at=now, expires_at=now + timedelta(hours=2), pickup_lat=1, pickup_lng=1,
+            status="ACCEPTED", accepted_by=ngo)
+
+
+class ChooseNGOTests(StockTestCase):
+    def test_picks_ngo_with_most_stock(self):
+        self.assertEqual(choose_ngo_for_item(" veg biryani"), (self.n1, 9))
+        with self.assertNumQueries(3):  # counters, unswept expired stock, the user
+            choose_ngo_for_item("Veg Biryani")
+        self.a.inventory_remaining = 1
+        self.a.save(update_fields=["inventory_remaining"])
+        self.assertEqual(choose_ngo_for_item("veg biryani"), (self.n2, 8))
+        o = ReceiverOrder.objects.create(receiver=self.n1, ngo=self.n2, item_name="Veg biryani", people_count=6)
+        allocate_order(o)
+        self.assertEqual(choose_ngo_for_item("veg biryani"), (self.n1, 5))
+        self.assertEqual(choose_ngo_for_item("dal"), (None, 0))
+
+
+class NGOStockCounterTests(StockTestCase):
+    def test_counters_follow_donations(self):
+        self.assertEqual(reconcile_ngo_stock(), [])
+        self.assertEqual(available_stock("veg biryani"), 17)
+        self.a.expires_at = timezone.now() - timedelta(minutes=1)
+        self.a.save()
+        self.assertTrue(self.a.mark_expired_if_needed())
+        self.assertEqual(available_stock("veg biryani"), 12)
+        ReceiverOrder.objects.create(receiver=self.n1, item_name="veg biryani", people_count=3)
+        allocate_open_orders(self.n2)
+        self.assertEqual(available_stock("veg biryani"), 9)
+        FoodDonation.objects.filter(accepted_by=self.n2).first().delete()
+        self.assertEqual(reconcile_ngo_stock(), [])
+        self.assertEqual(available_stock("veg biryani"), 4)
+
+    def test_reconcile_fixes_drift(self):
+        NGOStock.objects.update(quantity=99)
+        self.assertEqual(len(reconcile_ngo_stock(fix=True)), 2)
+        self.assertEqual(reconcile_ngo_stock(), [])
+        self.assertEqual(available_stock("veg biryani"), 17)
+
+
+class FoodItemTests(StockTestCase):
+    def test_names_share_one_item(self):
+        self.assertEqual(FoodItem.objects.count(), 1)
+        item = FoodItem.for_name("Veg biryani")
+        self.assertEqual((item.key, item.name), ("veg biryani", "Veg Biryani"))
+        o = ReceiverOrder.objects.create(receiver=self.n1, item_name=" VEG biryani", people_count=1)
+        self.assertEqual(o.item, item)
+
+    def test_rename_moves_stock(self):
+        self.a.item_name = "Dal"
+        self.a.save()
+        self.assertEqual(self.a.item.key, "dal")
+        self.assertEqual(available_stock("dal"), 5)
+        self.assertEqual(available_stock("veg biryani"), 12)
+        self.assertEqual(reconcile_ngo_stock(), [])
+
+
+class UnsweptExpiryTests(StockTestCase):
+    def test_expired_stock_is_not_offered(self):
+        # past expiry but still ACCEPTED: the scheduler has not swept it yet
+        FoodDonation.objects.filter(accepted_by=self.n2).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(available_stock("veg biryani"), 9)
+        self.assertEqual(choose_ngo_for_item("veg biryani"), (self.n1, 9))
+        o = ReceiverOrder.objects.create(receiver=self.n1, ngo=self.n2, item_name="veg biryani", people_count=2)
+        with self.assertRaisesMessage(RuntimeError, "Insufficient"):
+            allocate_order(o)
+        o = ReceiverOrder.objects.create(receiver=self.n1, ngo=self.n1, item_name="veg biryani", people_count=9)
+        self.assertEqual(sum(a.quantity for a in allocate_order(o)), 9)
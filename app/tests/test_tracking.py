@@ -0,0 +1,129 @@
+# app/tests/test_tracking.py
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from app.allocation import allocate_order
+from app.models import Delivery, FoodDonation, NGOStock, OutboxMessage, ReceiverOrder
+from app.stock import reconcile_ngo_stock
+from app.tracking import status_changed
+
+
+class StatusChangedTests(TestCase):
+    def setUp(self):
+        self.seen = []
+        status_changed.connect(self.record)
+        self.addCleanup(status_changed.disconnect, self.record)
+        self.rcv = User.objects.create(username="r", email="r@x.org")
+
+    def record(self, sender, instance, old, new, created, **kwargs):
+        self.seen.append((sender.__name__, old, new, created))
+
+    def test_sent_once_per_saved_status_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            o = ReceiverOrder.objects.create(receiver=self.rcv, item_name="rice", people_count=2)
+        self.assertEqual(self.seen, [("ReceiverOrder", None, "REQUESTED", True)])
+        o = ReceiverOrder.objects.get(pk=o.pk)
+        self.assertEqual(o.changed_fields, frozenset())
+        o.people_count = 3
+        with self.assertNumQueries(1):  # no SELECT for the old values
+            o.save()
+        o.status = "APPROVED"
+        self.assertEqual(o.changed_fields, {"status"})
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            o.save(update_fields=["status"])
+            self.assertEqual(len(self.seen), 1)  # not before the commit
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.seen[-1], ("ReceiverOrder", "REQUESTED", "APPROVED", False))
+        o.status = "ALLOCATED"
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            o.save(update_fields=["people_count"])  # status not saved: no event, still dirty
+        self.assertEqual(callbacks, [])
+        self.assertEqual(o.changed_fields, {"status"})
+        o.refresh_from_db()
+        self.assertEqual((o.status, o.changed_fields), ("APPROVED", frozenset()))
+
+    def test_rolled_back_change_sends_nothing(self):
+        o = ReceiverOrder.objects.create(receiver=self.rcv, item_name="rice", people_count=2, status="APPROVED")
+        self.seen.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    o.status = "REJECTED"
+                    o.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self.seen, [])
+        self.assertFalse(OutboxMessage.objects.filter(subject="[HopeMeals] Order update: Rejected").exists())
+
+    def test_delivery_status_notifies_receiver(self):
+        o = ReceiverOrder.objects.create(receiver=self.rcv, item_name="rice", people_count=2)
+        d = Delivery.objects.create(ngo=User.objects.create(username="n"), order=o)
+        d = Delivery.objects.get(pk=d.pk)
+        d.status = "IN_TRANSIT"
+        with self.captureOnCommitCallbacks(execute=True):
+            d.save()
+        self.assertEqual(self.seen[-1], ("Delivery", "PICKED_UP", "IN_TRANSIT", False))
+        self.assertTrue(OutboxMessage.objects.filter(subject="[HopeMeals] Order update: In Transit").exists())
+
+
+class DonationStockTrackingTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create(username="d", email="d@x.org")
+        self.ngo = User.objects.create(username="n")
+        now = timezone.now()
+        self.food = FoodDonation.objects.create(
+            donor=self.donor, item_name="rice", quantity_people=10, prepared_at=now,
+            expires_at=now + timedelta(hours=2), pickup_lat=1, pickup_lng=1)
+
+    def accept(self, remaining):
+        f = FoodDonation.objects.get(pk=self.food.pk)
+        f.status, f.accepted_by, f.inventory_remaining = "ACCEPTED", self.ngo, remaining
+        f.save(update_fields=["status", "accepted_by", "inventory_remaining"])
+        return f
+
+    def test_accept_moves_stock_and_notifies(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            f = self.accept(5)
+        self.assertEqual(NGOStock.objects.get().quantity, 5)
+        self.assertTrue(OutboxMessage.objects.filter(subject="[HopeMeals] Your donation was approved").exists())
+        f.inventory_remaining = 2
+        f.save(update_fields=["status"])  # remaining not saved
+        self.assertEqual(reconcile_ngo_stock(), [])
+        f.save()
+        self.assertEqual(NGOStock.objects.get().quantity, 2)
+        self.assertEqual(reconcile_ngo_stock(), [])
+
+    def test_stale_instance_after_allocation(self):
+        stale = self.accept(10)
+        o = ReceiverOrder.objects.create(receiver=User.objects.create(username="r"), ngo=self.ngo,
+                                         item_name="rice", people_count=4, status="APPROVED")
+        allocate_order(o)
+        stale.description = "edited"
+        stale.save()
+        fresh = FoodDonation.objects.get(pk=stale.pk)
+        self.assertEqual((fresh.description, fresh.inventory_remaining), ("edited", 6))
+        self.assertEqual(NGOStock.objects.get().quantity, 6)
+        self.assertEqual(reconcile_ngo_stock(), [])
+        stale.inventory_remaining = 0  # an explicit change is still written
+        stale.save()
+        self.assertEqual(NGOStock.objects.get().quantity, 0)
+        self.assertEqual(reconcile_ngo_stock(), [])
+        stale.inventory_remaining = 6
+        stale.save()
+        stale.delete()
+        self.assertEqual(reconcile_ngo_stock(), [])
+
+    def test_edit_that_moves_no_stock_is_one_update(self):
+        self.accept(5)
+        f = FoodDonation.objects.get(pk=self.food.pk)
+        f.description = "edited"
+        with self.assertNumQueries(1):
+            f.save(update_fields=["description"])
+        with self.assertNumQueries(1):
+            f.save()
+        self.assertEqual(NGOStock.objects.get().quantity, 5)
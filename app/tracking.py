@@ -0,0 +1,89 @@
+# app/tracking.py
+"""
+Change tracking for model instances. TrackedFieldsMixin remembers the values
+of `tracked_fields` as they were loaded (from_db) or last saved, so a save
+knows what changed without reading the row first, and sends status_changed
+once the transaction that saved a new status commits; a rolled-back change
+sends nothing.
+"""
+from functools import partial
+from typing import Dict, FrozenSet
+
+from django.db import transaction
+from django.dispatch import Signal
+
+# sender=model class; kwargs: instance, old (None when created), new, created
+status_changed = Signal()
+
+
+class TrackedFieldsMixin:
+    """
+    Put before models.Model in the bases. `tracked_fields` are attnames
+    ("accepted_by_id", not "accepted_by"); `status_field` must be one of them,
+    or None for models without a status. Values deferred at load time are
+    unknown and never reported as changed.
+    """
+    tracked_fields = ("status",)
+    status_field = "status"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_values: Dict[str, object] = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember(f for f in cls.tracked_fields if f in field_names)
+        return instance
+
+    def _remember(self, attnames) -> None:
+        for f in attnames:
+            self._loaded_values[f] = getattr(self, f)
+
+    def loaded_value(self, attname, default=None):
+        """Value of a tracked field as loaded or last saved."""
+        return self._loaded_values.get(attname, default)
+
+    def has_loaded(self, *attnames) -> bool:
+        return all(f in self._loaded_values for f in attnames)
+
+    @property
+    def changed_fields(self) -> FrozenSet[str]:
+        """Tracked fields that differ from the loaded values (all of them before the first save)."""
+        if self._state.adding:
+            return frozenset(self.tracked_fields)
+        return frozenset(f for f, v in self._loaded_values.items() if getattr(self, f) != v)
+
+    def _saved_attnames(self, update_fields):
+        if update_fields is None:
+            return self.tracked_fields
+        attnames = {self._meta.get_field(name).attname for name in update_fields}
+        return [f for f in self.tracked_fields if f in attnames]
+
+    def refresh_from_db(self, using=None, fields=None, *args, **kwargs):
+        super().refresh_from_db(using, fields, *args, **kwargs)
+        if fields is None:
+            self._remember(self.tracked_fields)
+        else:
+            names = set(fields)
+            self._remember(f for f in self.tracked_fields
+                           if f in names or self._meta.get_field(f).name in names)
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        saved = self._saved_attnames(kwargs.get("update_fields"))
+        status = self.status_field
+        old = self._loaded_values.get(status)
+        status_known = created or status in self._loaded_values
+        super().save(*args, **kwargs)
+        self._remember(saved)
+
+        if status is None:
+            return
+        new = getattr(self, status)
+        if status in saved and status_known and (created or old != new):
+            transaction.on_commit(
+                partial(status_changed.send, sender=type(self), instance=self,
+                        old=None if created else old, new=new, created=created),
+                using=kwargs.get("using"),
+            )
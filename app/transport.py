@@ -0,0 +1,172 @@
+# app/transport.py
+"""
+Batch senders for the outbox worker. PooledTransport sends a batch's emails
+over one SMTP connection (get_connection + send_messages) and its SMS
+through one cached Twilio client, each channel throttled by a token bucket.
+
+The transport is pluggable through NOTIFICATION_TRANSPORT (dotted path to a
+class taking no arguments); FakeTransport stands in for SMTP and Twilio with
+fixed delays so `manage.py notification_benchmark` runs offline.
+"""
+import time
+from typing import List, Optional, Sequence
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils.module_loading import import_string
+
+from .notifications import NotDeliverable, _twilio_client, from_email
+
+
+class TokenBucket:
+    """
+    Allows `rate` sends per second on average with bursts of up to `burst`;
+    take() sleeps until a token is free. Per process, not shared between workers.
+    """
+
+    def __init__(self, rate: float, burst: float = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+
+    def take(self, n: float = 1) -> None:
+        while True:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= n:
+                self.tokens -= n
+                return
+            self.sleep((n - self.tokens) / self.rate)
+
+
+class PooledTransport:
+    """
+    send(messages) -> [None or the exception, ...] in message order.
+    Rates come from NOTIFICATION_EMAIL_RATE (default 10/s) and
+    NOTIFICATION_SMS_RATE (default 1/s), bursts from the matching *_BURST.
+    """
+
+    def __init__(self, email_rate: float = None, sms_rate: float = None):
+        email_rate = email_rate or getattr(settings, "NOTIFICATION_EMAIL_RATE", 10)
+        sms_rate = sms_rate or getattr(settings, "NOTIFICATION_SMS_RATE", 1)
+        self.email_bucket = TokenBucket(email_rate, getattr(settings, "NOTIFICATION_EMAIL_BURST", None))
+        self.sms_bucket = TokenBucket(sms_rate, getattr(settings, "NOTIFICATION_SMS_BURST", None))
+
+    def email_connection(self):
+        return get_connection(fail_silently=False)
+
+    def sms_client(self):
+        return _twilio_client()
+
+    def sms_from_number(self) -> str:
+        return getattr(settings, "TWILIO_FROM_NUMBER", "")
+
+    def send(self, messages: Sequence) -> List[Optional[Exception]]:
+        results: List[Optional[Exception]] = [None] * len(messages)
+        emails = [(i, m) for i, m in enumerate(messages) if m.channel != "SMS"]
+        texts = [(i, m) for i, m in enumerate(messages) if m.channel == "SMS"]
+        if emails:
+            self._send_emails(emails, results)
+        if texts:
+            self._send_texts(texts, results)
+        return results
+
+    def _send_emails(self, items, results) -> None:
+        sender = from_email()
+        conn = self.email_connection()
+        try:
+            conn.open()
+        except Exception as e:
+            for i, _ in items:
+                results[i] = e
+            return
+        try:
+            for i, m in items:
+                if not m.to:
+                    results[i] = NotDeliverable("no email address")
+                    continue
+                self.email_bucket.take()
+                try:
+                    conn.send_messages([EmailMessage(m.subject, m.body, sender, [m.to], connection=conn)])
+                except Exception as e:
+                    results[i] = e
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _send_texts(self, items, results) -> None:
+        client, from_num = self.sms_client(), self.sms_from_number()
+        for i, m in items:
+            if not m.to:
+                results[i] = NotDeliverable("no phone number")
+            elif not (client and from_num):
+                results[i] = NotDeliverable("Twilio is not configured")
+            else:
+                self.sms_bucket.take()
+                try:
+                    client.messages.create(to=m.to, from_=from_num, body=m.body)
+                except Exception as e:
+                    results[i] = e
+
+
+class _FakeEmailConnection:
+    def __init__(self, transport):
+        self.transport = transport
+
+    def open(self):
+        self.transport.connections += 1
+        time.sleep(self.transport.connect_seconds)
+
+    def send_messages(self, messages):
+        time.sleep(self.transport.send_seconds * len(messages))
+        self.transport.sent.extend(messages)
+        return len(messages)
+
+    def close(self):
+        pass
+
+
+class _FakeSMSClient:
+    def __init__(self, transport):
+        self.transport = transport
+        self.messages = self
+
+    def create(self, to, from_, body):
+        time.sleep(self.transport.send_seconds)
+        self.transport.sent.append((to, body))
+
+
+class FakeTransport(PooledTransport):
+    """
+    PooledTransport with SMTP and Twilio replaced by in-memory fakes that take
+    connect_seconds per connection and send_seconds per message. Sent
+    messages collect in .sent; .connections counts SMTP handshakes.
+    """
+
+    def __init__(self, connect_seconds: float = 0.0, send_seconds: float = 0.0,
+                 email_rate: float = None, sms_rate: float = None):
+        super().__init__(email_rate, sms_rate)
+        self.connect_seconds = connect_seconds
+        self.send_seconds = send_seconds
+        self.sent = []
+        self.connections = 0
+
+    def email_connection(self):
+        return _FakeEmailConnection(self)
+
+    def sms_client(self):
+        return _FakeSMSClient(self)
+
+    def sms_from_number(self) -> str:
+        return "+10000000000"
+
+
+def get_transport():
+    path = getattr(settings, "NOTIFICATION_TRANSPORT", None)
+    return import_string(path)() if path else PooledTransport()
@@ -39,12 +39,15 @@ urlpatterns = [
     path("ngo/accept/<int:pk>/", views.ngo_accept_food, name="ngo_accept_food"),
     path("ngo/reject/<int:pk>/", views.ngo_reject_food, name="ngo_reject_food"),
     path("ngo/inventory/", views.ngo_inventory, name="ngo_inventory"),
+    path("ngo/inventory/<int:item_id>/history/", views.ngo_stock_history, name="ngo_stock_history"),
     path("ngo/orders/", views.ngo_orders_list, name="ngo_orders"),
+    path("ngo/orders/allocate-all/", views.ngo_allocate_all_orders, name="ngo_allocate_all_orders"),
     path("ngo/orders/<int:order_id>/approve/", views.ngo_approve_order, name="ngo_approve_order"),
     path("ngo/orders/<int:order_id>/map/", views.ngo_combined_map, name="ngo_combined_map"),
 
     # Receiver (order-based flow)
     path("receiver/browse/", views.receiver_browse, name="receiver_browse"),
+    path("receiver/browse/near/", views.receiver_near_me, name="receiver_near_me"),
     path("receiver/request/", views.receiver_request_order, name="receiver_request_order"),
     path("receiver/requests/", views.receiver_requests, name="receiver_requests"),
 
@@ -55,8 +58,10 @@ urlpatterns = [
     # Ratings
    
     path("api/admin/stats/", views.admin_stats_api, name="admin_stats_api"),
+    path("api/map/clusters/", views.map_clusters, name="map_clusters"),
     # NGO delivery tracking
     path("ngo/deliveries/", views.ngo_deliveries, name="ngo_deliveries"),
+    path("ngo/deliveries/plan-runs/", views.ngo_plan_delivery_runs, name="ngo_plan_delivery_runs"),
 
     # Receiver order detail
     path("receiver/orders/<int:order_id>/", views.receiver_order_detail, name="receiver_order_detail"),
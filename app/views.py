@@ -1,7 +1,8 @@
-import os, json, random, requests, math
+import os, json, math, random, requests
 from collections import defaultdict
 from app.notifications import notify_user
-from app.notifications import notify_donor_food_approved
+from app.notifications import notify_order_approved
+from app.dispatch import dispatch_notification
 import google.generativeai as genai
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render, redirect, get_object_or_404
@@ -16,13 +17,18 @@ from django.db import transaction
 from django.db.models import Count,Sum,Avg,F,Q,FloatField,Value,ExpressionWrapper,Case,When
 from django.db.models.functions import TruncDate, Coalesce
 from django.utils import timezone
-from .models import Profile,HelpRequest,FoodDonation,NGOInventory,Delivery,NGORating,ReceiverRating,ReceiverOrder,Food,FoodRequest,Rating, NGOLocation
+from .models import Profile,HelpRequest,FoodDonation,InventoryMovement,Delivery,NGORating,ReceiverRating,ReceiverOrder,Food,FoodRequest,Rating, NGOLocation, FoodItem, NGOStock, donor_rank_expression
 # --- Forms (new flow) ---
 from .forms import CustomUserCreationForm,FoodDonationForm,NGORatingForm,ReceiverRatingForm,ReceiverOrderForm
 # --- Utilities ---
 from .utils_ai import parse_food_note
-from .allocation import allocate_order, choose_ngo_for_item
-from .notifications import send_email_notification, send_sms_notification
+from .allocation import allocate_order, allocate_open_orders, choose_ngo_for_item
+from .geo import get_ngo_index, assign_eligible_ngos, within_radius
+from .clusters import clusters_for_bbox
+from .routing import route_for_order
+from .runs import plan_delivery_runs
+from .stock import available_stock
+from .ledger import record_movements, stock_history, stock_position
 from .pdfs import allocation_pdf
 from datetime import timedelta
 from django.views.decorators.csrf import ensure_csrf_cookie
@@ -111,20 +117,6 @@ def _sync_food_rating_from_donation(fd: FoodDonation, role: str, rater_user, sta
     )
 
 
-def _recompute_donor_averages(donor_user):
-    """
-    Keep Profile.avg_ngo_rating / avg_receiver_rating in sync with NGORating/ReceiverRating.
-    """
-    ngo_qs = donor_user.ngo_ratings_received.all()
-    recv_qs = donor_user.receiver_ratings_received.all()
-    avg_ngo = round(sum(r.stars for r in ngo_qs) / ngo_qs.count(), 2) if ngo_qs.exists() else 0.0
-    avg_recv = round(sum(r.stars for r in recv_qs) / recv_qs.count(), 2) if recv_qs.exists() else 0.0
-    prof, _ = Profile.objects.get_or_create(user=donor_user)
-    prof.avg_ngo_rating = avg_ngo
-    prof.avg_receiver_rating = avg_recv
-    prof.save(update_fields=["avg_ngo_rating", "avg_receiver_rating"])
-
-
 # -----------------------------
 # Core pages
 # -----------------------------
@@ -267,11 +259,7 @@ def receiver(request):
     # NEW: Approved foods with ratings
     approved_food = (
     FoodDonation.objects
-    .filter(
-        status__in=["ACCEPTED", "PARTIAL"],
-        inventory_remaining__gt=0,
-        expires_at__gt=timezone.now(),
-    )
+    .available()
     .annotate(
         # Avg NGO rating for THIS food
         ngo_avg=Coalesce(Avg("ngo_ratings__stars"), Value(0.0), output_field=FloatField()),
@@ -314,9 +302,9 @@ def donor(request):
 
     # ---- KPI totals (unchanged from your improved dashboard) ----
     posted    = qs.count()
-    pending   = qs.filter(status="PENDING").count()
-    approved  = qs.filter(status__in=["ACCEPTED", "PARTIAL"]).count()
-    expired   = qs.filter(status="EXPIRED").count()
+    pending   = qs.with_status("PENDING").count()
+    approved  = qs.with_status("ACCEPTED", "PARTIAL").count()
+    expired   = qs.expired().count()
     completed = qs.filter(inventory_remaining=0).count()
 
     offered_people = qs.aggregate(s=Coalesce(Sum("quantity_people"), 0))["s"]
@@ -343,26 +331,26 @@ def donor(request):
     base_qs = qs
     if flt == "posted":
         # actively posted: not expired and still has remaining inventory
-        base_qs = base_qs.exclude(status="EXPIRED").filter(inventory_remaining__gt=0)
+        base_qs = base_qs.unexpired().filter(inventory_remaining__gt=0)
     elif flt == "delivered":
         # fully served/depleted
         base_qs = base_qs.filter(inventory_remaining=0)
     elif flt == "expired":
-        base_qs = base_qs.filter(status="EXPIRED")
+        base_qs = base_qs.expired()
     else:
         flt = "all"  # normalize anything else
 
     # counts for pills
     filter_counts = {
         "all": posted,
-        "posted": qs.exclude(status="EXPIRED").filter(inventory_remaining__gt=0).count(),
+        "posted": qs.unexpired().filter(inventory_remaining__gt=0).count(),
         "delivered": qs.filter(inventory_remaining=0).count(),
-        "expired": qs.filter(status="EXPIRED").count(),
+        "expired": expired,
     }
 
     # annotate served + served percentage for progress bar
     foods = (
-        base_qs.annotate(
+        base_qs.with_effective_status().annotate(
             served=F("quantity_people") - F("inventory_remaining"),
         ).annotate(
             served_pct=Case(
@@ -406,8 +394,8 @@ def donor(request):
 @login_required
 @user_passes_test(is_ngo)
 def ngo(request):
-    awaiting  = FoodDonation.objects.filter(status="PENDING").count()
-    approved  = FoodDonation.objects.filter(status__in=["ACCEPTED", "PARTIAL"], accepted_by=request.user, expires_at__gt=timezone.now()).count()
+    awaiting  = FoodDonation.objects.with_status("PENDING").count()
+    approved  = FoodDonation.objects.with_status("ACCEPTED", "PARTIAL").filter(accepted_by=request.user).count()
     requested = ReceiverOrder.objects.filter(
         status__in=["REQUESTED", "APPROVED", "ALLOCATED"]
     ).filter(
@@ -417,11 +405,12 @@ def ngo(request):
 
     # Lists (show unassigned too, so NGO can claim/approve)
     awaiting_donations = (FoodDonation.objects
-        .filter(status="PENDING")
+        .with_status("PENDING")
         .order_by("-created_at")[:10])
 
     approved_food = (FoodDonation.objects
-        .filter(status__in=["ACCEPTED", "PARTIAL"], accepted_by=request.user, expires_at__gt=timezone.now())
+        .with_status("ACCEPTED", "PARTIAL")
+        .filter(accepted_by=request.user)
         .order_by("-created_at")[:15])
 
     requested_food = (ReceiverOrder.objects
@@ -438,16 +427,11 @@ def ngo(request):
 
     ngo_ratings = {r.food_id: r.stars for r in NGORating.objects.filter(ngo=request.user)}
     pending = list(
-    FoodDonation.objects.filter(status="PENDING").select_related("donor")
+    FoodDonation.objects.with_status("PENDING").select_related("donor")
     )
 
-    rows = []
-    for f in pending:
-        allowed_ids = nearest_ngo_ids_for_donation(f, limit=2)
-        rows.append({
-            "food": f,
-            "can_accept": request.user.id in allowed_ids,
-        })
+    eligible_ids = set(request.user.eligible_donations.with_status("PENDING").values_list("id", flat=True))
+    rows = [{"food": f, "can_accept": f.id in eligible_ids} for f in pending]
     return render(request, "ngo.html", {
         "pending_rows": rows,
         "counts": {"awaiting":awaiting,"approved":approved,"requested":requested,"delivered":delivered},
@@ -510,15 +494,6 @@ def donor_create_food(request):
     })
 
 
-def _haversine_km(lat1, lng1, lat2, lng2):
-    if None in (lat1, lng1, lat2, lng2): return float("inf")
-    R = 6371.0
-    p1, p2 = math.radians(lat1), math.radians(lat2)
-    dlat = p2 - p1
-    dlon = math.radians(lng2 - lng1)
-    a = math.sin(dlat/2)**2 + math.cos(p1)*math.cos(p2)*math.sin(dlon/2)**2
-    return 2 * R * math.asin(math.sqrt(a))
-
 def suggested_ngos_for_anchor(anchor_lat, anchor_lng, limit=2):
     """Return closest NGOs to the anchor (lat,lng) using NGOLocation; empty list if anchor missing."""
     try:
@@ -526,44 +501,9 @@ def suggested_ngos_for_anchor(anchor_lat, anchor_lng, limit=2):
     except (TypeError, ValueError):
         return []
 
-    ngo_group = Group.objects.get(name="NGO")
-    ngos = (User.objects
-            .filter(groups=ngo_group)
-            .select_related("ngo_location"))
-
-    scored = []
-    for u in ngos:
-        loc = getattr(u, "ngo_location", None)
-        if not loc or loc.lat is None or loc.lng is None:
-            continue
-        dist = _haversine_km(lat, lng, loc.lat, loc.lng)
-        scored.append((dist, u))
-
-    scored.sort(key=lambda x: x[0])
-    return [u for _, u in scored[:limit]]
-
-def nearest_ngo_ids_for_donation(food, limit=2):
-    """Return a list of NGO user IDs nearest to this donation's pickup point."""
-    try:
-        anchor_lat = float(food.pickup_lat)
-        anchor_lng = float(food.pickup_lng)
-    except (TypeError, ValueError):
-        return []
-    try:
-        ngo_group = Group.objects.get(name="NGO")
-        ngo_users = User.objects.filter(groups=ngo_group).select_related("ngo_location")
-    except Group.DoesNotExist:
-        return []
-
-    scored = []
-    for u in ngo_users:
-        loc = getattr(u, "ngo_location", None)
-        if not loc or loc.lat is None or loc.lng is None:
-            continue
-        d = _haversine_km(anchor_lat, anchor_lng, loc.lat, loc.lng)
-        scored.append((d, u.id))
-    scored.sort(key=lambda x: x[0])
-    return [uid for _, uid in scored[:limit]]
+    hits = get_ngo_index().nearest(lat, lng, limit)
+    users = User.objects.select_related("ngo_location").in_bulk([p.user_id for _, p in hits])
+    return [users[p.user_id] for _, p in hits if p.user_id in users]
 
 # -----------------------------
 # Help & Admin
@@ -613,7 +553,7 @@ def admin_stats_api(request):
     # 2) Status buckets for donut + filters
     pending_orders   = ReceiverOrder.objects.filter(status__in=["REQUESTED", "APPROVED"]).count()
     allocated_orders = ReceiverOrder.objects.filter(status="ALLOCATED").count()
-    expired_donations = FoodDonation.objects.filter(status="EXPIRED").count()
+    expired_donations = FoodDonation.objects.expired().count()
     status_counts = [
         {"status": "PENDING",   "count": pending_orders},
         {"status": "ALLOCATED", "count": allocated_orders},
@@ -663,6 +603,19 @@ def admin_stats_api(request):
         "help_request_counts": help_request_counts,
     }, safe=False)
 
+@login_required(login_url='login')
+def map_clusters(request):
+    """
+    GeoJSON clusters of active donation pickups and NGO locations for a Leaflet view:
+    ?zoom=<int>&bbox=<west>,<south>,<east>,<north>
+    """
+    try:
+        zoom = int(request.GET.get("zoom", ""))
+        west, south, east, north = (float(v) for v in request.GET.get("bbox", "").split(","))
+        return JsonResponse(clusters_for_bbox(zoom, west, south, east, north))
+    except ValueError as e:
+        return JsonResponse({"error": str(e) or "zoom and bbox are required"}, status=400)
+
 # -----------------------------
 # Chatbot demo
 # -----------------------------
@@ -749,6 +702,9 @@ def donor_post_food(request):
                 status="PENDING",
             )
 
+            # Which nearby NGOs may accept it
+            assign_eligible_ngos([food])
+
             # Create/update shadow Food for reviews (legacy Rating)
             _get_or_create_food_shadow(food)
 
@@ -772,21 +728,9 @@ def donor_post_food(request):
     })
 
 
-# add near the top of views.py imports
-import math
 from django.contrib.auth.models import User, Group
 from .models import NGOLocation
 
-def _haversine_km(lat1, lng1, lat2, lng2):
-    if None in (lat1, lng1, lat2, lng2):
-        return float("inf")
-    R = 6371.0
-    p1, p2 = math.radians(lat1), math.radians(lat2)
-    dlat = p2 - p1
-    dlon = math.radians(lng2 - lng1)
-    a = math.sin(dlat/2)**2 + math.cos(p1)*math.cos(p2)*math.sin(dlon/2)**2
-    return 2 * R * math.asin(math.sqrt(a))
-
 def suggested_ngos_for_anchor_with_distance(anchor_lat, anchor_lng, limit=2):
     """Return [{'user': <User>, 'distance_km': float, 'address': str}] for nearest NGOs."""
     try:
@@ -795,42 +739,18 @@ def suggested_ngos_for_anchor_with_distance(anchor_lat, anchor_lng, limit=2):
     except (TypeError, ValueError):
         return []
 
-    # get NGO users
-    try:
-        ngo_group = Group.objects.get(name="NGO")
-        ngo_users = User.objects.filter(groups=ngo_group).select_related("ngo_location")
-    except Group.DoesNotExist:
-        ngo_users = User.objects.none()
-
-    scored = []
-    for u in ngo_users:
-        loc = getattr(u, "ngo_location", None)
-        if not loc or loc.lat is None or loc.lng is None:
-            continue
-        dist = _haversine_km(anchor_lat, anchor_lng, loc.lat, loc.lng)
-        scored.append({
-            "user": u,
-            "distance_km": dist,
-            "address": loc.address_line or ""
-        })
-    scored.sort(key=lambda d: d["distance_km"])
-    return scored[:limit]
+    hits = get_ngo_index().nearest(anchor_lat, anchor_lng, limit)
+    users = User.objects.in_bulk([p.user_id for _, p in hits])
+    return [
+        {"user": users[p.user_id], "distance_km": dist, "address": p.address}
+        for dist, p in hits if p.user_id in users
+    ]
 
 
 @login_required
 @user_passes_test(is_donor)
 def donor_food_detail(request, id):
-    food = get_object_or_404(FoodDonation, id=id, donor=request.user)
-
-    if (
-    food.expires_at and
-    food.expires_at <= timezone.now() and
-    food.status in ("PENDING", "ACCEPTED", "PARTIAL")
-    ):
-        food.status = "EXPIRED"
-        food.inventory_remaining = 0
-        food.save(update_fields=["status", "inventory_remaining"])
-
+    food = get_object_or_404(FoodDonation.objects.with_effective_status(), id=id, donor=request.user)
 
     rx_qs = (ReceiverRating.objects
              .filter(food_id=food.id)
@@ -881,18 +801,18 @@ def donor_food_detail(request, id):
 @login_required
 @user_passes_test(is_ngo)
 def ngo_review_queue(request):
-    now = timezone.now()
-    # Expire due items
-    for f in FoodDonation.objects.filter(status="PENDING"):
-        f.mark_expired_if_needed()
-    items = (FoodDonation.objects
-             .filter(status="PENDING", expires_at__gt=now)
-             .order_by("expires_at"))
-    return render(request, "ngo_review_queue.html", {"items": items})
+    # due items are expired by the expiry_scheduler command; with_status() hides them meanwhile
+    items = list(FoodDonation.objects
+                 .with_status("PENDING")
+                 .order_by("expires_at"))
+    eligible_ids = set(request.user.eligible_donations.with_status("PENDING").values_list("id", flat=True))
+    rows = [{"food": f, "can_accept": f.id in eligible_ids} for f in items]
+    return render(request, "ngo_review_queue.html", {"rows": rows})
 
 
 @login_required
 @user_passes_test(is_ngo)
+@require_http_methods(["POST"])
 @transaction.atomic
 def ngo_accept_food(request, pk):
     # Lock the row to avoid races
@@ -917,9 +837,8 @@ def ngo_accept_food(request, pk):
         messages.error(request, "This donation is not in a pending state.")
         return redirect("ngo")
 
-    # NEW: allow only the two closest NGOs to accept
-    allowed_ids = nearest_ngo_ids_for_donation(food, limit=2)
-    if request.user.id not in allowed_ids:
+    # NEW: allow only the two closest NGOs to accept (stored at post time)
+    if not food.eligible_ngos.filter(pk=request.user.pk).exists():
         messages.error(request, "This donation is reserved for nearby NGOs.")
         return redirect("ngo")
 
@@ -929,15 +848,7 @@ def ngo_accept_food(request, pk):
     food.inventory_remaining = food.quantity_people
     food.save(update_fields=["status", "accepted_by", "inventory_remaining"])
 
-    # Send donor notification email (unchanged)
-    notify_donor_food_approved(food)
-
-    # Inventory row create/update
-    NGOInventory.objects.update_or_create(
-        ngo=request.user,
-        food=food,
-        defaults={"quantity_remaining": food.inventory_remaining}
-    )
+    # the donor hears about it from the status_changed handler in signals_orders
 
     # Mark NGO on legacy Food shadow so reviews can reference NGO too
     shadow = _get_or_create_food_shadow(food)
@@ -950,6 +861,7 @@ def ngo_accept_food(request, pk):
 
 @login_required
 @user_passes_test(is_ngo)
+@require_http_methods(["POST"])
 @transaction.atomic
 def ngo_reject_food(request, pk):
     food = get_object_or_404(FoodDonation.objects.select_for_update(), pk=pk)
@@ -966,12 +878,32 @@ def ngo_reject_food(request, pk):
 @user_passes_test(is_ngo)
 def ngo_inventory(request):
     foods = (FoodDonation.objects
-             .filter(accepted_by=request.user, status__in=["ACCEPTED", "PARTIAL"])
+             .with_status("ACCEPTED", "PARTIAL")
+             .filter(accepted_by=request.user)
              .order_by("expires_at"))
-    for f in foods:
-        f.mark_expired_if_needed()
-    foods = [f for f in foods if f.status != "EXPIRED"]
-    return render(request, "ngo_inventory.html", {"foods": foods})
+    # items this NGO has ever stocked, each linking to its ledger history
+    stock = NGOStock.objects.filter(ngo=request.user).select_related("item").order_by("item__name")
+    return render(request, "ngo_inventory.html", {"foods": foods, "stock": stock})
+
+
+@login_required
+@user_passes_test(is_ngo)
+def ngo_stock_history(request, item_id):
+    """
+    One item's inventory ledger for this NGO over the last ?days= (default 7,
+    at most 90): the current position, then each movement with running totals.
+    Both start from the nearest snapshot, so only the window is read.
+    """
+    item = get_object_or_404(FoodItem, pk=item_id)
+    try:
+        days = max(1, min(int(request.GET.get("days") or 7), 90))
+    except ValueError:
+        days = 7
+    available, reserved = stock_position(request.user.id, item.id)
+    history = stock_history(request.user.id, item.id, since=timezone.now() - timedelta(days=days), limit=500)
+    return render(request, "ngo_stock_history.html", {
+        "item": item, "days": days, "available": available, "reserved": reserved, "history": history,
+    })
 
 
 # -----------------------------
@@ -979,33 +911,55 @@ def ngo_inventory(request):
 # -----------------------------
 from django.db.models import Prefetch
 
-def receiver_browse(request):
+def _browse_queryset():
     # Only show accepted/partial, not expired, with stock
-    qs = (FoodDonation.objects
-          .filter(status__in=["ACCEPTED", "PARTIAL"],
-                  inventory_remaining__gt=0,
-                  expires_at__gt=timezone.now())
-          .select_related("donor", "accepted_by")
-          .prefetch_related("ngo_ratings"))
-
-    donations = list(qs)
-
-    def avg_ngo(d):
-        rs = [r.stars for r in d.ngo_ratings.all()]
-        return sum(rs)/len(rs) if rs else 0.0
-
-    from .models import composite_donor_rating
-    def donor_avg(d):
-        try:
-            return composite_donor_rating(d.donor)
-        except Exception:
-            return 0.0
+    return (FoodDonation.objects
+            .available()
+            .select_related("donor", "accepted_by")
+            .prefetch_related("ngo_ratings"))
 
-    donations.sort(key=lambda d: (avg_ngo(d), donor_avg(d)), reverse=True)
 
+def receiver_browse(request):
+    """
+    Available donations, best-ranked donor first (Profile.rank_score),
+    soonest expiry breaking ties. Ordering and ?limit= (default 50) run in the
+    database.
+    """
+    try:
+        limit = max(1, min(int(request.GET.get("limit") or 50), 200))
+    except ValueError:
+        limit = 50
+    donations = (_browse_queryset()
+                 .annotate(donor_score=donor_rank_expression("donor__profile__"))
+                 .order_by("-donor_score", "expires_at", "id")[:limit])
     return render(request, "receiver_browse.html", {"donations": donations})
 
 
+def receiver_near_me(request):
+    """
+    Available donations within ?radius_km= (default 5, at most 50) of
+    ?lat=&lng=, nearest first. Filtering, distance ordering and LIMIT all run
+    in the database. Missing, non-finite or out-of-range values get a 400.
+    """
+    try:
+        lat = float(request.GET["lat"])
+        lng = float(request.GET["lng"])
+        radius_km = float(request.GET.get("radius_km") or 5)
+        limit = max(1, min(int(request.GET.get("limit") or 20), 100))
+        if not (all(math.isfinite(v) for v in (lat, lng, radius_km))
+                and -90 <= lat <= 90 and -180 <= lng <= 180 and radius_km > 0):
+            raise ValueError
+    except (KeyError, ValueError):
+        messages.error(request, "Pick your delivery point on the map and a radius above 0 km to search nearby food.")
+        return render(request, "receiver_browse.html", {"donations": []}, status=400)
+    radius_km = min(radius_km, 50.0)
+
+    donations = within_radius(_browse_queryset(), lat, lng, radius_km)[:limit]
+    return render(request, "receiver_browse.html", {
+        "donations": donations,
+        "near": {"lat": lat, "lng": lng, "radius_km": radius_km},
+    })
+
 
 @login_required
 @user_passes_test(is_receiver)
@@ -1041,12 +995,7 @@ def receiver_request_order(request):
         return redirect("receiver")
 
     # find the selected donation
-    donation = FoodDonation.objects.filter(
-        id=food_id,
-        status__in=["ACCEPTED", "PARTIAL"],
-        inventory_remaining__gt=0,
-        expires_at__gt=timezone.now()
-    ).first()
+    donation = FoodDonation.objects.available().select_related("item").filter(id=food_id).first()
 
     if not donation:
         messages.error(request, "Selected item is no longer available.")
@@ -1054,17 +1003,8 @@ def receiver_request_order(request):
 
     item_name = donation.item_name
 
-    # current availability (you can keep your existing logic)
-    available = (
-        FoodDonation.objects
-        .filter(
-            item_name=item_name,
-            status__in=["ACCEPTED", "PARTIAL"],
-            inventory_remaining__gt=0,
-            expires_at__gt=timezone.now(),
-        )
-        .aggregate(total=Sum("inventory_remaining"))["total"] or 0
-    )
+    # current availability across NGOs: the per-item stock counters less food that is due but not yet swept
+    available = available_stock(item_name)
 
     if people_count > available:
         messages.error(request, f"Only {available} available for {item_name}. Please reduce the quantity.")
@@ -1074,6 +1014,7 @@ def receiver_request_order(request):
     ReceiverOrder.objects.create(
         receiver=request.user,
         item_name=item_name,
+        item=donation.item,
         people_count=people_count,
         delivery_lat=lat,
         delivery_lng=lng,
@@ -1131,61 +1072,56 @@ def ngo_approve_order(request, order_id):
     # Ensure a Delivery row exists so it shows in "Active Deliveries"
     Delivery.objects.get_or_create(ngo=request.user, order=order)
 
-    # ----- Notifications (email + SMS) -----
-    subj = f"[HopeMeals] Your request for {order.item_name} is approved"
-    body = (
-        f"Hi {order.receiver.username}, your order #{order.id} for {order.people_count} people "
-        f"has been approved and is being prepared."
-    )
-
-    # Receiver notifications
-    try:
-        recv_email = getattr(order.receiver, "email", "") or ""
-        recv_phone = getattr(getattr(order.receiver, "profile", None), "phone", "") or ""
-        if recv_email:
-            send_email_notification(recv_email, subj, body)
-        if recv_phone:
-            send_sms_notification(recv_phone, body)
-    except Exception:
-        pass  # keep flow resilient
-
-    # Donor notifications (optional but nice): inform each allocated donor
-    try:
-        for a in order.allocations.select_related("donation__donor", "donation"):
-            donor = a.donation.donor
-            d_email = getattr(donor, "email", "") or ""
-            d_phone = getattr(getattr(donor, "profile", None), "phone", "") or ""
-            d_subj = f"[HopeMeals] Allocation for your donation #{a.donation.id}"
-            d_body = (
-                f"Your donation '{a.donation.item_name}' has {a.quantity} people allocated "
-                f"to receiver order #{order.id}. Thank you!"
-            )
-            if d_email:
-                send_email_notification(d_email, d_subj, d_body)
-            if d_phone:
-                send_sms_notification(d_phone, d_body)
-    except Exception:
-        pass
+    # Receiver + donor notifications, sent once this transaction commits
+    dispatch_notification(("order-approved", order.pk), notify_order_approved, order)
 
     # Return the allocation PDF (your helper)
     return allocation_pdf(order, allocations)
 
+@login_required
+@user_passes_test(is_ngo)
+@require_http_methods(["POST"])
+def ngo_allocate_all_orders(request):
+    report = allocate_open_orders(request.user)
+    if report.allocated:
+        messages.success(request, f"Allocated {len(report.allocated)} orders.")
+    for order, available in report.unfilled:
+        messages.warning(
+            request,
+            f"Order #{order.id} ({order.item_name} x {order.people_count}) could not be filled: "
+            f"{available} available."
+        )
+    if not report.allocated and not report.unfilled:
+        messages.info(request, "No open orders to allocate.")
+    return redirect("ngo_orders")
+
+@login_required
+@user_passes_test(is_ngo)
+@require_http_methods(["POST"])
+def ngo_plan_delivery_runs(request):
+    runs = plan_delivery_runs(request.user)
+    if not runs:
+        messages.info(request, "No allocated orders waiting for a delivery run.")
+    else:
+        messages.success(request, f"Planned {len(runs)} delivery runs.")
+        late = sum(1 for r in runs if not r.on_time)
+        if late:
+            messages.warning(request, f"{late} runs cannot reach every receiver before the food expires.")
+    return redirect("ngo_deliveries")
+
 @login_required
 @user_passes_test(is_ngo)
 def ngo_combined_map(request, order_id):
-    order = get_object_or_404(ReceiverOrder, pk=order_id, ngo=request.user)
-    allocations = list(order.allocations.select_related("donation"))
-    pickups = [{
-        "lat": float(a.donation.pickup_lat),
-        "lng": float(a.donation.pickup_lng),
-        "label": f"{a.donation.donor.username} ({a.quantity})"
-    } for a in allocations]
-    drop = {
-        "lat": float(order.delivery_lat or 0),
-        "lng": float(order.delivery_lng or 0),
-        "label": f"{order.receiver.username}"
-    }
-    return render(request, "ngo_combined_map.html", {"pickups": pickups, "drop": drop, "order": order})
+    order = get_object_or_404(
+        ReceiverOrder.objects.select_related("receiver", "ngo__ngo_location", "delivery"),
+        pk=order_id, ngo=request.user,
+    )
+    route = route_for_order(order)
+    return render(request, "ngo_combined_map.html", {
+        "route": route["stops"],
+        "distance_km": route["distance_km"],
+        "order": order,
+    })
 
 
 # -----------------------------
@@ -1196,7 +1132,7 @@ def ngo_combined_map(request, order_id):
 def ngo_deliveries(request):
     dels = (Delivery.objects
         .filter(ngo=request.user)
-        .select_related("order", "order__receiver")
+        .select_related("order", "order__receiver", "run")
         .order_by("-started_at"))
     return render(request, "ngo_deliveries.html", {"deliveries": dels})
 
@@ -1231,19 +1167,16 @@ def delivery_update_status(request, delivery_id):
         order.status = "DELIVERED"
         order.save(update_fields=["status"])
 
-        # 2) decrement each allocated donation
-        for a in order.allocations.select_related("donation"):
-            fd = a.donation
-            fd.inventory_remaining = max(0, fd.inventory_remaining - a.quantity)
-            fd.status = "DELIVERED" if fd.inventory_remaining == 0 else "PARTIAL"
-            fd.save(update_fields=["inventory_remaining", "status"])
-            # 3) keep NGOInventory in sync (if exists)
-            try:
-                inv = fd.inventory
-                inv.quantity_remaining = fd.inventory_remaining
-                inv.save(update_fields=["quantity_remaining"])
-            except NGOInventory.DoesNotExist:
-                pass
+        # 2) stock was reserved at allocation time; the first DELIVERED update
+        #    moves it out of the reservation in the ledger
+        first = Delivery.objects.filter(pk=d.pk).exclude(status="DELIVERED").update(status="DELIVERED")
+        if first:
+            record_movements(
+                InventoryMovement(ngo_id=a.donation.accepted_by_id, item_id=a.donation.item_id,
+                                  donation_id=a.donation_id, order=order, kind="DELIVER",
+                                  reserved=-a.quantity)
+                for a in order.allocations.select_related("donation")
+            )
 
     d.save()
     messages.success(request, f"Delivery #{d.id} updated to {d.status}.")
@@ -1303,7 +1236,6 @@ def ngo_rate_donor(request, food_pk):
         )
         # Mirror to legacy Food.Rating
         _sync_food_rating_from_donation(food, role="NGO", rater_user=request.user, stars=stars, comment=comment)
-        _recompute_donor_averages(food.donor)
         messages.success(request, "Rated donor (NGO).")
         return redirect("ngo")
     return render(request, "rating_form.html", {"form": form, "who": "NGO"})
@@ -1324,7 +1256,6 @@ def receiver_rate_donor(request, food_pk):
         )
         # Mirror to legacy Food.Rating
         _sync_food_rating_from_donation(food, role="RECEIVER", rater_user=request.user, stars=stars, comment=comment)
-        _recompute_donor_averages(food.donor)
         messages.success(request, "Rated donor (Receiver).")
         return redirect("receiver")
     return render(request, "rating_form.html", {"form": form, "who": "Receiver"})